@@ -1,14 +1,41 @@
 from micropython import const
-from picovision import PicoVision, PEN_RGB555
-from pimoroni import Button
-from math import radians, cos, sin
-import gc
+from urandom import randrange
+from array import array
+from struct import unpack_from
+from picovision import PicoVision
+from game_loop import GameLoop
+from hud import Label
+from input_manager import InputManager, BUTTON_A, BUTTON_X, BUTTON_Y
+from gc_scheduler import GCScheduler
+from audio import Mixer, noise, square
+from ballistics import Ballistics, Trajectory, WIND_STEP
+from battle_tank_assets import TANK_BODY, TANK_BODY_WIDTH, TANK_BODY_HEIGHT, ENEMY_SHIP, ENEMY_SHIP_WIDTH
+from battle_tank_assets import ENEMY_SHIP_HEIGHT, BUILDINGS, BUILDINGS_FORMAT, BUILDINGS_SIZE
+from occupancy import OccupancyMap
+from palette import Palette, BLEND_ONE, pen_type
+from particles import Particles
+from pool import Pool
+from profiler import Profiler
+from renderer import Renderer
+from replay import attach
+from score_store import ScoreStore
+from sprite import Sprite
+from sprite_layer import SpriteLayer
+from task_scheduler import TaskScheduler
+from trig import sin_fixed, cos_fixed, to_int
 
 
 SCREEN_WIDTH = const(320)
 SCREEN_HEIGHT = const(240)
+GAME_NAME = 'battle_tank'
 GROUND_X = const(0)
 GROUND_Y = const(228)
+LEVEL_SCORE = const(10)
+DAY_TICKS = const(7200)
+SKY_STEP = const(60)
+HIT_FLASH_TICKS = const(15)
+SKY_DAY = (165, 182, 209)
+SKY_NIGHT = (70, 80, 120)
 
 
 class Information:
@@ -19,22 +46,27 @@ class Information:
     def __init__(self, screen):
         """
         information constructor
-        :param screen: displayed screen
+        :param screen: renderer of the displayed screen
         """
         self._display = screen
+        self._level_label = Label(screen, 20, 10, f'Level: {{:0>{self.DESIRED_WIDTH}}}', INFORMATION, self.FONT_SCALE)
+        self._lives_label = Label(screen, 130, 10, f'Lives: {{:0>{self.DESIRED_WIDTH}}}', INFORMATION, self.FONT_SCALE)
+        self._score_label = Label(screen, 250, 10, f'Score: {{:0>{self.DESIRED_WIDTH}}}', INFORMATION, self.FONT_SCALE)
+        self._wind_label = Label(screen, 20, 22, 'Wind: {}', INFORMATION, self.FONT_SCALE)
         self.level = 1
         self.lives = 3
         self.score = 0
+        self.wind = 0
 
     def draw(self) -> None:
         """
-        draw information on the display
+        draw information on the display (labels are only drawn again when a value changed)
         :return: None
         """
-        self._display.set_pen(INFORMATION)
-        self._display.text(f'Level: {self.level:0>{self.DESIRED_WIDTH}}', 20, 10, scale=self.FONT_SCALE)
-        self._display.text(f'Lives: {self.lives:0>{self.DESIRED_WIDTH}}', 130, 10, scale=self.FONT_SCALE)
-        self._display.text(f'Score: {self.score:0>{self.DESIRED_WIDTH}}', 250, 10, scale=self.FONT_SCALE)
+        self._level_label.draw(self.level)
+        self._lives_label.draw(self.lives)
+        self._score_label.draw(self.score)
+        self._wind_label.draw(self.wind)
 
 
 class Building:
@@ -141,189 +173,673 @@ class Building:
 
         self._add_windows()
 
+    def occupy(self, occupancy: OccupancyMap) -> None:
+        """
+        mark the building body, roof and foundation as solid in an occupancy map
+        :param occupancy: occupancy map
+        :return: None
+        """
+        occupancy.fill_rect(self._pos_x, self._pos_y, self._width, self._height)
+
+        if self._roof:
+            occupancy.fill_rect(self._pos_x + (self.ROOF * 2), self._pos_y - self.ROOF,
+                                self._width - (self.ROOF * 4), self.ROOF)
+
+        if self._foundation:
+            occupancy.fill_rect(self._pos_x - (self.FOUNDATION // 2), self._pos_y + self._height - self.FOUNDATION,
+                                self._width + self.FOUNDATION, self.FOUNDATION)
+
+
+class Terrain:
+
+    CRATER_RADIUS = const(6)
+    MAX_CRATERS = const(48)
+
+    def __init__(self, screen, layer):
+        """
+        terrain constructor, keeps ground and buildings as bit-packed occupancy map for O(1) hit tests
+        :param screen: renderer of the displayed screen
+        :param layer: static layer with ground and buildings
+        """
+        self._display = screen
+        self._layer = layer
+        self.occupancy = OccupancyMap(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.craters = 0
+
+    def add_ground(self) -> None:
+        """
+        draw the ground into the static layer and mark it as solid
+        :return: None
+        """
+        self._layer.set_pen(GROUND)
+        self._layer.rectangle(GROUND_X, GROUND_Y, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_Y)
+        self.occupancy.fill_rect(GROUND_X, GROUND_Y, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_Y)
+
+    def add_building(self, building: Building) -> None:
+        """
+        draw a building into the static layer and mark it as solid
+        :param building: building created on the static layer
+        :return: None
+        """
+        building.draw()
+        building.occupy(self.occupancy)
+
+    def hit(self, x: int, y: int) -> bool:
+        """
+        return whether a position is inside ground or a building
+        :param x: x position in pixel
+        :param y: y position in pixel
+        :return: bool
+        """
+        return self.occupancy.is_solid(x, y)
+
+    def impact(self, x: int, y: int) -> None:
+        """
+        carve a crater into the map and the static layer and redraw only the damaged region
+        (after MAX_CRATERS the terrain stays as it is to bound the static layer)
+        :param x: x position in pixel
+        :param y: y position in pixel
+        :return: None
+        """
+        if self.craters == self.MAX_CRATERS:
+            return
+
+        radius = self.CRATER_RADIUS
+        self.occupancy.clear_circle(x, y, radius)
+        self._layer.set_pen(SKY)
+        self._layer.circle(x, y, radius)
+        self._display.damage(x - radius, y - radius, radius * 2 + 1, radius * 2 + 1)
+        self.craters += 1
+
+
+class Shell:
+    def __init__(self):
+        """
+        shell constructor (shells are created once by the tank's pool)
+        """
+        self.pool_index = 0
+        self.fx = 0
+        self.fy = 0
+        self.vx = 0
+        self.vy = 0
+        self.x = 0
+        self.y = 0
+
 
 class Tank:
 
     GUN_ROTATION_SPEED = const(2)
     GUN_LENGTH = const(15)
-    BULLET_SPEED = const(5)
-
-    def __init__(self, screen, center_x: int, center_y: int):
+    HALF_WIDTH = const(10)
+    LAUNCH_SPEED = const(5)
+    MAX_SHELLS = const(3)
+    FIRE_DELAY = const(15)
+    DEBRIS_COUNT = const(20)
+    DEBRIS_SPEED = const(20)
+    DEBRIS_LIFE = const(40)
+
+    def __init__(self, screen, controls: InputManager, terrain: Terrain, ballistics: Ballistics, layer: SpriteLayer,
+                 image: int, sounds: Mixer, fire_sound: int, impact_sound: int, particles: Particles, center_x: int,
+                 center_y: int):
         """
         tank constructor
         :param screen: displayed screen
+        :param controls: input manager
+        :param terrain: terrain hit by the shells
+        :param ballistics: gravity and wind for the shells
+        :param layer: sprite layer (the tank body uses one slot if one is left)
+        :param image: tank body image of the sprite layer
+        :param sounds: sound mixer
+        :param fire_sound: sound of the mixer played on every shot
+        :param impact_sound: sound of the mixer played when a shell hits the terrain
+        :param particles: particle system for the debris of shell impacts
         :param center_x: tank center x position in pixel
         :param center_y: tank center y position in pixel
         """
         self._display = screen
+        self._controls = controls
+        self._terrain = terrain
+        self._ballistics = ballistics
+        self._trajectory = Trajectory(ballistics)
+        self._layer = layer
+        self._image = int(image)
+        self._slot = layer.allocate()
+        self._sounds = sounds
+        self._fire_sound = int(fire_sound)
+        self._impact_sound = int(impact_sound)
+        self._particles = particles
         self._tank_center_x = int(center_x)
         self._tank_center_y = int(center_y) - 6
         self._gun_angle = -45
-        self._bullet_state = "ready"
-        self._bullet_angle = None
+        self._cooldown = 0
+        self._barrel = array('h', [0] * 720)
 
-        self.bullet_x = self._tank_center_x
-        self.bullet_y = self._tank_center_y
+        for degree in range(360):
+            self._barrel[degree * 2] = self._tank_center_x + to_int(self.GUN_LENGTH * cos_fixed(degree))
+            self._barrel[degree * 2 + 1] = self._tank_center_y + to_int(self.GUN_LENGTH * sin_fixed(degree))
 
-    def _calculate_gun_angle(self) -> tuple:
-        """
-        calculate the gun angle for line
-        :return: tuple with x, y integer coordinates
-        """
-        angle = radians(self._gun_angle)
-        x = int(self._tank_center_x + self.GUN_LENGTH * cos(angle))
-        y = int(self._tank_center_y + self.GUN_LENGTH * sin(angle))
-
-        return x, y
+        self.shells = Pool(Shell, self.MAX_SHELLS)
 
     def _draw_tank(self) -> None:
         """
-        draw tank and gun on the on display
+        draw tank and gun (barrel end point from the per angle cache) on the on display
         :return: None
         """
-        x, y = self._calculate_gun_angle()
+        index = (self._gun_angle % 360) * 2
 
         self._display.set_pen(GUN)
-        self._display.line(self._tank_center_x, self._tank_center_y, x, y, 3)
+        self._display.line(self._tank_center_x, self._tank_center_y, self._barrel[index], self._barrel[index + 1], 3)
+
+        if self._slot >= 0:
+            self._layer.show(self._slot, self._image, self._tank_center_x - self.HALF_WIDTH, self._tank_center_y - 5)
+            return
 
         self._display.set_pen(TANK)
         self._display.circle(self._tank_center_x, self._tank_center_y, 5)
-        self._display.rectangle(self._tank_center_x - 10, self._tank_center_y, 20, 6)
+        self._display.rectangle(self._tank_center_x - self.HALF_WIDTH, self._tank_center_y, self.HALF_WIDTH * 2, 6)
 
-    def _calculate_bullet_position(self) -> None:
+    @property
+    def center_x(self) -> int:
+        """
+        tank center x position in pixel
+        :return: int
         """
-        calculate new bullet x, y position as rounded integer
+        return self._tank_center_x
+
+    def _fire(self) -> None:
+        """
+        launch a shell from the barrel end in gun direction (if one is free)
         :return: None
         """
-        if self._bullet_angle is not None:
-            self.bullet_x += round(self.BULLET_SPEED * cos(self._bullet_angle))
-            self.bullet_y += round(self.BULLET_SPEED * sin(self._bullet_angle))
+        shell = self.shells.acquire()
+
+        if shell is None:
+            return
+
+        index = (self._gun_angle % 360) * 2
+        self._ballistics.launch(shell, self._barrel[index], self._barrel[index + 1], self._gun_angle,
+                                self.LAUNCH_SPEED)
+        self._cooldown = self.FIRE_DELAY
+        self._sounds.play(self._fire_sound)
 
-    def _draw_bullet(self) -> None:
+    def _move_shells(self) -> None:
+        """
+        move shells under gravity and wind (fixed point, constant cost per shell)
+        and release shells hitting the terrain or leaving the display to the sides or bottom
+        :return: None
+        """
+        shells = self.shells
+        step = self._ballistics.step
+
+        for i in range(shells.count - 1, -1, -1):
+            shell = shells.items[i]
+            step(shell)
+
+            if self._terrain.hit(shell.x, shell.y):
+                self._terrain.impact(shell.x, shell.y)
+                # the crater may lie on the previewed path, which would stop at the old surface otherwise
+                self._trajectory.invalidate()
+                self._sounds.play(self._impact_sound)
+                self._particles.burst(shell.x, shell.y, self.DEBRIS_COUNT, self.DEBRIS_SPEED, self.DEBRIS_LIFE,
+                                      GROUND)
+                shells.release(shell)
+            elif shell.x < 0 or shell.x > SCREEN_WIDTH or shell.y > SCREEN_HEIGHT:
+                shells.release(shell)
+
+    def _draw_shells(self) -> None:
         """
-        draw bullet on display or reset bullet state (if bullet position is outside display bounds)
+        draw shells on display
         :return: None
         """
-        if self._bullet_state == "fire":
-            self._calculate_bullet_position()
+        shells = self.shells
 
+        if shells.count:
             self._display.set_pen(BULLET)
-            self._display.pixel(self.bullet_x, self.bullet_y)
 
-            if self.bullet_x < 0 or self.bullet_x > SCREEN_WIDTH or self.bullet_y < 0 or self.bullet_y > SCREEN_HEIGHT:
-                self._bullet_state = "ready"
-                self._bullet_angle = None
+            for i in range(shells.count):
+                shell = shells.items[i]
+                self._display.pixel(shell.x, shell.y)
 
     def handle_player_input(self) -> None:
         """
-        handle player input by buttons to move gun and to shoot the bullet (incl rotation restriction)
+        handle player input by buttons to move gun and to shoot shells (incl rotation restriction),
+        update the trajectory preview and move the shells
         :return: None
         """
-        button_up = self._display.is_button_a_pressed
-        button_down = self._display.is_button_x_pressed
-        button_select = Button(9, invert=True).read
+        if self._cooldown:
+            self._cooldown -= 1
 
-        if button_up() and self._gun_angle > -180:
+        if self._controls.held(BUTTON_A) and self._gun_angle > -180:
             self._gun_angle -= self.GUN_ROTATION_SPEED
 
-        if button_down() and self._gun_angle < 0:
+        if self._controls.held(BUTTON_X) and self._gun_angle < 0:
             self._gun_angle += self.GUN_ROTATION_SPEED
 
-        if button_select() and self._bullet_state == "ready":
-            self._bullet_state = "fire"
-            self._bullet_angle = radians(self._gun_angle)
-            self.bullet_x = self._tank_center_x
-            self.bullet_y = self._tank_center_y
+        if self._controls.held(BUTTON_Y) and not self._cooldown:
+            self._fire()
 
-        self._draw_bullet()
+        index = (self._gun_angle % 360) * 2
+        self._trajectory.aim(self._barrel[index], self._barrel[index + 1], self._gun_angle, self.LAUNCH_SPEED)
+        self._trajectory.advance(self._terrain.hit)
+        self._move_shells()
+
+    def draw(self) -> None:
+        """
+        draw trajectory preview, shells and tank on display
+        :return: None
+        """
+        self._display.set_pen(AIM)
+        self._trajectory.draw(self._display)
+        self._draw_shells()
         self._draw_tank()
 
 
 class Enemy:
 
-    def __init__(self, screen, level: int):
+    MAX_ENEMIES = const(3)
+    MAX_LEVEL = const(3)
+    SUBPIXEL_SHIFT = const(4)
+    CRUISE_Y = const(40)
+    CRUISE_SPACING = const(18)
+    BEAM_WIDTH = const(3)
+    CHARGE_TICKS = const(30)
+    RESPAWN_TICKS = const(120)
+    # difficulty per level 1 - 3: speed in 1/16 px per tick, ticks between beams, beam ticks, aggression in percent
+    SPEED = (0, 12, 18, 24)
+    COOLDOWN = (0, 900, 600, 420)
+    BEAM_TICKS = (0, 20, 30, 40)
+    AGGRESSION = (0, 20, 35, 50)
+    DEBRIS_COUNT = const(30)
+    DEBRIS_SPEED = const(28)
+    DEBRIS_LIFE = const(40)
+
+    def __init__(self, screen, sprite: Sprite, tank: Tank, layer: SpriteLayer, image: int, charge_image: int,
+                 sounds: Mixer, hit_sound: int, particles: Particles):
         """
-        enemy constructor
+        enemy constructor (enemies are created once by a pool and activated by spawn)
         :param screen: displayed screen
-        :param level: level of the enemy (Minimum: 1, Maximum: 3)
+        :param sprite: enemy sprite
+        :param tank: tank targeted by the beams
+        :param layer: sprite layer (each enemy uses one slot if one is left)
+        :param image: enemy image of the sprite layer
+        :param charge_image: image of the sprite layer while charging a beam
+        :param sounds: sound mixer
+        :param hit_sound: sound of the mixer played when the enemy is destroyed
+        :param particles: particle system for the debris of the destroyed enemy
         """
         self._display = screen
+        self._sprite = sprite
+        self._layer = layer
+        self._image = int(image)
+        self._charge_image = int(charge_image)
+        self._slot = layer.allocate()
+        self._sounds = sounds
+        self._hit_sound = int(hit_sound)
+        self._particles = particles
+        self._tank = tank
         self._visible = False
         self._beam = False
+        self._level = 1
+        self._fx = 0
+        self._target_x = 0
+        self._cooldown = 0
+        self._charge = 0
+        self._beam_ticks = 0
+        self._respawn = 0
+        self._beam_hit = False
+
+        self.pool_index = 0
+        self.x = 0
+        self.y = 0
+
+    def spawn(self, level: int) -> None:
+        """
+        (re)activate the enemy for a level at a random side of the sky
+        :param level: level of the enemy (Minimum: 1, Maximum: 3)
+        :return: None
+        """
+        self._level = min(self.MAX_LEVEL, max(1, int(level)))
+        self._visible = True
+        self._beam = False
+        self._charge = 0
+        self._beam_ticks = 0
+        self._cooldown = self.COOLDOWN[self._level]
+        self.x = -self._sprite.width if randrange(2) else SCREEN_WIDTH
+        self.y = self.CRUISE_Y + self.pool_index * self.CRUISE_SPACING
+        self._fx = self.x << self.SUBPIXEL_SHIFT
+        self._target_x = self.x
+
+    def think(self) -> None:
+        """
+        decide the next waypoint and whether to charge a beam (called by the task scheduler, not every tick)
+        :return: None
+        """
+        if not self._visible or self._beam or self._charge:
+            return
+
+        center = self.x + self._sprite.width // 2
+        tank_x = self._tank.center_x
+
+        if not self._cooldown and abs(center - tank_x) <= self.BEAM_WIDTH * 2:
+            self._charge = self.CHARGE_TICKS
+            self._target_x = self.x
+            return
+
+        if abs(self._target_x - self.x) > 2:
+            return
+
+        if randrange(100) < self.AGGRESSION[self._level]:
+            self._target_x = tank_x - self._sprite.width // 2 + randrange(-8, 9)
+        else:
+            self._target_x = randrange(10, SCREEN_WIDTH - 10 - self._sprite.width)
+
+    def move(self) -> bool:
+        """
+        fly towards the waypoint and advance beam and respawn timers by one tick
+        :return: bool (True if the beam hit the tank in this tick)
+        """
+        if not self._visible:
+            if self._respawn:
+                self._respawn -= 1
+
+                if not self._respawn:
+                    self.spawn(self._level)
+
+            return False
+
+        if self._cooldown:
+            self._cooldown -= 1
+
+        if self._charge:
+            self._charge -= 1
+
+            if not self._charge:
+                self._beam = True
+                self._beam_ticks = self.BEAM_TICKS[self._level]
+                self._beam_hit = False
+
+            return False
+
+        if self._beam:
+            self._beam_ticks -= 1
+
+            if not self._beam_ticks:
+                self._beam = False
+                self._cooldown = self.COOLDOWN[self._level]
+
+            distance = abs(self.x + self._sprite.width // 2 - self._tank.center_x)
+
+            if not self._beam_hit and distance <= self.BEAM_WIDTH + self._tank.HALF_WIDTH:
+                self._beam_hit = True
+                return True
 
-        if 0 <= int(level) <= 3:
-            self._level = 1
-        self._level = int(level)
+            return False
+
+        target = self._target_x << self.SUBPIXEL_SHIFT
+        speed = self.SPEED[self._level]
+
+        if self._fx < target:
+            self._fx = min(target, self._fx + speed)
+        elif self._fx > target:
+            self._fx = max(target, self._fx - speed)
+
+        self.x = self._fx >> self.SUBPIXEL_SHIFT
+        return False
+
+    def hit(self, x: int, y: int) -> bool:
+        """
+        destroy the enemy if a position is inside its sprite (it respawns after a while)
+        :param x: x position in pixel
+        :param y: y position in pixel
+        :return: bool
+        """
+        if not self._visible:
+            return False
+
+        if not (self.x <= x < self.x + self._sprite.width and self.y <= y < self.y + self._sprite.height):
+            return False
+
+        self._visible = False
+        self._beam = False
+        self._charge = 0
+        self._respawn = self.RESPAWN_TICKS
+        self._sounds.play(self._hit_sound)
+        self._particles.burst(self.x + self._sprite.width // 2, self.y + self._sprite.height // 2, self.DEBRIS_COUNT,
+                              self.DEBRIS_SPEED, self.DEBRIS_LIFE, ENEMY)
+        return True
+
+    @property
+    def level(self) -> int:
+        """
+        level of the enemy
+        :return: int
+        """
+        return self._level
 
     def draw(self) -> None:
         """
-        draw enemy and/or beam on the display
+        draw enemy and/or beam on the display (the enemy itself may be a sprite slot)
         :return: None
         """
-        if self._visible:
-            # @ToDo: draw enemy icon
-            pass
+        if not self._visible:
+            if self._slot >= 0:
+                self._layer.hide(self._slot)
+
+            return
 
         if self._beam:
-            # @ToDo: draw enemy beam
-            pass
+            center = self.x + self._sprite.width // 2
+            self._display.set_pen(BEAM)
+            self._display.rectangle(center - self.BEAM_WIDTH // 2, self.y + self._sprite.height, self.BEAM_WIDTH,
+                                    GROUND_Y - self.y - self._sprite.height)
 
+        if self._slot >= 0:
+            self._layer.show(self._slot, self._charge_image if self._charge else self._image, self.x, self.y)
+            return
 
-# initialize display
-display = PicoVision(PEN_RGB555, SCREEN_WIDTH, SCREEN_HEIGHT)
-display.set_font("bitmap8")
+        self._display.set_pen(ENEMY_CHARGE if self._charge else ENEMY)
+        self._sprite.draw(self._display, self.x, self.y)
 
-# define colors
-SKY = display.create_pen(165, 182, 209)
-GROUND = display.create_pen(9, 84, 5)
-INFORMATION = display.create_pen(50, 50, 50)
-BUILDING = display.create_pen(45, 45, 45)
-WINDOWS = display.create_pen(50, 250, 25)
-TANK = display.create_pen(150, 150, 150)
-GUN = display.create_pen(100, 100, 100)
-BULLET = display.create_pen(0, 0, 0)
 
-# define important variables and create objects
-game_info = Information(screen=display)
+def start_level() -> None:
+    """
+    set a random wind for the current level (the possible strength grows with the level) and respawn the enemies
+    :return: None
+    """
+    game_info.wind = randrange(-game_info.level, game_info.level + 1)
+    ballistics.set_wind(game_info.wind * WIND_STEP)
 
-building_a = Building(screen=display, x=35, y=(GROUND_Y - 90), w=50, h=90, r=True, s=True)
-building_b = Building(screen=display, x=140, y=(GROUND_Y - 100), w=40, h=100, f=True)
-building_c = Building(screen=display, x=200, y=(GROUND_Y - 80), w=40, h=80, s=True)
+    for i in range(enemies.count):
+        enemies.items[i].spawn(level=game_info.level + i)
 
-tank = Tank(screen=display, center_x=100, center_y=GROUND_Y)
 
-enemy_a = Enemy(screen=display, level=1)
-enemy_b = Enemy(screen=display, level=2)
-enemy_c = Enemy(screen=display, level=3)
+def handle_enemies() -> None:
+    """
+    move enemies, apply beam hits on the tank and shell hits on the enemies
+    :return: None
+    """
+    shells = tank.shells
 
-# game loop
-while True:
-    display.set_pen(SKY)
-    display.clear()
+    for i in range(enemies.count):
+        enemy = enemies.items[i]
 
-    if game_info.lives <= 0:
-        break
+        if enemy.move():
+            game_info.lives -= 1
+            palette.flash(SKY, 230, 90, 60, HIT_FLASH_TICKS)
 
-    display.set_pen(GROUND)
-    display.rectangle(GROUND_X, GROUND_Y, SCREEN_WIDTH, SCREEN_HEIGHT)
+        for j in range(shells.count - 1, -1, -1):
+            shell = shells.items[j]
 
-    game_info.draw()
+            if enemy.hit(shell.x, shell.y):
+                shells.release(shell)
+                game_info.score += enemy.level
+
+    if game_info.score >= game_info.level * LEVEL_SCORE:
+        game_info.level += 1
+        start_level()
+
+
+def update_sky() -> None:
+    """
+    move the day and night cycle on (only the sky palette entry changes every few ticks, no pixel is redrawn)
+    :return: None
+    """
+    global daytime
 
-    building_a.draw()
-    building_b.draw()
-    building_c.draw()
+    daytime = (daytime + 1) % DAY_TICKS
 
-    enemy_a.draw()
-    enemy_b.draw()
-    enemy_c.draw()
+    if daytime % SKY_STEP:
+        return
 
+    half = DAY_TICKS // 2
+    palette.blend(SKY, SKY_DAY, SKY_NIGHT, (daytime if daytime < half else DAY_TICKS - daytime) * BLEND_ONE // half)
+
+
+def update() -> None:
+    """
+    advance the game by one tick
+    :return: None
+    """
+    if game_info.lives <= 0:
+        loop.stop()
+        return
+
+    controls.sample()
+    palette.tick()
+    update_sky()
     tank.handle_player_input()
+    brain.run()
+    handle_enemies()
+    particles.update(loop.last_frame_us)
+    mixer.tick()
+
+
+def render() -> None:
+    """
+    draw and show one frame
+    :return: None
+    """
+    renderer.begin()
 
+    game_info.draw()
+
+    for i in range(enemies.count):
+        enemies.items[i].draw()
+
+    tank.draw()
+    particles.draw()
+    layer.draw()
+
+    profiler.draw()
+    renderer.end()
+
+
+def run(display) -> int:
+    """
+    run the game until all lives are lost (the game can be imported by the launcher)
+    :param display: PicoVision display created with pen_type()
+    :return: int (score)
+    """
+    global palette, SKY, GROUND, INFORMATION, BUILDING, WINDOWS, TANK, GUN, BULLET, AIM, ENEMY, ENEMY_CHARGE, BEAM
+    global daytime, renderer, controls, trace, game_info, terrain, ballistics, layer, tank, enemies, brain, collector
+    global mixer, particles, profiler, loop
+
+    display.set_font("bitmap8")
+
+    # define colors (the sky entry is rewritten by the day and night cycle and flashes when the tank is hit)
+    palette = Palette(display, (
+        SKY_DAY,
+        (9, 84, 5),
+        (50, 50, 50),
+        (45, 45, 45),
+        (50, 250, 25),
+        (150, 150, 150),
+        (100, 100, 100),
+        (0, 0, 0),
+        (90, 100, 120),
+        (120, 30, 140),
+        (230, 60, 60),
+        (255, 120, 40)
+    ))
+    SKY, GROUND, INFORMATION, BUILDING, WINDOWS, TANK, GUN, BULLET, AIM, ENEMY, ENEMY_CHARGE, BEAM = palette.pens
+    daytime = 0
+
+    # define important variables and create objects
+    renderer = Renderer(screen=display, background=SKY)
+    controls = InputManager(screen=display)
+    trace = attach(controls)
+    scores = ScoreStore()
+
+    game_info = Information(screen=renderer)
+
+    terrain = Terrain(screen=renderer, layer=renderer.static)
+    ballistics = Ballistics()
+
+    tank_sprite = Sprite.from_bytes(TANK_BODY_WIDTH, TANK_BODY_HEIGHT, TANK_BODY)
+
+    enemy_sprite = Sprite.from_bytes(ENEMY_SHIP_WIDTH, ENEMY_SHIP_HEIGHT, ENEMY_SHIP)
+
+    # tank body and enemies use hardware sprite slots (framebuffer fallback without sprite support)
+    layer = SpriteLayer(renderer=renderer)
+    tank_image = layer.add_image('tank', tank_sprite, TANK, palette.color(TANK))
+    enemy_image = layer.add_image('enemy', enemy_sprite, ENEMY, palette.color(ENEMY))
+    enemy_charge_image = layer.add_image('charge', enemy_sprite, ENEMY_CHARGE, palette.color(ENEMY_CHARGE))
+
+    # sound effects are precomputed once, the mixer writes them to the audio output once per tick
+    mixer = Mixer()
+    fire_sound = mixer.add(square(400, 80, 180))
+    explosion_sound = mixer.add(noise(300, hold=6))
+
+    particles = Particles(renderer=renderer)
+    tank = Tank(screen=renderer, controls=controls, terrain=terrain, ballistics=ballistics, layer=layer,
+                image=tank_image, sounds=mixer, fire_sound=fire_sound, impact_sound=explosion_sound,
+                particles=particles, center_x=100, center_y=GROUND_Y)
+    enemies = Pool(lambda: Enemy(screen=renderer, sprite=enemy_sprite, tank=tank, layer=layer, image=enemy_image,
+                                 charge_image=enemy_charge_image, sounds=mixer, hit_sound=explosion_sound,
+                                 particles=particles), Enemy.MAX_ENEMIES)
+    brain = TaskScheduler()
+
+    for _ in range(Enemy.MAX_ENEMIES):
+        brain.add(enemies.acquire().think)
+
+    # bake static scenery and its occupancy map once
+    terrain.add_ground()
+
+    for offset in range(0, len(BUILDINGS), BUILDINGS_SIZE):
+        x, w, h, roof, single, foundation = unpack_from(BUILDINGS_FORMAT, BUILDINGS, offset)
+        terrain.add_building(Building(screen=renderer.static, x=x, y=GROUND_Y - h, w=w, h=h, r=bool(roof),
+                                      s=bool(single), f=bool(foundation)))
+
+    start_level()
+    layer.load()
+
+    # game loop
+    collector = GCScheduler()
+    profiler = Profiler(renderer=renderer, controls=controls, pen=INFORMATION)
+    loop = GameLoop(update=update, render=render, idle=collector.collect, profiler=profiler,
+                    trace=trace)
+    loop.run()
+    collector.close()
+
+    if trace is not None:
+        trace.close()
+
+    # game over (the score is written to flash here only, never inside the game loop)
+    rank = scores.submit(GAME_NAME, game_info.score)
+    scores.commit()
+    mixer.close()
+    palette.restore()
+    layer.clear()
+    renderer.invalidate()
+    renderer.begin()
+    layer.draw()
+    display.set_pen(INFORMATION)
+    display.text('Game Over', 75, 80, scale=3)
+    display.text(f'Score: {game_info.score}', 100, 120, scale=1)
+    display.text('New high score' if rank == 0 else f'High score {scores.best(GAME_NAME)}', 100, 135, scale=1)
     display.update()
-    gc.collect()
+    return game_info.score
+
 
-# game over
-display.set_pen(INFORMATION)
-display.text('Game Over', 75, 80, scale=3)
-display.text(f'Score: {game_info.score}', 100, 120, scale=1)
-display.update()
+if __name__ == '__main__':
+    run(PicoVision(pen_type(), SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -0,0 +1,114 @@
+"""
+host-side emulation of the MicroPython heap functions of the 'gc' module
+
+CPython's gc module has no mem_alloc(), mem_free() or threshold(). install() adds them and wraps
+gc.collect() to count collections and the host time they take. With tracing enabled the heap use
+is taken from tracemalloc (live bytes since installation, several times slower) and memory which
+lives outside the MicroPython heap on the device (e.g. the framebuffers in PSRAM) is excluded.
+CPython frees most temporaries by reference counting, so garbage does not pile up like on the
+device: the numbers show the live footprint and its high-water mark, not the allocation rate.
+"""
+from time import perf_counter_ns
+import gc
+import tracemalloc
+
+
+HEAP_SIZE = 192 * 1024
+
+_collect = gc.collect
+_state = {'heap_size': HEAP_SIZE, 'threshold': -1, 'collections': 0, 'collect_ns': 0, 'excluded': 0, 'base': 0}
+
+
+def exclude(size: int) -> None:
+    """
+    exclude memory from the emulated heap (allocations living outside the heap on the device)
+    :param size: size in bytes
+    :return: None
+    """
+    _state['excluded'] += int(size)
+
+
+def mem_alloc() -> int:
+    """
+    return the number of traced heap bytes in use
+    :return: int
+    """
+    if not tracemalloc.is_tracing():
+        return 0
+
+    return max(0, tracemalloc.get_traced_memory()[0] - _state['base'] - _state['excluded'])
+
+
+def mem_free() -> int:
+    """
+    return the emulated free heap in bytes
+    :return: int
+    """
+    return max(0, _state['heap_size'] - mem_alloc())
+
+
+def threshold(amount: int = None) -> int:
+    """
+    set or query the automatic collection threshold (stored only)
+    :param amount: threshold in bytes (-1 = disabled)
+    :return: int
+    """
+    if amount is not None:
+        _state['threshold'] = amount
+
+    return _state['threshold']
+
+
+def collect(generation: int = 2) -> int:
+    """
+    run a full CPython collection and count it
+    :param generation: CPython generation
+    :return: int (number of unreachable objects found)
+    """
+    start = perf_counter_ns()
+    found = _collect(generation)
+    _state['collections'] += 1
+    _state['collect_ns'] += perf_counter_ns() - start
+    return found
+
+
+def reset() -> None:
+    """
+    reset the collection counters and start an empty emulated heap
+    :return: None
+    """
+    _collect()
+    _state['collections'] = 0
+    _state['collect_ns'] = 0
+    _state['excluded'] = 0
+    _state['base'] = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def collections() -> tuple:
+    """
+    return number of collections and host time in nanoseconds since the last reset
+    :return: tuple
+    """
+    return _state['collections'], _state['collect_ns']
+
+
+def install(heap_size: int = HEAP_SIZE, trace: bool = False) -> None:
+    """
+    add the MicroPython heap functions to CPython's gc module
+    :param heap_size: emulated heap size in bytes
+    :param trace: trace heap use with tracemalloc (otherwise mem_alloc() reports 0)
+    :return: None
+    """
+    _state['heap_size'] = int(heap_size)
+
+    if trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not trace and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    reset()
+
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
+    gc.threshold = threshold
+    gc.collect = collect
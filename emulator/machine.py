@@ -0,0 +1,113 @@
+"""
+host-side stand-in for the MicroPython 'machine' module (I2S output written to a WAV file)
+
+The I2S stand-in places every written buffer on the timeline of the session clock: if the
+output ran dry since the last write, silence is inserted first, so the WAV file shows when each
+sound was started by the game. A write is taken at once and the callback is called immediately.
+"""
+from utime import ticks_us, ticks_diff
+import wave
+
+
+# WAV file written by the next I2S output (None = count the samples only)
+wav_path = None
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, pin: int, mode: int = -1):
+        """
+        GPIO pin constructor
+        :param pin: GPIO pin number
+        :param mode: ignored
+        """
+        self.pin = int(pin)
+
+
+class I2S:
+    TX = 0
+    RX = 1
+    MONO = 0
+    STEREO = 1
+
+    def __init__(self, bus: int, sck: Pin, ws: Pin, sd: Pin, mode: int, bits: int, format: int, rate: int,
+                 ibuf: int):
+        """
+        I2S output constructor, opens the WAV file given by the module setting wav_path
+        :param bus: I2S bus (ignored)
+        :param sck: bit clock pin (ignored)
+        :param ws: word select pin (ignored)
+        :param sd: data pin (ignored)
+        :param mode: I2S.TX (receiving is not supported)
+        :param bits: sample size in bits (16 or 32)
+        :param format: I2S.MONO or I2S.STEREO
+        :param rate: sample rate in Hz
+        :param ibuf: driver buffer size in bytes (ignored)
+        """
+        if mode != I2S.TX:
+            raise ValueError('only I2S.TX is supported')
+
+        self._frame_bytes = bits // 8 * (2 if format == I2S.STEREO else 1)
+        self._rate = int(rate)
+        self._callback = None
+        self._start = ticks_us()
+        self._wav = None
+
+        self.frames = 0
+        self.writes = 0
+
+        if wav_path is not None:
+            self._wav = wave.open(wav_path, 'wb')
+            self._wav.setnchannels(2 if format == I2S.STEREO else 1)
+            self._wav.setsampwidth(bits // 8)
+            self._wav.setframerate(self._rate)
+
+    def irq(self, handler) -> None:
+        """
+        set the callback called when a written buffer was taken (switches to non-blocking writes on the device)
+        :param handler: callable with the I2S object as argument
+        :return: None
+        """
+        self._callback = handler
+
+    def write(self, buf) -> int:
+        """
+        append samples at the current session time (silence fills the time the output ran dry)
+        :param buf: buffer with samples
+        :return: int (number of bytes written)
+        """
+        data = bytes(buf)
+        due = ticks_diff(ticks_us(), self._start) * self._rate // 1000000
+
+        if due > self.frames:
+            self._append(bytes((due - self.frames) * self._frame_bytes))
+
+        self._append(data)
+        self.writes += 1
+
+        if self._callback is not None:
+            self._callback(self)
+
+        return len(data)
+
+    def _append(self, data: bytes) -> None:
+        """
+        append raw sample data to the WAV file
+        :param data: data
+        :return: None
+        """
+        self.frames += len(data) // self._frame_bytes
+
+        if self._wav is not None:
+            self._wav.writeframes(data)
+
+    def deinit(self) -> None:
+        """
+        stop the output and close the WAV file
+        :return: None
+        """
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
@@ -0,0 +1,48 @@
+"""
+host-side stand-in for the MicroPython 'micropython' module
+"""
+
+
+def const(value: int) -> int:
+    """
+    return the value unchanged (the compiler hint has no meaning on CPython)
+    :param value: constant value
+    :return: int
+    """
+    return value
+
+
+def native(func):
+    """
+    no-op replacement for the @micropython.native decorator
+    :param func: decorated function
+    :return: function
+    """
+    return func
+
+
+def viper(func):
+    """
+    no-op replacement for the @micropython.viper decorator
+    :param func: decorated function
+    :return: function
+    """
+    return func
+
+
+def opt_level(level: int = None) -> int:
+    """
+    stand-in for the compiler optimisation level
+    :param level: ignored
+    :return: int
+    """
+    return 0
+
+
+def mem_info(verbose: bool = False) -> None:
+    """
+    print a short memory summary
+    :param verbose: ignored
+    :return: None
+    """
+    print('mem: host emulator (no MicroPython heap)')
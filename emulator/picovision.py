@@ -0,0 +1,598 @@
+"""
+host-side stand-in for the PicoVision firmware module
+
+The PicoVision class keeps two real framebuffers (swapped by update() like the PSRAM buffers on
+the device, RGB555 pixels or 5 bit palette indices in PEN_P5 mode), rasterizes the PicoGraphics
+primitives the games use and counts calls, host time and filled pixels per primitive. The module
+level session object is used by the benchmark runner to script button input and to stop a game
+after a number of frames.
+Hardware sprites are kept apart from the framebuffers and only composited by composited() and
+save_png().
+"""
+from array import array
+from struct import pack
+from time import perf_counter_ns
+from zlib import compress, crc32, decompress
+from heap import exclude
+from font import GLYPHS, GLYPH_WIDTH, GLYPH_ADVANCE, glyph, measure
+
+
+PEN_P5 = 0
+PEN_RGB555 = 1
+PEN_RGB888 = 2
+
+BUTTON_A = 1
+BUTTON_X = 2
+BUTTON_Y = 4
+
+SPRITE_SLOTS = 16
+PALETTE_SIZE = 32
+
+
+class FrameLimitReached(Exception):
+    """
+    raised by PicoVision.update() once the session frame limit is reached
+    """
+    pass
+
+
+class Session:
+    def __init__(self):
+        """
+        emulator session constructor (scripted input and frame limit shared by all stand-ins)
+        """
+        self.frame_limit = None
+        self.script = None
+        self.frame = 0
+        self.frame_us = None
+        self.clock_us = 0
+        self.display = None
+
+    def reset(self, frame_limit: int = None, script=None, frame_us: int = None) -> None:
+        """
+        prepare a new emulator run
+        :param frame_limit: number of frames after which update() raises FrameLimitReached (None = endless)
+        :param script: callable returning a BUTTON_* bitmask for a frame number (None = no buttons)
+        :param frame_us: virtual frame time in microseconds added by every update() (None = host clock)
+        :return: None
+        """
+        self.frame_limit = frame_limit
+        self.script = script
+        self.frame = 0
+        self.frame_us = frame_us
+        self.clock_us = 0
+        self.display = None
+
+    def buttons(self) -> int:
+        """
+        return the scripted button bitmask for the current frame
+        :return: int
+        """
+        if self.script is None:
+            return 0
+
+        return self.script(self.frame)
+
+
+session = Session()
+
+
+class PicoVision:
+    def __init__(self, pen_type: int, width: int, height: int, frame_width: int = None, frame_height: int = None):
+        """
+        emulated display constructor
+        :param pen_type: PEN_RGB555 or PEN_P5 (PEN_RGB888 is accepted but rasterized as RGB555)
+        :param width: display width in pixel
+        :param height: display height in pixel
+        :param frame_width: ignored (scrolling frame size on the device)
+        :param frame_height: ignored (scrolling frame size on the device)
+        """
+        self.pen_type = pen_type
+        self.width = int(width)
+        self.height = int(height)
+        self.frames = 0
+        self.stats = {}
+
+        size = self.width * self.height
+        self._typecode = 'B' if pen_type == PEN_P5 else 'H'
+        self._buffers = [array(self._typecode, [0] * size), array(self._typecode, [0] * size)]
+        exclude(size * 2 * self._buffers[0].itemsize)
+        self._palette = array('H', [0] * PALETTE_SIZE)
+        self._palette_used = 0
+        self._draw = 0
+        self._pen = 0
+        self._row = array(self._typecode, [0] * self.width)
+        self._font = 'bitmap8'
+        self._sprites = {}
+        self._slots = [None] * SPRITE_SLOTS
+        self.remove_clip()
+
+        session.display = self
+
+    def _count(self, name: str, start: int, pixels: int) -> None:
+        """
+        add one call of a primitive to the statistics
+        :param name: primitive name
+        :param start: perf_counter_ns() value taken when the call started
+        :param pixels: number of pixels written by the call
+        :return: None
+        """
+        entry = self.stats.get(name)
+
+        if entry is None:
+            entry = self.stats[name] = [0, 0, 0]
+
+        entry[0] += 1
+        entry[1] += perf_counter_ns() - start
+        entry[2] += pixels
+
+    def _span(self, x: int, y: int, w: int) -> int:
+        """
+        fill a clipped horizontal span with the current pen
+        :param x: start x position
+        :param y: y position
+        :param w: width in pixel
+        :return: int (pixels written)
+        """
+        if y < self._clip_y1 or y >= self._clip_y2:
+            return 0
+
+        if x < self._clip_x1:
+            w -= self._clip_x1 - x
+            x = self._clip_x1
+
+        if x + w > self._clip_x2:
+            w = self._clip_x2 - x
+
+        if w <= 0:
+            return 0
+
+        offset = y * self.width + x
+        self._buffers[self._draw][offset:offset + w] = self._row[:w]
+        return w
+
+    def _fill_rect(self, x: int, y: int, w: int, h: int) -> int:
+        """
+        fill a rectangle with the current pen
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: int (pixels written)
+        """
+        pixels = 0
+
+        for row in range(int(y), int(y) + int(h)):
+            pixels += self._span(int(x), row, int(w))
+
+        return pixels
+
+    @property
+    def frame_buffer(self) -> array:
+        """
+        the framebuffer shown after the last update() call
+        :return: array
+        """
+        return self._buffers[self._draw ^ 1]
+
+    @property
+    def draw_buffer(self) -> array:
+        """
+        the framebuffer the primitives currently draw into
+        :return: array
+        """
+        return self._buffers[self._draw]
+
+    def get_bounds(self) -> tuple:
+        """
+        return display size
+        :return: tuple with width, height
+        """
+        return self.width, self.height
+
+    @staticmethod
+    def _rgb555(r: int, g: int, b: int) -> int:
+        """
+        convert a color to RGB555
+        :param r: red (0 - 255)
+        :param g: green (0 - 255)
+        :param b: blue (0 - 255)
+        :return: int
+        """
+        return ((int(r) >> 3) << 10) | ((int(g) >> 3) << 5) | (int(b) >> 3)
+
+    def create_pen(self, r: int, g: int, b: int) -> int:
+        """
+        create a RGB555 pen (or take the next free palette entry in PEN_P5 mode)
+        :param r: red (0 - 255)
+        :param g: green (0 - 255)
+        :param b: blue (0 - 255)
+        :return: int
+        """
+        if self.pen_type != PEN_P5:
+            return self._rgb555(r, g, b)
+
+        if self._palette_used == PALETTE_SIZE:
+            raise ValueError('palette is full')
+
+        pen = self._palette_used
+        self._palette[pen] = self._rgb555(r, g, b)
+        self._palette_used += 1
+        return pen
+
+    def update_pen(self, pen: int, r: int, g: int, b: int) -> None:
+        """
+        change the color of a palette entry (PEN_P5 mode only, drawn pixels change with it)
+        :param pen: palette index
+        :param r: red (0 - 255)
+        :param g: green (0 - 255)
+        :param b: blue (0 - 255)
+        :return: None
+        """
+        start = perf_counter_ns()
+
+        if self.pen_type != PEN_P5:
+            raise ValueError('update_pen needs a palette mode')
+
+        self._palette[pen] = self._rgb555(r, g, b)
+        self._palette_used = max(self._palette_used, pen + 1)
+        self._count('update_pen', start, 0)
+
+    def reset_pen(self, pen: int) -> None:
+        """
+        set a palette entry back to black (PEN_P5 mode only)
+        :param pen: palette index
+        :return: None
+        """
+        self.update_pen(pen, 0, 0, 0)
+
+    def set_pen(self, pen: int) -> None:
+        """
+        set the current pen
+        :param pen: pen value from create_pen()
+        :return: None
+        """
+        start = perf_counter_ns()
+
+        if pen != self._pen:
+            self._pen = pen
+            self._row = array(self._typecode, [pen]) * self.width
+
+        self._count('set_pen', start, 0)
+
+    def set_font(self, font: str) -> None:
+        """
+        select the text font (only the built-in bitmap font is emulated)
+        :param font: font name
+        :return: None
+        """
+        self._font = font
+
+    def set_clip(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        restrict drawing to a rectangle
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        self._clip_x1 = max(0, int(x))
+        self._clip_y1 = max(0, int(y))
+        self._clip_x2 = min(self.width, int(x) + int(w))
+        self._clip_y2 = min(self.height, int(y) + int(h))
+
+    def remove_clip(self) -> None:
+        """
+        remove the clipping rectangle
+        :return: None
+        """
+        self._clip_x1 = 0
+        self._clip_y1 = 0
+        self._clip_x2 = self.width
+        self._clip_y2 = self.height
+
+    def clear(self) -> None:
+        """
+        fill the clipping rectangle with the current pen
+        :return: None
+        """
+        start = perf_counter_ns()
+        pixels = self._fill_rect(self._clip_x1, self._clip_y1,
+                                 self._clip_x2 - self._clip_x1, self._clip_y2 - self._clip_y1)
+        self._count('clear', start, pixels)
+
+    def pixel(self, x: int, y: int) -> None:
+        """
+        set a single pixel
+        :param x: x position
+        :param y: y position
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._count('pixel', start, self._span(int(x), int(y), 1))
+
+    def pixel_span(self, x: int, y: int, length: int) -> None:
+        """
+        draw a horizontal span of pixels
+        :param x: x position
+        :param y: y position
+        :param length: span length
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._count('pixel_span', start, self._span(int(x), int(y), int(length)))
+
+    def rectangle(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        draw a filled rectangle
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._count('rectangle', start, self._fill_rect(x, y, w, h))
+
+    def circle(self, x: int, y: int, r: int) -> None:
+        """
+        draw a filled circle
+        :param x: center x position
+        :param y: center y position
+        :param r: radius
+        :return: None
+        """
+        start = perf_counter_ns()
+        x, y, r = int(x), int(y), int(r)
+        pixels = 0
+
+        for dy in range(-r, r + 1):
+            dx = int((r * r - dy * dy) ** 0.5)
+            pixels += self._span(x - dx, y + dy, dx * 2 + 1)
+
+        self._count('circle', start, pixels)
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, thickness: int = 1) -> None:
+        """
+        draw a line (thick lines use a square brush)
+        :param x1: start x position
+        :param y1: start y position
+        :param x2: end x position
+        :param y2: end y position
+        :param thickness: line thickness in pixel
+        :return: None
+        """
+        start = perf_counter_ns()
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        thickness = max(1, int(thickness))
+        offset = thickness // 2
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        error = dx + dy
+        pixels = 0
+
+        while True:
+            for row in range(thickness):
+                pixels += self._span(x1 - offset, y1 - offset + row, thickness)
+
+            if x1 == x2 and y1 == y2:
+                break
+
+            double_error = error * 2
+
+            if double_error >= dy:
+                error += dy
+                x1 += sx
+
+            if double_error <= dx:
+                error += dx
+                y1 += sy
+
+        self._count('line', start, pixels)
+
+    def measure_text(self, text: str, scale: int = 2, spacing: int = 1) -> int:
+        """
+        return the width of a text in pixel
+        :param text: text
+        :param scale: font scale
+        :param spacing: ignored
+        :return: int
+        """
+        return measure(text, int(scale))
+
+    def text(self, text: str, x: int, y: int, wordwrap: int = -1, scale: int = 2, angle: int = 0,
+             spacing: int = 1) -> None:
+        """
+        draw text with the emulated bitmap font
+        :param text: text
+        :param x: x position
+        :param y: y position
+        :param wordwrap: ignored
+        :param scale: font scale
+        :param angle: ignored
+        :param spacing: ignored
+        :return: None
+        """
+        start = perf_counter_ns()
+        x, y, scale = int(x), int(y), max(1, int(scale))
+        pixels = 0
+
+        for character in str(text):
+            offset = glyph(character)
+
+            if offset >= 0:
+                for column in range(GLYPH_WIDTH):
+                    bits = GLYPHS[offset + column]
+                    row = 0
+
+                    while bits:
+                        if bits & 1:
+                            for line in range(scale):
+                                pixels += self._span(x + column * scale, y + row * scale + line, scale)
+
+                        bits >>= 1
+                        row += 1
+
+            x += GLYPH_ADVANCE * scale
+
+        self._count('text', start, pixels)
+
+    def update(self) -> None:
+        """
+        show the drawn frame and swap buffers (the new draw buffer holds the frame before last)
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._draw ^= 1
+        self.frames += 1
+        session.frame = self.frames
+
+        if session.frame_us is not None:
+            session.clock_us += session.frame_us
+        self._count('update', start, 0)
+
+        if session.frame_limit is not None and self.frames >= session.frame_limit:
+            raise FrameLimitReached(self.frames)
+
+    def load_sprite(self, filename: str, index: int, source: tuple = None) -> None:
+        """
+        load an 8 bit RGB or RGBA PNG image (unfiltered rows only) as sprite image
+        :param filename: PNG file
+        :param index: sprite image index
+        :param source: ignored (source rectangle on the device)
+        :return: None
+        """
+        start = perf_counter_ns()
+
+        with open(filename, 'rb') as file:
+            data = file.read()
+
+        offset = 8
+        header = None
+        compressed = b''
+
+        while offset < len(data):
+            length = int.from_bytes(data[offset:offset + 4], 'big')
+            kind = data[offset + 4:offset + 8]
+            body = data[offset + 8:offset + 8 + length]
+            offset += length + 12
+
+            if kind == b'IHDR':
+                header = body
+            elif kind == b'IDAT':
+                compressed += body
+
+        width = int.from_bytes(header[0:4], 'big')
+        height = int.from_bytes(header[4:8], 'big')
+        channels = {2: 3, 6: 4}[header[9]]
+        raw = decompress(compressed)
+        stride = width * channels + 1
+        pixels = array('h', [-1] * (width * height))
+
+        for y in range(height):
+            if raw[y * stride]:
+                raise ValueError('filtered PNG rows are not supported')
+
+            for x in range(width):
+                i = y * stride + 1 + x * channels
+
+                if channels == 3 or raw[i + 3] >= 128:
+                    pixels[y * width + x] = self._rgb555(raw[i], raw[i + 1], raw[i + 2])
+
+        self._sprites[int(index)] = (width, height, pixels)
+        self._count('load_sprite', start, 0)
+
+    def display_sprite(self, slot: int, index: int, x: int, y: int, blend_mode: int = 0, v_scale: int = 1) -> None:
+        """
+        show a sprite image in a hardware sprite slot
+        :param slot: sprite slot
+        :param index: sprite image index
+        :param x: x position
+        :param y: y position
+        :param blend_mode: ignored
+        :param v_scale: ignored
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._slots[slot] = (int(index), int(x), int(y))
+        self._count('display_sprite', start, 0)
+
+    def clear_sprite(self, slot: int) -> None:
+        """
+        hide a hardware sprite slot
+        :param slot: sprite slot
+        :return: None
+        """
+        start = perf_counter_ns()
+        self._slots[slot] = None
+        self._count('clear_sprite', start, 0)
+
+    def composited(self) -> array:
+        """
+        return the shown frame as RGB555 pixels (palette applied) with the hardware sprites on top
+        :return: array
+        """
+        if self.pen_type == PEN_P5:
+            palette = self._palette
+            frame = array('H', [palette[pixel] for pixel in self.frame_buffer])
+        else:
+            frame = array('H', self.frame_buffer)
+
+        for entry in self._slots:
+            if entry is None or entry[0] not in self._sprites:
+                continue
+
+            index, sx, sy = entry
+            width, height, pixels = self._sprites[index]
+
+            for y in range(max(0, -sy), min(height, self.height - sy)):
+                for x in range(max(0, -sx), min(width, self.width - sx)):
+                    pixel = pixels[y * width + x]
+
+                    if pixel >= 0:
+                        frame[(sy + y) * self.width + sx + x] = pixel
+
+        return frame
+
+    def is_button_a_pressed(self) -> bool:
+        """
+        return scripted state of button A
+        :return: bool
+        """
+        return bool(session.buttons() & BUTTON_A)
+
+    def is_button_x_pressed(self) -> bool:
+        """
+        return scripted state of button X
+        :return: bool
+        """
+        return bool(session.buttons() & BUTTON_X)
+
+    def save_png(self, path: str) -> None:
+        """
+        write the shown framebuffer incl. hardware sprites as PNG image
+        :param path: file path
+        :return: None
+        """
+        raw = bytearray()
+        frame = self.composited()
+
+        for y in range(self.height):
+            raw.append(0)
+
+            for pixel in frame[y * self.width:(y + 1) * self.width]:
+                raw.append(((pixel >> 10) & 0x1f) << 3)
+                raw.append(((pixel >> 5) & 0x1f) << 3)
+                raw.append((pixel & 0x1f) << 3)
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return pack('>I', len(data)) + kind + data + pack('>I', crc32(kind + data))
+
+        with open(path, 'wb') as file:
+            file.write(b'\x89PNG\r\n\x1a\n')
+            file.write(chunk(b'IHDR', pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)))
+            file.write(chunk(b'IDAT', compress(bytes(raw))))
+            file.write(chunk(b'IEND', b''))
@@ -0,0 +1,78 @@
+"""
+host-side stand-in for the Pimoroni 'pimoroni' module (buttons read the emulator session script)
+"""
+from picovision import session, BUTTON_Y
+from utime import ticks_ms, ticks_diff
+
+
+# map of RP2040 GPIO pins to emulator button bits
+BUTTON_PINS = {9: BUTTON_Y}
+
+
+class Button:
+    def __init__(self, button: int, invert: bool = True, repeat_time: int = 200, hold_time: int = 1000):
+        """
+        button constructor
+        :param button: GPIO pin number
+        :param invert: ignored (scripted buttons are active high)
+        :param repeat_time: auto repeat time in milliseconds (0 = disabled)
+        :param hold_time: time in milliseconds after which the repeat rate triples
+        """
+        self._mask = BUTTON_PINS.get(button, 0)
+        self.repeat_time = repeat_time
+        self.hold_time = hold_time
+        self.pressed = False
+        self.last_state = False
+        self.pressed_time = 0
+        self.last_time = 0
+
+    def raw(self) -> bool:
+        """
+        return the current scripted level of the button
+        :return: bool
+        """
+        return bool(session.buttons() & self._mask)
+
+    def read(self) -> bool:
+        """
+        return True on press and on auto repeat (same behaviour as the firmware library)
+        :return: bool
+        """
+        current_time = ticks_ms()
+        state = self.raw()
+        changed = state != self.last_state
+        self.last_state = state
+
+        if changed:
+            if state:
+                self.pressed_time = current_time
+                self.pressed = True
+                self.last_time = current_time
+                return True
+
+            self.pressed_time = 0
+            self.pressed = False
+            self.last_time = 0
+
+        if self.repeat_time == 0:
+            return False
+
+        if self.pressed:
+            repeat_rate = self.repeat_time
+
+            if self.hold_time > 0 and ticks_diff(current_time, self.pressed_time) > self.hold_time:
+                repeat_rate /= 3
+
+            if ticks_diff(current_time, self.last_time) > repeat_rate:
+                self.last_time = current_time
+                return True
+
+        return False
+
+    @property
+    def is_pressed(self) -> bool:
+        """
+        return the current level of the button
+        :return: bool
+        """
+        return self.raw()
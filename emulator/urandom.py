@@ -0,0 +1,73 @@
+"""
+host-side stand-in for the MicroPython 'urandom' module (seedable for reproducible runs)
+"""
+import random as _random
+
+
+_rng = _random.Random(0)
+
+
+def seed(value: int = None) -> None:
+    """
+    seed the generator
+    :param value: seed as integer
+    :return: None
+    """
+    _rng.seed(value)
+
+
+def getrandbits(bits: int) -> int:
+    """
+    return an integer with the given number of random bits
+    :param bits: number of bits (1 - 32)
+    :return: int
+    """
+    return _rng.getrandbits(bits)
+
+
+def randrange(start: int, stop: int = None, step: int = 1) -> int:
+    """
+    return a random integer from range(start, stop, step)
+    :param start: start (or stop if stop is omitted)
+    :param stop: stop value
+    :param step: step value
+    :return: int
+    """
+    return _rng.randrange(start, stop, step)
+
+
+def randint(a: int, b: int) -> int:
+    """
+    return a random integer between a and b (inclusive)
+    :param a: lower bound
+    :param b: upper bound
+    :return: int
+    """
+    return _rng.randint(a, b)
+
+
+def choice(sequence):
+    """
+    return a random element of a non-empty sequence
+    :param sequence: sequence
+    :return: element
+    """
+    return _rng.choice(sequence)
+
+
+def random() -> float:
+    """
+    return a random float in the range 0.0 to 1.0
+    :return: float
+    """
+    return _rng.random()
+
+
+def uniform(a: float, b: float) -> float:
+    """
+    return a random float between a and b
+    :param a: lower bound
+    :param b: upper bound
+    :return: float
+    """
+    return _rng.uniform(a, b)
@@ -0,0 +1,100 @@
+"""
+host-side stand-in for the MicroPython 'utime' module
+
+Ticks come from the host clock, or from the virtual clock of the emulator session when the
+benchmark runner sets a fixed frame time (time then only advances with display.update()).
+"""
+from time import perf_counter_ns, sleep, time as _time
+from picovision import session
+
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+
+
+def _now_us() -> int:
+    """
+    return the current session time in microseconds
+    :return: int
+    """
+    if session.frame_us is not None:
+        return session.clock_us
+
+    return perf_counter_ns() // 1000
+
+
+def ticks_us() -> int:
+    """
+    return a microsecond counter (wraps like on the device)
+    :return: int
+    """
+    return _now_us() & TICKS_MAX
+
+
+def ticks_ms() -> int:
+    """
+    return a millisecond counter (wraps like on the device)
+    :return: int
+    """
+    return (_now_us() // 1000) & TICKS_MAX
+
+
+def ticks_cpu() -> int:
+    """
+    return the highest resolution counter available
+    :return: int
+    """
+    return ticks_us()
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    """
+    add a delta to a ticks value
+    :param ticks: ticks value
+    :param delta: delta (can be negative)
+    :return: int
+    """
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    """
+    return the signed difference ticks1 - ticks2 respecting the wrap around
+    :param ticks1: later ticks value
+    :param ticks2: earlier ticks value
+    :return: int
+    """
+    half = TICKS_PERIOD // 2
+    return ((ticks1 - ticks2 + half) & TICKS_MAX) - half
+
+
+def sleep_us(us: int) -> None:
+    """
+    sleep for microseconds (advances the virtual clock instead when it is active)
+    :param us: microseconds
+    :return: None
+    """
+    if us <= 0:
+        return
+
+    if session.frame_us is not None:
+        session.clock_us += int(us)
+    else:
+        sleep(us / 1e6)
+
+
+def sleep_ms(ms: int) -> None:
+    """
+    sleep for milliseconds
+    :param ms: milliseconds
+    :return: None
+    """
+    sleep_us(int(ms) * 1000)
+
+
+def time() -> int:
+    """
+    return seconds since the epoch
+    :return: int
+    """
+    return int(_time())
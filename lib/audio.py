@@ -0,0 +1,239 @@
+"""
+non-blocking sound effects, waveforms are precomputed at startup and a small mixer advances them once per tick
+"""
+from micropython import const
+from array import array
+from utime import ticks_us, ticks_diff
+
+try:
+    from machine import I2S, Pin
+except ImportError:
+    I2S = None
+
+
+SAMPLE_RATE = const(12000)
+TICK_SAMPLES = const(200)
+BUFFER_BYTES = const(2400)
+MAX_SOUNDS = const(8)
+VOICES = const(3)
+VOLUME = const(8000)
+PHASE_ONE = const(65536)
+PHASE_HALF = const(32768)
+NOISE_SEED = const(0xACE1)
+
+# I2S pins of the PicoVision audio DAC (3.5mm jack)
+I2S_ID = const(0)
+I2S_SD_PIN = const(26)
+I2S_SCK_PIN = const(27)
+I2S_WS_PIN = const(28)
+
+# play sounds if the board has I2S (False keeps the mixer silent)
+use_audio = True
+
+
+def square(start_hz: int, end_hz: int, duration_ms: int, volume: int = VOLUME) -> array:
+    """
+    precompute a square wave sweeping from one frequency to another with a linear fade out
+    :param start_hz: frequency at the start
+    :param end_hz: frequency at the end
+    :param duration_ms: duration in milliseconds
+    :param volume: peak amplitude (VOICES * volume must stay below 32768, the mixer does not clip)
+    :return: array with 16 bit samples
+    """
+    count = SAMPLE_RATE * duration_ms // 1000
+    samples = array('h', [0] * count)
+    phase = 0
+
+    for i in range(count):
+        frequency = start_hz + (end_hz - start_hz) * i // count
+        phase = (phase + frequency * PHASE_ONE // SAMPLE_RATE) % PHASE_ONE
+        level = volume * (count - i) // count
+        samples[i] = level if phase < PHASE_HALF else -level
+
+    return samples
+
+
+def noise(duration_ms: int, hold: int = 1, volume: int = VOLUME) -> array:
+    """
+    precompute white noise with a linear fade out (own generator, the game's urandom sequence is not touched)
+    :param duration_ms: duration in milliseconds
+    :param hold: samples every noise value is held (higher = deeper rumble)
+    :param volume: peak amplitude (VOICES * volume must stay below 32768, the mixer does not clip)
+    :return: array with 16 bit samples
+    """
+    count = SAMPLE_RATE * duration_ms // 1000
+    samples = array('h', [0] * count)
+    state = NOISE_SEED
+    value = 0
+
+    for i in range(count):
+        if not i % hold:
+            state ^= (state << 7) & 0xFFFF
+            state ^= state >> 9
+            state ^= (state << 8) & 0xFFFF
+            value = state - PHASE_HALF
+
+        samples[i] = value * (volume * (count - i) // count) >> 15
+
+    return samples
+
+
+class Mixer:
+    def __init__(self, voices: int = VOICES):
+        """
+        mixer constructor, opens the I2S output in non-blocking mode (all buffers are allocated up front)
+        :param voices: number of sounds played at the same time
+        """
+        self._sounds = []
+        self._voices = int(voices)
+        self._sound = array('b', [-1] * self._voices)
+        self._position = array('H', [0] * self._voices)
+        self._buffer = array('h', [0] * TICK_SAMPLES)
+        self._busy = False
+        self._i2s = None
+
+        self.enabled = use_audio and I2S is not None
+        self.played = 0
+        self.mixed = 0
+        self.late = 0
+        self.samples = 0
+        self.busy_us = 0
+        self.worst_us = 0
+
+        if self.enabled:
+            self._i2s = I2S(I2S_ID, sck=Pin(I2S_SCK_PIN), ws=Pin(I2S_WS_PIN), sd=Pin(I2S_SD_PIN), mode=I2S.TX,
+                            bits=16, format=I2S.MONO, rate=SAMPLE_RATE, ibuf=BUFFER_BYTES)
+            # a callback switches the I2S output to non-blocking writes
+            self._i2s.irq(self._written)
+
+    def _written(self, i2s) -> None:
+        """
+        I2S callback, the last written buffer was taken by the driver
+        :param i2s: I2S object
+        :return: None
+        """
+        self._busy = False
+
+    def add(self, samples: array) -> int:
+        """
+        register a precomputed sound (call during setup)
+        :param samples: array with 16 bit samples (e.g. from square() or noise())
+        :return: int (sound index)
+        """
+        if len(self._sounds) == MAX_SOUNDS:
+            raise ValueError('too many sounds')
+
+        self._sounds.append(samples)
+        return len(self._sounds) - 1
+
+    def play(self, sound: int) -> None:
+        """
+        start a sound with the next tick, fire and forget (a playing sound restarts, without a free voice the
+        voice playing the longest is taken)
+        :param sound: sound index
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        voices = self._sound
+        position = self._position
+        chosen = 0
+
+        for voice in range(self._voices):
+            if voices[voice] == sound:
+                chosen = voice
+                break
+
+            # prefer a free voice, then the voice playing the longest
+            if voices[chosen] >= 0 and (voices[voice] < 0 or position[voice] > position[chosen]):
+                chosen = voice
+
+        voices[chosen] = sound
+        position[chosen] = 0
+        self.played += 1
+
+    def tick(self) -> None:
+        """
+        write the next tick of the playing sounds to the I2S output without waiting (call once per tick,
+        a single sound is written from its precomputed buffer, only overlapping sounds are mixed)
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        start = ticks_us()
+        sounds = self._sounds
+        voices = self._sound
+        position = self._position
+        buffer = self._buffer
+        active = 0
+        single = 0
+        length = 0
+
+        for voice in range(self._voices):
+            if voices[voice] >= 0:
+                active += 1
+                single = voice
+
+        if not active:
+            return
+
+        if self._busy:
+            # the driver has not taken the last tick yet, skip this one instead of waiting
+            self.late += 1
+        elif active == 1:
+            samples = sounds[voices[single]]
+            offset = position[single]
+            length = min(TICK_SAMPLES, len(samples) - offset)
+            self._busy = True
+            self._i2s.write(memoryview(samples)[offset:offset + length])
+        else:
+            for voice in range(self._voices):
+                if voices[voice] < 0:
+                    continue
+
+                samples = sounds[voices[voice]]
+                offset = position[voice]
+                count = min(TICK_SAMPLES, len(samples) - offset)
+
+                for i in range(length, count):
+                    buffer[i] = 0
+
+                length = max(length, count)
+
+                for i in range(count):
+                    buffer[i] += samples[offset + i]
+
+            self.mixed += 1
+            self._busy = True
+            self._i2s.write(memoryview(buffer)[:length])
+
+        self.samples += length
+
+        for voice in range(self._voices):
+            if voices[voice] >= 0:
+                position[voice] += TICK_SAMPLES
+
+                if position[voice] >= len(sounds[voices[voice]]):
+                    voices[voice] = -1
+
+        elapsed = ticks_diff(ticks_us(), start)
+        self.busy_us += elapsed
+
+        if elapsed > self.worst_us:
+            self.worst_us = elapsed
+
+    def close(self) -> None:
+        """
+        stop all sounds and release the I2S output (call at game over)
+        :return: None
+        """
+        for voice in range(self._voices):
+            self._sound[voice] = -1
+
+        if self._i2s is not None:
+            self._i2s.deinit()
+            self._i2s = None
+
+        self.enabled = False
@@ -0,0 +1,160 @@
+"""
+fixed-point ballistic projectiles with gravity and wind, plus an incrementally computed trajectory preview
+"""
+from micropython import const
+from array import array
+from trig import sin_fixed, cos_fixed, to_fixed, to_int
+
+
+GRAVITY = const(205)
+WIND_STEP = const(20)
+MAX_DOTS = const(12)
+DOT_INTERVAL = const(4)
+STEPS_PER_FRAME = const(16)
+
+
+class Ballistics:
+    def __init__(self, gravity: int = GRAVITY, wind: int = 0):
+        """
+        ballistics constructor, all values are fixed-point pixels per tick squared (ONE = 1 px)
+        :param gravity: downward acceleration
+        :param wind: horizontal acceleration (negative = to the left)
+        """
+        self.gravity = int(gravity)
+        self.wind = int(wind)
+
+    def set_wind(self, wind: int) -> None:
+        """
+        change the horizontal acceleration (e.g. per level)
+        :param wind: horizontal acceleration in fixed-point pixels per tick squared
+        :return: None
+        """
+        self.wind = int(wind)
+
+    @staticmethod
+    def launch(projectile, x: int, y: int, degree: int, speed: int) -> None:
+        """
+        set start position and velocity of a projectile (any object with fx, fy, vx, vy, x, y attributes)
+        :param projectile: projectile
+        :param x: start x position in pixel
+        :param y: start y position in pixel
+        :param degree: launch angle in degrees
+        :param speed: launch speed in pixels per tick
+        :return: None
+        """
+        projectile.fx = to_fixed(x)
+        projectile.fy = to_fixed(y)
+        projectile.vx = speed * cos_fixed(degree)
+        projectile.vy = speed * sin_fixed(degree)
+        projectile.x = x
+        projectile.y = y
+
+    def step(self, projectile) -> None:
+        """
+        advance a projectile by one tick (semi-implicit Euler, integer only)
+        :param projectile: projectile
+        :return: None
+        """
+        projectile.vx += self.wind
+        projectile.vy += self.gravity
+        projectile.fx += projectile.vx
+        projectile.fy += projectile.vy
+        projectile.x = to_int(projectile.fx)
+        projectile.y = to_int(projectile.fy)
+
+
+class Trajectory:
+    def __init__(self, ballistics: Ballistics, dots: int = MAX_DOTS, interval: int = DOT_INTERVAL,
+                 steps_per_frame: int = STEPS_PER_FRAME):
+        """
+        trajectory preview constructor, the dotted path is simulated a few ticks per frame and cached
+        :param ballistics: ballistics used for the shells
+        :param dots: maximum number of dots
+        :param interval: ticks between two dots
+        :param steps_per_frame: simulated ticks per call of advance()
+        """
+        self._ballistics = ballistics
+        self._interval = int(interval)
+        self._steps_per_frame = int(steps_per_frame)
+        self._dots = array('h', [0] * (int(dots) * 2))
+        self._aim = array('l', [0] * 5)
+        self._valid = False
+        self._ticks = 0
+        self._done = True
+
+        self.count = 0
+        self.fx = 0
+        self.fy = 0
+        self.vx = 0
+        self.vy = 0
+        self.x = 0
+        self.y = 0
+
+    def aim(self, x: int, y: int, degree: int, speed: int) -> None:
+        """
+        start a new preview if launch parameters or wind changed (otherwise the cached dots are kept)
+        :param x: start x position in pixel
+        :param y: start y position in pixel
+        :param degree: launch angle in degrees
+        :param speed: launch speed in pixels per tick
+        :return: None
+        """
+        wind = self._ballistics.wind
+        aim = self._aim
+
+        if aim[0] == x and aim[1] == y and aim[2] == degree and aim[3] == speed and aim[4] == wind and self._valid:
+            return
+
+        aim[0], aim[1], aim[2], aim[3], aim[4] = x, y, degree, speed, wind
+        self._valid = True
+        self._ballistics.launch(self, x, y, degree, speed)
+        self._ticks = 0
+        self._done = False
+        self.count = 0
+
+    def invalidate(self) -> None:
+        """
+        drop the cached preview, the next aim() simulates it again (e.g. after the terrain changed)
+        :return: None
+        """
+        self._valid = False
+
+    def advance(self, blocked=None) -> None:
+        """
+        simulate the next few ticks of the preview
+        :param blocked: callable(x, y) returning True where the path ends (optional)
+        :return: None
+        """
+        if self._done:
+            return
+
+        dots = self._dots
+        limit = len(dots) // 2
+
+        for _ in range(self._steps_per_frame):
+            self._ballistics.step(self)
+            self._ticks += 1
+
+            if blocked is not None and blocked(self.x, self.y):
+                self._done = True
+                return
+
+            if self._ticks % self._interval == 0:
+                dots[self.count * 2] = self.x
+                dots[self.count * 2 + 1] = self.y
+                self.count += 1
+
+                if self.count == limit:
+                    self._done = True
+                    return
+
+    def draw(self, screen) -> None:
+        """
+        draw the computed dots
+        :param screen: display
+        :return: None
+        """
+        dots = self._dots
+
+        for i in range(self.count):
+            screen.pixel(dots[i * 2], dots[i * 2 + 1])
@@ -0,0 +1,24 @@
+"""
+packed assets generated by tools/compile_assets.py from assets/battle_tank.txt (do not edit)
+"""
+from micropython import const
+
+
+TANK_BODY_WIDTH = const(20)
+TANK_BODY_HEIGHT = const(11)
+TANK_BODY = b'\n\x00\x01\x01\x07\x01\x07\x01\x06\x02\t\x03\x00\x05\x14\x06'
+
+ENEMY_SHIP_WIDTH = const(11)
+ENEMY_SHIP_HEIGHT = const(5)
+ENEMY_SHIP = (
+    b'\x03\x00\x05\x01\x01\x01\t\x01\x00\x02\x02\x01\x03\x02\x02\x01'
+    b'\x06\x02\x02\x01\t\x02\x02\x01\x01\x03\t\x01\x02\x04\x01\x01'
+    b'\x08\x04\x01\x01'
+)
+
+BUILDINGS_FORMAT = '<HBBBBB'
+BUILDINGS_SIZE = const(7)
+BUILDINGS = (
+    b'#\x002Z\x01\x01\x00\x8c\x00(d\x00\x00\x01\xc8\x00'
+    b'(P\x00\x01\x00'
+)
@@ -0,0 +1,135 @@
+"""
+fixed timestep game loop with frame pacing shared by all games
+"""
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+
+TICK_RATE = const(60)
+MAX_TICKS_PER_FRAME = const(4)
+
+
+class GameLoop:
+    def __init__(self, update, render, idle=None, tick_rate: int = TICK_RATE, max_ticks: int = MAX_TICKS_PER_FRAME,
+                 profiler=None, trace=None):
+        """
+        game loop constructor
+        :param update: function advancing the game by one fixed tick
+        :param render: function drawing and showing one frame
+        :param idle: function called after each frame with the remaining slack until the next tick in microseconds
+        :param tick_rate: update ticks per second
+        :param max_ticks: maximum number of ticks caught up per frame (excess ticks are dropped)
+        :param profiler: profiler timing the update, render and idle phases (optional)
+        :param trace: input recorder or player (a replay stops the loop at its end and may run unthrottled)
+        """
+        # the timed phases are only called while the profiler records, otherwise the functions are called directly
+        self._calls = (update, render, idle)
+        self._timed = self._calls
+
+        if profiler is not None:
+            self._timed = (profiler.wrap('update', update), profiler.wrap('render', render),
+                           profiler.wrap('idle', idle) if idle is not None else None)
+
+        self._profiler = profiler
+        self._trace = trace
+        self._max_ticks = int(max_ticks)
+        self.tick_us = 1000000 // int(tick_rate)
+        self.running = False
+        self.started_us = 0
+        self.last_frame_us = 0
+
+        self.frames = 0
+        self.ticks = 0
+        self.missed = 0
+        self.dropped = 0
+        self.worst_us = 0
+
+    def stop(self) -> None:
+        """
+        stop the loop after the current tick
+        :return: None
+        """
+        self.running = False
+
+    def run(self) -> None:
+        """
+        run update ticks at the fixed tick rate and render once per loop pass until stop() is called
+        (unthrottled replays run exactly one tick per pass and render only every n-th tick)
+        :return: None
+        """
+        trace = self._trace
+        profiler = self._profiler
+        unthrottled = trace is not None and trace.unthrottled
+        render_interval = trace.render_interval if unthrottled else 1
+        tick_us = self.tick_us
+        accumulator = 0
+        last = ticks_us()
+        self.started_us = last
+        self.running = True
+
+        while self.running:
+            now = ticks_us()
+            elapsed = ticks_diff(now, last)
+            last = now
+
+            self.last_frame_us = elapsed
+
+            if elapsed > tick_us:
+                self.missed += 1
+
+            if elapsed > self.worst_us:
+                self.worst_us = elapsed
+
+            accumulator = tick_us if unthrottled else accumulator + elapsed
+            ticks = 0
+            update, render, idle = self._timed if profiler is not None and profiler.enabled else self._calls
+
+            while accumulator >= tick_us and self.running:
+                if ticks == self._max_ticks:
+                    self.dropped += accumulator // tick_us
+                    accumulator %= tick_us
+                    break
+
+                update()
+                self.ticks += 1
+                accumulator -= tick_us
+                ticks += 1
+
+            if not self.running:
+                break
+
+            # a finished replay still renders its last tick
+            finished = trace is not None and trace.finished
+
+            if self.ticks % render_interval and not finished:
+                continue
+
+            render()
+            self.frames += 1
+
+            # the frame is closed before idle, so a collection in idle does not count as negative allocation
+            if profiler is not None:
+                profiler.frame()
+
+            if idle is not None:
+                slack = tick_us - accumulator - ticks_diff(ticks_us(), now)
+                idle(slack if slack > 0 else 0)
+
+                if profiler is not None:
+                    profiler.rebase_alloc()
+
+            if finished:
+                self.running = False
+
+    def stats(self) -> dict:
+        """
+        return loop statistics
+        :return: dict with frames, ticks, missed deadlines, dropped ticks and worst frame time in microseconds
+        """
+        return {
+            'frames': self.frames,
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'dropped': self.dropped,
+            'worst_us': self.worst_us,
+        }
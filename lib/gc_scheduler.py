@@ -0,0 +1,95 @@
+"""
+budgeted garbage collection scheduler replacing unconditional gc.collect() calls
+"""
+from micropython import const
+from utime import ticks_us, ticks_diff
+import gc
+
+
+ALLOC_THRESHOLD = const(16384)
+MIN_ALLOC = const(1024)
+MIN_FREE = const(24576)
+INITIAL_PAUSE_US = const(3000)
+
+
+class GCScheduler:
+    def __init__(self, threshold: int = ALLOC_THRESHOLD, min_alloc: int = MIN_ALLOC, min_free: int = MIN_FREE):
+        """
+        garbage collection scheduler constructor
+        :param threshold: allocated bytes since the last collection which force a collection
+        :param min_alloc: allocated bytes since the last collection needed for a collection in frame slack
+        :param min_free: free heap bytes below which a collection is forced
+        """
+        self._threshold = int(threshold)
+        self._min_alloc = int(min_alloc)
+        self._min_free = int(min_free)
+        self._estimate_us = INITIAL_PAUSE_US
+
+        gc.collect()
+        self._baseline = gc.mem_alloc()
+
+        self.collections = 0
+        self.forced = 0
+        self.pause_us = 0
+        self.worst_pause_us = 0
+        self.high_water = self._baseline
+
+        # backstop: let the runtime collect on its own if the allocation threshold is overrun inside a frame
+        self._previous_threshold = gc.threshold()
+        gc.threshold(self._threshold * 2)
+
+    def collect(self, slack_us: int = 0) -> bool:
+        """
+        collect garbage if allocation crossed the threshold, the free heap is low,
+        or the remaining frame time is longer than the expected pause
+        :param slack_us: remaining time in the current frame budget in microseconds
+        :return: bool (True if a collection was done)
+        """
+        allocated = gc.mem_alloc()
+
+        if allocated > self.high_water:
+            self.high_water = allocated
+
+        grown = allocated - self._baseline
+        forced = grown >= self._threshold or gc.mem_free() < self._min_free
+
+        if not forced and (grown < self._min_alloc or slack_us < self._estimate_us):
+            return False
+
+        start = ticks_us()
+        gc.collect()
+        pause = ticks_diff(ticks_us(), start)
+
+        self._baseline = gc.mem_alloc()
+        self._estimate_us = (self._estimate_us * 3 + pause) // 4
+        self.collections += 1
+        self.pause_us += pause
+
+        if forced:
+            self.forced += 1
+
+        if pause > self.worst_pause_us:
+            self.worst_pause_us = pause
+
+        return True
+
+    def close(self) -> None:
+        """
+        restore the automatic collection threshold set before the scheduler was created (call at game over,
+        otherwise the launcher and the next game keep the backstop of this game)
+        :return: None
+        """
+        gc.threshold(self._previous_threshold)
+
+    def stats(self) -> dict:
+        """
+        return garbage collection statistics
+        :return: dict with collections, forced collections, pause times in microseconds and heap high-water mark
+        """
+        return {
+            'collections': self.collections,
+            'forced': self.forced,
+            'pause_us': self.pause_us,
+            'worst_pause_us': self.worst_pause_us,
+            'high_water': self.high_water,
+        }
@@ -0,0 +1,67 @@
+"""
+change-driven HUD labels drawn with the firmware font
+"""
+from renderer import BUFFERS, FONT_HEIGHT
+
+
+_UNSET = object()
+
+
+class Label:
+    def __init__(self, renderer, x: int, y: int, template: str, pen: int, scale: int = 1):
+        """
+        label constructor, the text is formatted and measured only when the bound value changes
+        :param renderer: renderer (labels draw directly on its display and track restored regions)
+        :param x: x position
+        :param y: y position
+        :param template: format string with one placeholder for the value (e.g. 'Score {}')
+        :param pen: text pen
+        :param scale: font scale
+        """
+        self._renderer = renderer
+        self._display = renderer.display
+        self._template = template
+        self._pen = pen
+        self._scale = int(scale)
+        self._value = _UNSET
+        self._text = ''
+        self._pending = 0
+
+        self.x = int(x)
+        self.y = int(y)
+        self.width = 0
+        self.height = FONT_HEIGHT * self._scale
+        self.clear_width = 0
+
+    def set(self, value=None) -> None:
+        """
+        bind a new value (formats and measures only if the value changed)
+        :param value: value for the template placeholder
+        :return: None
+        """
+        if value == self._value:
+            return
+
+        self._text = self._template.format(value)
+        self._value = value
+        self.width = self._display.measure_text(self._text, self._scale)
+        self.clear_width = max(self.clear_width, self.width)
+        self._pending = BUFFERS
+
+    def draw(self, value=None) -> None:
+        """
+        bind a value and draw the label if it changed or its region was cleared in this frame
+        (call right after renderer.begin(), before moving entities are drawn)
+        :param value: value for the template placeholder
+        :return: None
+        """
+        self.set(value)
+
+        if self._pending:
+            self._renderer.restore(self.x, self.y, self.clear_width, self.height)
+            self._pending -= 1
+        elif not self._renderer.was_restored(self.x, self.y, self.width, self.height):
+            return
+
+        self._display.set_pen(self._pen)
+        self._display.text(self._text, self.x, self.y, -1, self._scale)
@@ -0,0 +1,204 @@
+"""
+shared input manager with cached buttons, debouncing, edge detection, auto repeat and event queue
+"""
+from micropython import const
+from pimoroni import Button
+from array import array
+
+
+BUTTON_A = const(1)
+BUTTON_X = const(2)
+BUTTON_Y = const(4)
+BUTTON_COUNT = const(3)
+BUTTON_Y_PIN = const(9)
+
+EVENT_PRESSED = const(0x10)
+EVENT_RELEASED = const(0x20)
+EVENT_REPEAT = const(0x30)
+
+DEBOUNCE_TICKS = const(2)
+REPEAT_DELAY = const(24)
+REPEAT_RATE = const(6)
+QUEUE_SIZE = const(16)
+
+
+class InputManager:
+    def __init__(self, screen, debounce: int = DEBOUNCE_TICKS, repeat_delay: int = REPEAT_DELAY,
+                 repeat_rate: int = REPEAT_RATE):
+        """
+        input manager constructor, creates the button objects once
+        :param screen: display (buttons A and X are read through the display)
+        :param debounce: number of equal samples needed to accept a level change
+        :param repeat_delay: ticks a button is held before auto repeat starts
+        :param repeat_rate: ticks between auto repeat events
+        """
+        self._display = screen
+        self._button_y = Button(BUTTON_Y_PIN, invert=True, repeat_time=0)
+        self._source = None
+        self._reserved = 0
+        self._debounce = max(1, int(debounce))
+        self._repeat_delay = int(repeat_delay)
+        self._repeat_rate = max(1, int(repeat_rate))
+
+        self._candidate = 0
+        self._stable = array('B', [0] * BUTTON_COUNT)
+        self._held_ticks = array('H', [0] * BUTTON_COUNT)
+        self._queue = bytearray(QUEUE_SIZE)
+        self._head = 0
+        self._tail = 0
+
+        self.raw = 0
+        self.state = 0
+        self.pressed_mask = 0
+        self.released_mask = 0
+        self.repeat_mask = 0
+        self.reserved_held = False
+
+    def set_source(self, source=None) -> None:
+        """
+        replace the hardware buttons by another input source (e.g. replay or scripted input)
+        :param source: callable returning a BUTTON_* bitmask per tick (None = hardware buttons)
+        :return: None
+        """
+        self._source = source
+
+    def reserve(self, combo: int) -> None:
+        """
+        reserve a button combination for system functions (e.g. the profiler overlay): while all its buttons
+        are held, the game and an input trace see none of them
+        :param combo: BUTTON_* bitmask (0 = nothing reserved)
+        :return: None
+        """
+        self._reserved = int(combo)
+
+    def read_raw(self) -> int:
+        """
+        read the current button levels as BUTTON_* bitmask
+        :return: int
+        """
+        if self._source is not None:
+            return self._source()
+
+        return self.read_buttons()
+
+    def read_buttons(self) -> int:
+        """
+        read the hardware button levels as BUTTON_* bitmask (ignores the input source, a held reserved
+        combination is removed)
+        :return: int
+        """
+        mask = 0
+
+        if self._display.is_button_a_pressed():
+            mask |= BUTTON_A
+
+        if self._display.is_button_x_pressed():
+            mask |= BUTTON_X
+
+        if self._button_y.raw():
+            mask |= BUTTON_Y
+
+        reserved = self._reserved
+        self.reserved_held = bool(reserved) and mask & reserved == reserved
+
+        if self.reserved_held:
+            mask &= ~reserved
+
+        return mask
+
+    def _push(self, event: int) -> None:
+        """
+        add an event to the queue (the oldest event is dropped if the queue is full)
+        :param event: EVENT_* combined with the button index
+        :return: None
+        """
+        self._queue[self._head] = event
+        self._head = (self._head + 1) % QUEUE_SIZE
+
+        if self._head == self._tail:
+            self._tail = (self._tail + 1) % QUEUE_SIZE
+
+    def sample(self) -> None:
+        """
+        sample all buttons once per tick and update states, edges, repeats and events
+        :return: None
+        """
+        self.raw = self.read_raw()
+        previous = self.state
+        self.pressed_mask = 0
+        self.released_mask = 0
+        self.repeat_mask = 0
+
+        for index in range(BUTTON_COUNT):
+            bit = 1 << index
+            level = self.raw & bit
+
+            if level != self._candidate & bit:
+                self._candidate ^= bit
+                self._stable[index] = 1
+            elif self._stable[index] < self._debounce:
+                self._stable[index] += 1
+
+            if self._stable[index] >= self._debounce and (previous & bit) != level:
+                self.state ^= bit
+
+                if level:
+                    self.pressed_mask |= bit
+                    self.repeat_mask |= bit
+                    self._held_ticks[index] = 0
+                    self._push(EVENT_PRESSED | index)
+                else:
+                    self.released_mask |= bit
+                    self._push(EVENT_RELEASED | index)
+
+            elif self.state & bit:
+                ticks = self._held_ticks[index] + 1
+                self._held_ticks[index] = ticks
+
+                if ticks >= self._repeat_delay and (ticks - self._repeat_delay) % self._repeat_rate == 0:
+                    self.repeat_mask |= bit
+                    self._push(EVENT_REPEAT | index)
+
+    def held(self, button: int) -> bool:
+        """
+        return whether a button is held down (debounced)
+        :param button: BUTTON_* constant
+        :return: bool
+        """
+        return bool(self.state & button)
+
+    def pressed(self, button: int) -> bool:
+        """
+        return whether a button went down in this tick
+        :param button: BUTTON_* constant
+        :return: bool
+        """
+        return bool(self.pressed_mask & button)
+
+    def released(self, button: int) -> bool:
+        """
+        return whether a button went up in this tick
+        :param button: BUTTON_* constant
+        :return: bool
+        """
+        return bool(self.released_mask & button)
+
+    def repeated(self, button: int) -> bool:
+        """
+        return whether a button went down or auto repeated in this tick
+        :param button: BUTTON_* constant
+        :return: bool
+        """
+        return bool(self.repeat_mask & button)
+
+    def poll_event(self) -> int:
+        """
+        return the oldest queued event (EVENT_* | button index) or 0 if the queue is empty
+        :return: int
+        """
+        if self._head == self._tail:
+            return 0
+
+        event = self._queue[self._tail]
+        self._tail = (self._tail + 1) % QUEUE_SIZE
+        return event
@@ -0,0 +1,101 @@
+"""
+bit-packed occupancy map for pixel exact enough world collision (one bit per square cell)
+"""
+from micropython import const
+
+
+CELL_SIZE = const(2)
+
+
+class OccupancyMap:
+    def __init__(self, width: int, height: int, cell: int = CELL_SIZE):
+        """
+        occupancy map constructor (320x240 pixels with 2 pixel cells need 2400 bytes)
+        :param width: width in pixels
+        :param height: height in pixels
+        :param cell: cell size in pixels
+        """
+        self.width = int(width)
+        self.height = int(height)
+        self.cell = int(cell)
+        self.columns = (self.width + self.cell - 1) // self.cell
+        self.rows = (self.height + self.cell - 1) // self.cell
+        self.stride = (self.columns + 7) // 8
+        self.bits = bytearray(self.stride * self.rows)
+
+    def is_solid(self, x: int, y: int) -> bool:
+        """
+        return whether the cell containing a pixel is solid (outside the map is empty)
+        :param x: x position in pixels
+        :param y: y position in pixels
+        :return: bool
+        """
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+
+        column = x // self.cell
+        return bool(self.bits[(y // self.cell) * self.stride + (column >> 3)] & (1 << (column & 7)))
+
+    def _set_span(self, row: int, first: int, last: int, solid: bool) -> None:
+        """
+        set or clear the cells first to last (inclusive) of a row
+        :param row: cell row
+        :param first: first cell column
+        :param last: last cell column
+        :param solid: set (True) or clear (False) the cells
+        :return: None
+        """
+        bits = self.bits
+        offset = row * self.stride
+
+        for column in range(max(0, first), min(self.columns - 1, last) + 1):
+            if solid:
+                bits[offset + (column >> 3)] |= 1 << (column & 7)
+            else:
+                bits[offset + (column >> 3)] &= ~(1 << (column & 7))
+
+    def fill_rect(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        mark all cells touched by a rectangle as solid
+        :param x: x position in pixels
+        :param y: y position in pixels
+        :param w: width in pixels
+        :param h: height in pixels
+        :return: None
+        """
+        if w <= 0 or h <= 0:
+            return
+
+        first = x // self.cell
+        last = (x + w - 1) // self.cell
+
+        for row in range(max(0, y // self.cell), min(self.rows - 1, (y + h - 1) // self.cell) + 1):
+            self._set_span(row, first, last, True)
+
+    def clear_circle(self, x: int, y: int, r: int) -> None:
+        """
+        mark all cells with their center inside a circle as empty (integer squared distances only)
+        :param x: center x position in pixels
+        :param y: center y position in pixels
+        :param r: radius in pixels
+        :return: None
+        """
+        cell = self.cell
+        half = cell // 2
+        radius_squared = r * r
+
+        for row in range(max(0, (y - r) // cell), min(self.rows - 1, (y + r) // cell) + 1):
+            dy = row * cell + half - y
+            first = last = None
+
+            for column in range((x - r) // cell, (x + r) // cell + 1):
+                dx = column * cell + half - x
+
+                if dx * dx + dy * dy <= radius_squared:
+                    if first is None:
+                        first = column
+
+                    last = column
+
+            if first is not None:
+                self._set_span(row, first, last, False)
@@ -0,0 +1,150 @@
+"""
+central pen manager, each game declares its colors once and runs in the 5 bit palette mode of the PicoVision
+"""
+from micropython import const
+from array import array
+from picovision import PEN_P5, PEN_RGB555
+
+
+MAX_COLORS = const(32)
+BLEND_ONE = const(256)
+
+# run the games in palette mode (False = RGB555, palette effects are not shown then)
+use_palette = True
+
+
+def pen_type() -> int:
+    """
+    return the pen type the display has to be created with
+    :return: int
+    """
+    return PEN_P5 if use_palette else PEN_RGB555
+
+
+class Palette:
+    def __init__(self, screen, colors: tuple):
+        """
+        palette constructor, creates one pen per color (the pens are the palette entries in palette mode)
+        :param screen: display (created with pen_type())
+        :param colors: tuple with one (red, green, blue) tuple per pen
+        """
+        if len(colors) > MAX_COLORS:
+            raise ValueError('too many colors')
+
+        self._display = screen
+        self._count = len(colors)
+        self._base = array('B', [0] * (self._count * 3))
+        self._flash = array('H', [0] * self._count)
+        self._flashing = 0
+
+        self.indexed = screen.pen_type == PEN_P5
+        self.pens = []
+
+        for index, (r, g, b) in enumerate(colors):
+            self._base[index * 3] = r
+            self._base[index * 3 + 1] = g
+            self._base[index * 3 + 2] = b
+
+            if self.indexed:
+                screen.update_pen(index, r, g, b)
+                self.pens.append(index)
+            else:
+                self.pens.append(screen.create_pen(r, g, b))
+
+    def color(self, pen: int) -> tuple:
+        """
+        return the base color of a pen (e.g. for sprite images)
+        :param pen: pen
+        :return: tuple with red, green, blue
+        """
+        index = self.pens.index(pen) * 3
+        return self._base[index], self._base[index + 1], self._base[index + 2]
+
+    def set_color(self, pen: int, r: int, g: int, b: int) -> bool:
+        """
+        change the base color of a pen, all pixels drawn with it change without redrawing (palette mode only)
+        :param pen: pen
+        :param r: red (0 - 255)
+        :param g: green (0 - 255)
+        :param b: blue (0 - 255)
+        :return: bool (False if the display has no palette)
+        """
+        if not self.indexed:
+            return False
+
+        index = pen * 3
+        self._base[index] = r
+        self._base[index + 1] = g
+        self._base[index + 2] = b
+
+        if not self._flash[pen]:
+            self._display.update_pen(pen, r, g, b)
+
+        return True
+
+    def blend(self, pen: int, day: tuple, night: tuple, amount: int) -> bool:
+        """
+        set the base color of a pen between two colors (e.g. for a day and night cycle)
+        :param pen: pen
+        :param day: (red, green, blue) tuple for amount 0
+        :param night: (red, green, blue) tuple for amount BLEND_ONE
+        :param amount: blend factor 0 - BLEND_ONE
+        :return: bool (False if the display has no palette)
+        """
+        rest = BLEND_ONE - amount
+        return self.set_color(pen, (day[0] * rest + night[0] * amount) >> 8, (day[1] * rest + night[1] * amount) >> 8,
+                              (day[2] * rest + night[2] * amount) >> 8)
+
+    def flash(self, pen: int, r: int, g: int, b: int, ticks: int) -> bool:
+        """
+        show a pen in another color for a number of ticks (restored by tick())
+        :param pen: pen
+        :param r: red (0 - 255)
+        :param g: green (0 - 255)
+        :param b: blue (0 - 255)
+        :param ticks: duration in ticks
+        :return: bool (False if the display has no palette)
+        """
+        if not self.indexed:
+            return False
+
+        if not self._flash[pen]:
+            self._flashing += 1
+
+        self._flash[pen] = ticks
+        self._display.update_pen(pen, r, g, b)
+        return True
+
+    def restore(self) -> None:
+        """
+        end all running flashes at once (e.g. at game over)
+        :return: None
+        """
+        flash = self._flash
+        base = self._base
+
+        for pen in range(self._count):
+            if flash[pen]:
+                flash[pen] = 0
+                self._display.update_pen(pen, base[pen * 3], base[pen * 3 + 1], base[pen * 3 + 2])
+
+        self._flashing = 0
+
+    def tick(self) -> None:
+        """
+        count down the running flashes and restore their base colors (call once per tick)
+        :return: None
+        """
+        if not self._flashing:
+            return
+
+        flash = self._flash
+        base = self._base
+
+        for pen in range(self._count):
+            if flash[pen]:
+                flash[pen] -= 1
+
+                if not flash[pen]:
+                    self._flashing -= 1
+                    self._display.update_pen(pen, base[pen * 3], base[pen * 3 + 1], base[pen * 3 + 2])
@@ -0,0 +1,226 @@
+"""
+fixed-capacity particle system for explosions and debris, stored in parallel arrays (no allocation per spawn)
+"""
+from micropython import const
+from array import array
+from trig import FIXED_SHIFT, SIN_TABLE
+
+
+MAX_PARTICLES = const(256)
+MIN_BUDGET = const(32)
+BUDGET_STEP = const(8)
+MAX_GROUPS = const(8)
+SUBPIXEL_SHIFT = const(4)
+GRAVITY = const(2)
+RANDOM_SEED = const(0x2F6B)
+TICK_US = const(16666)
+
+
+class Particles:
+    def __init__(self, renderer, capacity: int = MAX_PARTICLES, gravity: int = GRAVITY, tick_us: int = TICK_US):
+        """
+        particle system constructor, all arrays are allocated up front
+        :param renderer: renderer (particles are drawn on its display and their regions are marked dirty)
+        :param capacity: maximum number of living particles
+        :param gravity: velocity added downwards per tick in sub pixels (16 = 1 px)
+        :param tick_us: frame time budget in microseconds (frames a quarter longer lower the particle budget)
+        """
+        self._renderer = renderer
+        self._display = renderer.display
+        self._width, self._height = renderer.display.get_bounds()
+        self._capacity = int(capacity)
+        self._gravity = int(gravity)
+        self._limit_us = int(tick_us) * 5 // 4
+        self._x = array('h', [0] * self._capacity)
+        self._y = array('h', [0] * self._capacity)
+        self._vx = array('h', [0] * self._capacity)
+        self._vy = array('h', [0] * self._capacity)
+        self._life = array('h', [0] * self._capacity)
+        self._group = array('B', [0] * self._capacity)
+        self._group_pen = array('H', [0] * MAX_GROUPS)
+        self._group_count = array('H', [0] * MAX_GROUPS)
+        self._bounds = array('h', [0] * (MAX_GROUPS * 4))
+        self._random = RANDOM_SEED
+
+        self.count = 0
+        self.budget = self._capacity
+        self.spawned = 0
+        self.dropped = 0
+
+    def burst(self, x: int, y: int, count: int, speed: int, life: int, pen: int) -> int:
+        """
+        spawn particles flying from a point in all directions (fewer if the budget or the capacity is exhausted,
+        none if all groups are alive with other pens)
+        :param x: x position in pixel
+        :param y: y position in pixel
+        :param count: wanted number of particles
+        :param speed: maximum speed in sub pixels per tick (16 = 1 px)
+        :param life: maximum lifetime in ticks
+        :param pen: pen of the particles
+        :return: int (number of spawned particles)
+        """
+        wanted = count
+        count = min(count * self.budget // self._capacity, self._capacity - self.count)
+        self.dropped += wanted - max(0, count)
+
+        if count <= 0:
+            return 0
+
+        group = self._find_group(pen)
+
+        if group < 0:
+            self.dropped += count
+            return 0
+
+        self._group_pen[group] = pen
+        self._group_count[group] += count
+        px = x << SUBPIXEL_SHIFT
+        py = y << SUBPIXEL_SHIFT
+        seed = self._random
+        index = self.count
+
+        for _ in range(count):
+            # xorshift, the game's urandom sequence is not touched
+            seed ^= (seed << 7) & 0xFFFF
+            seed ^= seed >> 9
+            seed ^= (seed << 8) & 0xFFFF
+            angle = seed % 360
+            velocity = (seed >> 8) * speed >> 8
+
+            self._x[index] = px
+            self._y[index] = py
+            self._vx[index] = (SIN_TABLE[(angle + 90) % 360] * velocity) >> FIXED_SHIFT
+            self._vy[index] = (SIN_TABLE[angle] * velocity) >> FIXED_SHIFT
+            self._life[index] = life // 2 + (seed & 0xFF) * life // 512
+            self._group[index] = group
+            index += 1
+
+        self._random = seed
+        self.count = index
+        self.spawned += count
+        return count
+
+    def _find_group(self, pen: int) -> int:
+        """
+        return a group without living particles, or else a living group with the same pen
+        :param pen: pen of the new particles
+        :return: int (-1 if no group can take the particles)
+        """
+        counts = self._group_count
+        same_pen = -1
+
+        for group in range(MAX_GROUPS):
+            if not counts[group]:
+                return group
+
+            if same_pen < 0 and self._group_pen[group] == pen:
+                same_pen = group
+
+        return same_pen
+
+    def update(self, frame_us: int = 0) -> None:
+        """
+        move all particles by one tick in a single loop, remove the expired and the ones off-screen, and adapt
+        the budget (lowered while frames take longer than the tick, raised slowly again afterwards)
+        :param frame_us: duration of the last frame in microseconds (e.g. GameLoop.last_frame_us)
+        :return: None
+        """
+        if frame_us > self._limit_us:
+            self.budget = max(MIN_BUDGET, self.budget * 3 // 4)
+        elif self.budget < self._capacity:
+            self.budget = min(self._capacity, self.budget + BUDGET_STEP)
+
+        x = self._x
+        y = self._y
+        vx = self._vx
+        vy = self._vy
+        life = self._life
+        group = self._group
+        counts = self._group_count
+        gravity = self._gravity
+        right = self._width << SUBPIXEL_SHIFT
+        bottom = self._height << SUBPIXEL_SHIFT
+        count = self.count
+        i = 0
+
+        while i < count:
+            life[i] -= 1
+            x[i] += vx[i]
+            y[i] += vy[i]
+            vy[i] += gravity
+
+            if life[i] > 0 and 0 <= x[i] < right and 0 <= y[i] < bottom:
+                i += 1
+                continue
+
+            # the last particle takes the free place, the living particles stay packed
+            counts[group[i]] -= 1
+            count -= 1
+            x[i] = x[count]
+            y[i] = y[count]
+            vx[i] = vx[count]
+            vy[i] = vy[count]
+            life[i] = life[count]
+            group[i] = group[count]
+
+        self.count = count
+
+    def draw(self) -> None:
+        """
+        draw the particles as pixels and mark the bounding box of each burst dirty once
+        :return: None
+        """
+        if not self.count:
+            return
+
+        display = self._display
+        bounds = self._bounds
+        group_pen = self._group_pen
+        x = self._x
+        y = self._y
+        group = self._group
+        used = 0
+        current = -1
+
+        for i in range(self.count):
+            px = x[i] >> SUBPIXEL_SHIFT
+            py = y[i] >> SUBPIXEL_SHIFT
+            g = group[i]
+            b = g * 4
+
+            if not used & (1 << g):
+                used |= 1 << g
+                bounds[b] = bounds[b + 2] = px
+                bounds[b + 1] = bounds[b + 3] = py
+            else:
+                if px < bounds[b]:
+                    bounds[b] = px
+                elif px > bounds[b + 2]:
+                    bounds[b + 2] = px
+
+                if py < bounds[b + 1]:
+                    bounds[b + 1] = py
+                elif py > bounds[b + 3]:
+                    bounds[b + 3] = py
+
+            if g != current:
+                current = g
+                display.set_pen(group_pen[g])
+
+            display.pixel(px, py)
+
+        for g in range(MAX_GROUPS):
+            if used & (1 << g):
+                b = g * 4
+                self._renderer.mark(bounds[b], bounds[b + 1], bounds[b + 2] - bounds[b] + 1,
+                                    bounds[b + 3] - bounds[b + 1] + 1)
+
+    def clear(self) -> None:
+        """
+        remove all particles (e.g. at game over)
+        :return: None
+        """
+        self.count = 0
+
+        for group in range(MAX_GROUPS):
+            self._group_count[group] = 0
@@ -0,0 +1,18 @@
+"""
+packed assets generated by tools/compile_assets.py from assets/pico_invaders.txt (do not edit)
+"""
+from micropython import const
+
+
+INVADER_WIDTH = const(11)
+INVADER_HEIGHT = const(9)
+INVADER = (
+    b'\x02\x00\x01\x01\x08\x00\x01\x01\x03\x01\x01\x01\x07\x01\x01\x01'
+    b'\x02\x02\x07\x01\x01\x03\x02\x01\x04\x03\x03\x01\x08\x03\x02\x01'
+    b'\x00\x04\x0b\x01\x00\x05\x01\x03\x02\x05\x07\x02\n\x05\x01\x03'
+    b'\x02\x07\x01\x01\x08\x07\x01\x01\x03\x08\x02\x01\x06\x08\x02\x01'
+)
+
+GUN_WIDTH = const(11)
+GUN_HEIGHT = const(6)
+GUN = b'\x05\x00\x01\x02\x01\x02\t\x01\x00\x03\x0b\x03'
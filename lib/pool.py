@@ -0,0 +1,64 @@
+"""
+fixed-capacity object pool, entities are created once at startup and recycled without allocation
+"""
+
+
+class Pool:
+    def __init__(self, factory, capacity: int):
+        """
+        pool constructor, creates all entities up front
+        :param factory: callable creating one entity (the pool stores its slot in 'pool_index')
+        :param capacity: maximum number of entities
+        """
+        self.capacity = int(capacity)
+        self.items = [factory() for _ in range(self.capacity)]
+        self.count = 0
+
+        for index, item in enumerate(self.items):
+            item.pool_index = index
+
+    def __len__(self) -> int:
+        """
+        return the number of active entities
+        :return: int
+        """
+        return self.count
+
+    def acquire(self):
+        """
+        activate a free entity
+        :return: entity or None if the pool is exhausted
+        """
+        if self.count == self.capacity:
+            return None
+
+        item = self.items[self.count]
+        self.count += 1
+        return item
+
+    def release(self, item) -> None:
+        """
+        deactivate an entity in O(1) by swapping it with the last active one
+        (iterate backwards over the active entities when releasing inside a loop)
+        :param item: active entity
+        :return: None
+        """
+        index = item.pool_index
+        last = self.count - 1
+
+        if index > last:
+            return
+
+        other = self.items[last]
+        self.items[index] = other
+        self.items[last] = item
+        other.pool_index = index
+        item.pool_index = last
+        self.count = last
+
+    def clear(self) -> None:
+        """
+        deactivate all entities
+        :return: None
+        """
+        self.count = 0
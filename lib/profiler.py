@@ -0,0 +1,271 @@
+"""
+frame-time and allocation profiler with scoped phase timers, on-screen overlay and CSV ring-buffer trace
+"""
+from micropython import const
+from utime import ticks_us, ticks_diff
+from array import array
+from hud import Label
+import gc
+
+
+MAX_PHASES = const(6)
+TRACE_SIZE = const(120)
+OVERLAY_INTERVAL = const(30)
+# A, X and Y together (no game uses all three buttons at once)
+TOGGLE_COMBO = const(7)
+TOGGLE_FRAMES = const(30)
+OVERLAY_Y = const(230)
+
+# module wide default for new profilers (e.g. set by a host tool before a game is started)
+autostart = False
+
+
+class Scope:
+    def __init__(self, profiler, index: int):
+        """
+        scope constructor, a reusable timer for one phase (create once, use in a with statement)
+        :param profiler: profiler
+        :param index: phase index
+        """
+        self._profiler = profiler
+        self._index = index
+        self._start = 0
+
+    def __enter__(self):
+        """
+        start timing the phase
+        :return: scope
+        """
+        if self._profiler.enabled:
+            self._start = ticks_us()
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        stop timing the phase and add the elapsed time to the current frame
+        :param args: exception information (ignored)
+        :return: None
+        """
+        if self._profiler.enabled:
+            self._profiler.phase_us[self._index] += ticks_diff(ticks_us(), self._start)
+
+
+class Profiler:
+    def __init__(self, renderer=None, controls=None, pen: int = 0, enabled: bool = None,
+                 trace_size: int = TRACE_SIZE, combo: int = TOGGLE_COMBO, hold_frames: int = TOGGLE_FRAMES):
+        """
+        profiler constructor, all buffers are allocated up front
+        :param renderer: renderer for the overlay (optional)
+        :param controls: input manager used to toggle the overlay (optional)
+        :param pen: overlay text pen
+        :param enabled: record timings from the start (default: module setting 'autostart')
+        :param trace_size: number of frames kept in the trace ring buffer
+        :param combo: BUTTON_* bitmask held together to toggle the overlay (default: A, X and Y), it is
+                      reserved in the input manager, so holding it does not reach the game
+        :param hold_frames: frames the combo has to be held to toggle the overlay
+        """
+        self._renderer = renderer
+        self._controls = controls
+        self._combo = int(combo)
+        self._hold_frames = max(1, int(hold_frames))
+        self._combo_frames = 0
+        self._names = []
+        self._columns = MAX_PHASES + 2
+        self._size = int(trace_size)
+        self._trace = array('l', [0] * (self._size * self._columns))
+        self._head = 0
+        self._last = ticks_us()
+        self._last_alloc = gc.mem_alloc()
+
+        self.enabled = autostart if enabled is None else bool(enabled)
+        self.visible = False
+        self.frames = 0
+        self._shown = 0
+        self._fps = 0
+        self._worst = '-'
+        self.phase_us = array('l', [0] * MAX_PHASES)
+        self.worst_us = array('l', [0] * MAX_PHASES)
+
+        if controls is not None:
+            controls.reserve(self._combo)
+
+        if renderer is not None:
+            self._fps_label = Label(renderer, 5, OVERLAY_Y, 'FPS {}', pen)
+            self._worst_label = Label(renderer, 60, OVERLAY_Y, 'worst {}', pen)
+
+    def scope(self, name: str) -> Scope:
+        """
+        register a phase and return its reusable timer
+        :param name: phase name
+        :return: Scope
+        """
+        if name in self._names:
+            return Scope(self, self._names.index(name))
+
+        if len(self._names) == MAX_PHASES:
+            raise ValueError('too many profiler phases')
+
+        self._names.append(name)
+        return Scope(self, len(self._names) - 1)
+
+    def wrap(self, name: str, function):
+        """
+        time every call of a function as phase
+        :param name: phase name
+        :param function: function to time
+        :return: function with the same signature
+        """
+        scope = self.scope(name)
+
+        def timed(*args):
+            with scope:
+                return function(*args)
+
+        return timed
+
+    def enable(self, enabled: bool = True) -> None:
+        """
+        start or stop recording (clears the running frame)
+        :param enabled: record timings
+        :return: None
+        """
+        self.enabled = bool(enabled)
+        self._last = ticks_us()
+        self._last_alloc = gc.mem_alloc()
+
+        for index in range(MAX_PHASES):
+            self.phase_us[index] = 0
+
+    def rebase_alloc(self) -> None:
+        """
+        measure the allocation of the next frame from the current heap use (call after a collection)
+        :return: None
+        """
+        if self.enabled:
+            self._last_alloc = gc.mem_alloc()
+
+    def _check_toggle(self) -> None:
+        """
+        toggle the overlay once when the reserved combo was held for hold_frames frames
+        :return: None
+        """
+        if not self._controls.reserved_held:
+            self._combo_frames = 0
+            return
+
+        self._combo_frames += 1
+
+        if self._combo_frames != self._hold_frames:
+            return
+
+        self.visible = not self.visible
+
+        if self.visible and not self.enabled:
+            self.enable()
+
+        if not self.visible and self._renderer is not None:
+            self._renderer.invalidate()
+
+    def frame(self) -> None:
+        """
+        close the current frame: store frame time, heap delta and phase times in the trace
+        (call before the idle phase, its time is counted in the next frame)
+        :return: None
+        """
+        if self._controls is not None:
+            self._check_toggle()
+
+        if not self.enabled:
+            return
+
+        now = ticks_us()
+        allocated = gc.mem_alloc()
+        trace = self._trace
+        row = self._head * self._columns
+
+        trace[row] = ticks_diff(now, self._last)
+        trace[row + 1] = allocated - self._last_alloc
+
+        for index in range(MAX_PHASES):
+            elapsed = self.phase_us[index]
+            trace[row + 2 + index] = elapsed
+
+            if elapsed > self.worst_us[index]:
+                self.worst_us[index] = elapsed
+
+            self.phase_us[index] = 0
+
+        self._last = now
+        self._last_alloc = allocated
+        self._head = (self._head + 1) % self._size
+        self.frames += 1
+
+    def summary(self) -> dict:
+        """
+        return averages over the frames in the trace
+        :return: dict with frames, average frame time, average heap delta and average time per phase in microseconds
+        """
+        count = min(self.frames, self._size)
+        totals = [0] * self._columns
+
+        for row in range(count):
+            for column in range(self._columns):
+                totals[column] += self._trace[row * self._columns + column]
+
+        count = max(1, count)
+
+        return {
+            'frames': self.frames,
+            'frame_us': totals[0] // count,
+            'alloc': totals[1] // count,
+            'phases': {name: totals[2 + index] // count for index, name in enumerate(self._names)},
+        }
+
+    def draw(self) -> None:
+        """
+        draw FPS and the worst phase of the last interval (values change only every OVERLAY_INTERVAL frames)
+        :return: None
+        """
+        if not self.visible or self._renderer is None:
+            return
+
+        if self.frames and self.frames % OVERLAY_INTERVAL == 0 and self.frames != self._shown:
+            self._shown = self.frames
+            self._fps = 1000000 // max(1, self.summary()['frame_us'])
+
+            if self._names:
+                worst = 0
+
+                for index in range(1, len(self._names)):
+                    if self.worst_us[index] > self.worst_us[worst]:
+                        worst = index
+
+                self._worst = f'{self._names[worst]} {self.worst_us[worst]}us'
+
+            for index in range(MAX_PHASES):
+                self.worst_us[index] = 0
+
+        self._fps_label.draw(self._fps)
+        self._worst_label.draw(self._worst)
+
+    def dump(self, stream=None) -> None:
+        """
+        write the trace as CSV, oldest frame first (e.g. to the serial REPL)
+        :param stream: writable text stream (default: sys.stdout)
+        :return: None
+        """
+        if stream is None:
+            from sys import stdout
+            stream = stdout
+
+        stream.write(','.join(['frame', 'frame_us', 'alloc'] + self._names) + '\n')
+        count = min(self.frames, self._size)
+        first = self.frames - count
+        columns = 2 + len(self._names)
+
+        for offset in range(count):
+            row = ((self._head - count + offset) % self._size) * self._columns
+            values = [str(self._trace[row + column]) for column in range(columns)]
+            stream.write(str(first + offset) + ',' + ','.join(values) + '\n')
+
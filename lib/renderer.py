@@ -0,0 +1,401 @@
+"""
+dirty rectangle renderer with baked static layer
+"""
+from micropython import const
+from array import array
+
+
+FONT_HEIGHT = const(8)
+MAX_DIRTY = const(24)
+BUFFERS = const(2)
+
+
+class StaticLayer:
+    def __init__(self, screen):
+        """
+        static layer constructor, records drawing commands (incl. pen and bounding box) instead of drawing
+        :param screen: display used to replay the commands
+        """
+        self._display = screen
+        self._pen = None
+        self.commands = []
+
+    def _add(self, method, args: tuple, x: int, y: int, w: int, h: int) -> None:
+        """
+        record one drawing command
+        :param method: bound display method
+        :param args: method arguments
+        :param x: bounding box x position
+        :param y: bounding box y position
+        :param w: bounding box width
+        :param h: bounding box height
+        :return: None
+        """
+        self.commands.append((x, y, x + w, y + h, self._pen, method, args))
+
+    def set_pen(self, pen: int) -> None:
+        """
+        set pen for the following commands
+        :param pen: pen value
+        :return: None
+        """
+        self._pen = pen
+
+    def rectangle(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        record a filled rectangle
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        self._add(self._display.rectangle, (x, y, w, h), x, y, w, h)
+
+    def circle(self, x: int, y: int, r: int) -> None:
+        """
+        record a filled circle
+        :param x: center x position
+        :param y: center y position
+        :param r: radius
+        :return: None
+        """
+        self._add(self._display.circle, (x, y, r), x - r, y - r, r * 2 + 1, r * 2 + 1)
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, thickness: int = 1) -> None:
+        """
+        record a line
+        :param x1: start x position
+        :param y1: start y position
+        :param x2: end x position
+        :param y2: end y position
+        :param thickness: line thickness
+        :return: None
+        """
+        x, y, w, h = line_bounds(x1, y1, x2, y2, thickness)
+        self._add(self._display.line, (x1, y1, x2, y2, thickness), x, y, w, h)
+
+    def pixel(self, x: int, y: int) -> None:
+        """
+        record a single pixel
+        :param x: x position
+        :param y: y position
+        :return: None
+        """
+        self._add(self._display.pixel, (x, y), x, y, 1, 1)
+
+    def text(self, text: str, x: int, y: int, wordwrap: int = -1, scale: int = 2) -> None:
+        """
+        record a text
+        :param text: text
+        :param x: x position
+        :param y: y position
+        :param wordwrap: word wrap width
+        :param scale: font scale
+        :return: None
+        """
+        w = self._display.measure_text(text, scale)
+        self._add(self._display.text, (text, x, y, wordwrap, scale), x, y, w, FONT_HEIGHT * scale)
+
+    def draw(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        """
+        replay all commands intersecting a region (the caller sets the clipping)
+        :param x1: region left
+        :param y1: region top
+        :param x2: region right (exclusive)
+        :param y2: region bottom (exclusive)
+        :return: None
+        """
+        current_pen = None
+
+        for cx1, cy1, cx2, cy2, pen, method, args in self.commands:
+            if cx1 < x2 and cx2 > x1 and cy1 < y2 and cy2 > y1:
+                if pen != current_pen:
+                    self._display.set_pen(pen)
+                    current_pen = pen
+
+                method(*args)
+
+
+def line_bounds(x1: int, y1: int, x2: int, y2: int, thickness: int = 1) -> tuple:
+    """
+    calculate the bounding box of a line
+    :param x1: start x position
+    :param y1: start y position
+    :param x2: end x position
+    :param y2: end y position
+    :param thickness: line thickness
+    :return: tuple with x, y, width, height
+    """
+    half = thickness // 2 + 1
+    x = min(x1, x2) - half
+    y = min(y1, y2) - half
+    return x, y, abs(x2 - x1) + half * 2 + 1, abs(y2 - y1) + half * 2 + 1
+
+
+class Renderer:
+    def __init__(self, screen, background: int, dirty: bool = True):
+        """
+        renderer constructor, a drop-in drawing surface which tracks the regions touched by moving entities
+        :param screen: display
+        :param background: background pen
+        :param dirty: restore only dirty regions (True) or clear the whole screen every frame (False)
+        """
+        self._display = screen
+        self._width, self._height = screen.get_bounds()
+        self._background = background
+        self._dirty = bool(dirty)
+        self._buffer = 0
+        self._rects = [array('h', bytes(MAX_DIRTY * 8)) for _ in range(BUFFERS)]
+        self._counts = [0] * BUFFERS
+        self._restored = array('h', bytes(MAX_DIRTY * 8))
+        self._restored_count = 0
+        self._full_redraws = BUFFERS
+
+        self.cleared = True
+
+        self.static = StaticLayer(screen)
+
+    def __getattr__(self, name: str):
+        """
+        forward everything the renderer does not wrap (e.g. buttons) to the display
+        :param name: attribute name
+        :return: attribute of the display
+        """
+        return getattr(self._display, name)
+
+    @property
+    def display(self):
+        """
+        the wrapped display (drawing on it directly is not tracked as dirty)
+        :return: display
+        """
+        return self._display
+
+    def invalidate(self) -> None:
+        """
+        force a full redraw of both framebuffers (e.g. after the static layer changed)
+        :return: None
+        """
+        self._full_redraws = BUFFERS
+
+    def set_background(self, background: int) -> None:
+        """
+        change the background pen (forces a full redraw)
+        :param background: background pen
+        :return: None
+        """
+        self._background = background
+        self.invalidate()
+
+    def _mark(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        add a region to the dirty list of the current framebuffer (merges with touching regions)
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(self._width, x + w)
+        y2 = min(self._height, y + h)
+
+        if x1 >= x2 or y1 >= y2:
+            return
+
+        rects = self._rects[self._buffer]
+        count = self._counts[self._buffer]
+
+        for i in range(0, count * 4, 4):
+            if x1 <= rects[i + 2] and x2 >= rects[i] and y1 <= rects[i + 3] and y2 >= rects[i + 1]:
+                break
+        else:
+            if count < MAX_DIRTY:
+                i = count * 4
+                rects[i], rects[i + 1], rects[i + 2], rects[i + 3] = x1, y1, x2, y2
+                self._counts[self._buffer] = count + 1
+                return
+
+            i = (count - 1) * 4
+
+        rects[i] = min(rects[i], x1)
+        rects[i + 1] = min(rects[i + 1], y1)
+        rects[i + 2] = max(rects[i + 2], x2)
+        rects[i + 3] = max(rects[i + 3], y2)
+
+    def mark(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        mark a region dirty in the current framebuffer (for pixels drawn directly on the display)
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        self._mark(x, y, w, h)
+
+    def damage(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        mark a region dirty in all framebuffers (e.g. after the static layer changed there)
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        current = self._buffer
+
+        for buffer in range(BUFFERS):
+            self._buffer = buffer
+            self._mark(x, y, w, h)
+
+        self._buffer = current
+
+    def _restore(self, x1: int, y1: int, x2: int, y2: int) -> None:
+        """
+        redraw background and static layer inside a region
+        :param x1: region left
+        :param y1: region top
+        :param x2: region right (exclusive)
+        :param y2: region bottom (exclusive)
+        :return: None
+        """
+        self._display.set_clip(x1, y1, x2 - x1, y2 - y1)
+        self._display.set_pen(self._background)
+        self._display.clear()
+        self.static.draw(x1, y1, x2, y2)
+        self._display.remove_clip()
+
+    def restore(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        redraw background and static layer inside a region (e.g. before redrawing changed text)
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        self._restore(max(0, x), max(0, y), min(self._width, x + w), min(self._height, y + h))
+
+    def was_restored(self, x: int, y: int, w: int, h: int) -> bool:
+        """
+        return whether a region was cleared by begin() in the current frame
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: bool
+        """
+        if self.cleared:
+            return True
+
+        rects = self._restored
+
+        for i in range(0, self._restored_count * 4, 4):
+            if x < rects[i + 2] and x + w > rects[i] and y < rects[i + 3] and y + h > rects[i + 1]:
+                return True
+
+        return False
+
+    def begin(self) -> None:
+        """
+        start a frame by restoring the regions dirty in the current framebuffer
+        :return: None
+        """
+        self.cleared = bool(self._full_redraws) or not self._dirty
+
+        if self.cleared:
+            self._display.set_pen(self._background)
+            self._display.clear()
+            self.static.draw(0, 0, self._width, self._height)
+
+            if self._full_redraws:
+                self._full_redraws -= 1
+        else:
+            rects = self._rects[self._buffer]
+
+            for i in range(0, self._counts[self._buffer] * 4, 4):
+                self._restore(rects[i], rects[i + 1], rects[i + 2], rects[i + 3])
+
+        # keep the restored regions for was_restored() and reuse the old array for this frame
+        self._restored, self._rects[self._buffer] = self._rects[self._buffer], self._restored
+        self._restored_count = 0 if self.cleared else self._counts[self._buffer]
+        self._counts[self._buffer] = 0
+
+    def end(self) -> None:
+        """
+        finish a frame and show it (the next frame draws into the other framebuffer)
+        :return: None
+        """
+        self._display.update()
+        self._buffer = (self._buffer + 1) % BUFFERS
+
+    def set_pen(self, pen: int) -> None:
+        """
+        set the current pen
+        :param pen: pen value
+        :return: None
+        """
+        self._display.set_pen(pen)
+
+    def rectangle(self, x: int, y: int, w: int, h: int) -> None:
+        """
+        draw a filled rectangle and mark it dirty
+        :param x: x position
+        :param y: y position
+        :param w: width
+        :param h: height
+        :return: None
+        """
+        self._mark(x, y, w, h)
+        self._display.rectangle(x, y, w, h)
+
+    def circle(self, x: int, y: int, r: int) -> None:
+        """
+        draw a filled circle and mark it dirty
+        :param x: center x position
+        :param y: center y position
+        :param r: radius
+        :return: None
+        """
+        self._mark(x - r, y - r, r * 2 + 1, r * 2 + 1)
+        self._display.circle(x, y, r)
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, thickness: int = 1) -> None:
+        """
+        draw a line and mark it dirty
+        :param x1: start x position
+        :param y1: start y position
+        :param x2: end x position
+        :param y2: end y position
+        :param thickness: line thickness
+        :return: None
+        """
+        x, y, w, h = line_bounds(x1, y1, x2, y2, thickness)
+        self._mark(x, y, w, h)
+        self._display.line(x1, y1, x2, y2, thickness)
+
+    def pixel(self, x: int, y: int) -> None:
+        """
+        draw a single pixel and mark it dirty
+        :param x: x position
+        :param y: y position
+        :return: None
+        """
+        self._mark(x, y, 1, 1)
+        self._display.pixel(x, y)
+
+    def text(self, text: str, x: int, y: int, wordwrap: int = -1, scale: int = 2) -> None:
+        """
+        draw a text and mark it dirty
+        :param text: text
+        :param x: x position
+        :param y: y position
+        :param wordwrap: word wrap width
+        :param scale: font scale
+        :return: None
+        """
+        self._mark(x, y, self._display.measure_text(text, scale), FONT_HEIGHT * scale)
+        self._display.text(text, x, y, wordwrap, scale)
@@ -0,0 +1,179 @@
+"""
+deterministic input record and replay (per tick button bitmasks and urandom seed in a compact binary trace)
+
+trace format: MAGIC, seed (uint32), ticks (uint32), then run-length encoded ticks,
+one byte per run: bits 0-2 button bitmask, bits 3-7 run length - 1 (1 - 32 ticks)
+"""
+from micropython import const
+from utime import ticks_us
+import struct
+import urandom
+
+
+MAGIC = b'PVT1'
+HEADER = '<4sII'
+HEADER_SIZE = const(12)
+MASK_BITS = const(0x07)
+RUN_SHIFT = const(3)
+MAX_RUN = const(32)
+TRACE_CAPACITY = const(8192)
+
+# module wide settings read by attach() (e.g. set in the REPL or by a host tool before a game is started)
+record_path = None
+replay_path = None
+unthrottled = False
+render_interval = 1
+
+
+class Recorder:
+    def __init__(self, read, path: str, seed: int = None, capacity: int = TRACE_CAPACITY):
+        """
+        recorder constructor, seeds urandom and preallocates the trace buffer
+        :param read: callable returning the current BUTTON_* bitmask (e.g. InputManager.read_buttons)
+        :param path: file written by close()
+        :param seed: urandom seed (default: derived from the microsecond clock)
+        :param capacity: trace buffer size in bytes (recording stops when the buffer is full)
+        """
+        self._read = read
+        self._path = path
+        self._data = bytearray(int(capacity))
+        self._size = 0
+        self._mask = 0
+        self._run = 0
+
+        self.seed = (ticks_us() if seed is None else int(seed)) & 0xFFFFFFFF
+        self.ticks = 0
+        self.full = False
+        self.finished = False
+        self.unthrottled = False
+        self.render_interval = 1
+
+        urandom.seed(self.seed)
+
+    def _flush(self) -> None:
+        """
+        write the pending run into the buffer
+        :return: None
+        """
+        if self._run:
+            self._data[self._size] = self._mask | (self._run - 1) << RUN_SHIFT
+            self._size += 1
+
+    def read(self) -> int:
+        """
+        read the buttons and record the bitmask (use as InputManager source)
+        :return: int
+        """
+        mask = self._read()
+
+        if self.full:
+            return mask
+
+        if self._run and (mask & MASK_BITS != self._mask or self._run == MAX_RUN):
+            if self._size == len(self._data):
+                # drop the pending run, the trace ends with the last complete run
+                self.ticks -= self._run
+                self._run = 0
+                self.full = True
+                return mask
+
+            self._flush()
+            self._run = 0
+
+        if not self._run:
+            self._mask = mask & MASK_BITS
+
+        self._run += 1
+        self.ticks += 1
+        return mask
+
+    def close(self) -> None:
+        """
+        write the trace file
+        :return: None
+        """
+        if self._run and self._size < len(self._data):
+            self._flush()
+        elif self._run:
+            self.ticks -= self._run
+
+        self._run = 0
+
+        with open(self._path, 'wb') as file:
+            file.write(struct.pack(HEADER, MAGIC, self.seed, self.ticks))
+            file.write(memoryview(self._data)[:self._size])
+
+
+class Player:
+    def __init__(self, path: str, unthrottled: bool = False, render_interval: int = 1):
+        """
+        player constructor, loads a trace and seeds urandom with the recorded seed
+        :param path: trace file
+        :param unthrottled: run one tick per loop pass without waiting for the clock
+        :param render_interval: render only every n-th tick when unthrottled
+        """
+        with open(path, 'rb') as file:
+            magic, self.seed, self.ticks = struct.unpack(HEADER, file.read(HEADER_SIZE))
+            self._data = file.read()
+
+        if magic != MAGIC:
+            raise ValueError('not an input trace')
+
+        self._index = 0
+        self._mask = 0
+        self._run = 0
+
+        self.tick = 0
+        self.finished = False
+        self.unthrottled = bool(unthrottled)
+        self.render_interval = max(1, int(render_interval))
+
+        urandom.seed(self.seed)
+
+    def read(self) -> int:
+        """
+        return the recorded bitmask of the next tick (use as InputManager source)
+        :return: int
+        """
+        if not self._run:
+            if self._index == len(self._data):
+                self.finished = True
+                return 0
+
+            value = self._data[self._index]
+            self._index += 1
+            self._mask = value & MASK_BITS
+            self._run = (value >> RUN_SHIFT) + 1
+
+        self._run -= 1
+        self.tick += 1
+
+        if not self._run and self._index == len(self._data):
+            self.finished = True
+
+        return self._mask
+
+    def close(self) -> None:
+        """
+        nothing to write for a replay
+        :return: None
+        """
+        pass
+
+
+def attach(controls):
+    """
+    start recording or replaying the input of an input manager according to the module settings
+    (call before anything uses urandom)
+    :param controls: input manager
+    :return: Recorder, Player or None
+    """
+    if replay_path:
+        trace = Player(replay_path, unthrottled, render_interval)
+    elif record_path:
+        trace = Recorder(controls.read_buttons, record_path)
+    else:
+        return None
+
+    controls.set_source(trace.read)
+    return trace
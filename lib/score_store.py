@@ -0,0 +1,237 @@
+"""
+persistent high-score tables and settings in an append-only record log on flash
+
+Changes are kept in RAM until commit() (call it at game over, never inside the frame loop), which
+appends them with a single write. Nothing is rewritten in place: when the log outgrows a limit it is
+compacted into a new file with only the current tables and settings, which then replaces the log.
+Records behind a torn write (bad CRC) are ignored and dropped by the next compaction.
+
+log format: MAGIC, then records: kind (uint8), key length (uint8), value (int32), crc32 (uint32), key
+(the CRC covers kind, key length, value and key)
+"""
+from micropython import const
+from binascii import crc32
+import os
+import struct
+
+
+MAGIC = b'PVS1'
+MAGIC_SIZE = const(4)
+RECORD = '<BBiI'
+RECORD_SIZE = const(10)
+CRC_OFFSET = const(6)
+KIND_SCORE = const(1)
+KIND_SETTING = const(2)
+TABLE_SIZE = const(5)
+COMPACT_BYTES = const(4096)
+
+# module wide setting (e.g. set by a host tool to a temporary directory before a game is started)
+store_path = 'scores.log'
+
+
+def encode(kind: int, key: str, value: int) -> bytes:
+    """
+    encode one log record
+    :param kind: KIND_SCORE or KIND_SETTING
+    :param key: game or setting name (up to 255 bytes)
+    :param value: score or setting value (int32)
+    :return: bytes
+    """
+    name = key.encode()
+    head = struct.pack('<BBi', kind, len(name), value)
+    return head + struct.pack('<I', crc32(name, crc32(head))) + name
+
+
+class ScoreStore:
+    def __init__(self, path: str = None, table_size: int = TABLE_SIZE, compact_bytes: int = COMPACT_BYTES):
+        """
+        score store constructor, reads the log once (create it during setup, not in the game loop)
+        :param path: log file (default: module setting store_path)
+        :param table_size: number of scores kept per game
+        :param compact_bytes: log size above which commit() compacts the log
+        """
+        self._path = store_path if path is None else path
+        self._table_size = int(table_size)
+        self._compact_bytes = int(compact_bytes)
+        self._pending = []
+        self._size = 0
+        self._broken = False
+
+        self.tables = {}
+        self.settings = {}
+        self.writes = 0
+        self.written = 0
+        self.compactions = 0
+
+        self._load()
+
+    def _load(self) -> None:
+        """
+        replay the valid records of the log, stop at the first torn or corrupt record
+        :return: None
+        """
+        try:
+            with open(self._path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return
+
+        if data[:MAGIC_SIZE] != MAGIC:
+            self._broken = True
+            return
+
+        offset = MAGIC_SIZE
+
+        while offset + RECORD_SIZE <= len(data):
+            kind, length, value, checksum = struct.unpack_from(RECORD, data, offset)
+            end = offset + RECORD_SIZE + length
+
+            if end > len(data):
+                break
+
+            key = data[offset + RECORD_SIZE:end]
+
+            if crc32(key, crc32(data[offset:offset + CRC_OFFSET])) != checksum:
+                break
+
+            self._apply(kind, key.decode(), value)
+            offset = end
+
+        self._size = offset
+        self._broken = offset != len(data)
+
+    def _apply(self, kind: int, key: str, value: int) -> int:
+        """
+        apply a record to the tables and settings in RAM
+        :param kind: KIND_SCORE or KIND_SETTING
+        :param key: game or setting name
+        :param value: score or setting value
+        :return: int (rank of the entered score or 0 for a changed setting, -1 if the record changed nothing)
+        """
+        if kind == KIND_SETTING:
+            if self.settings.get(key) == value:
+                return -1
+
+            self.settings[key] = value
+            return 0
+
+        if kind != KIND_SCORE:
+            return -1
+
+        table = self.tables.setdefault(key, [])
+
+        if len(table) == self._table_size and value <= table[-1]:
+            return -1
+
+        # a score tying earlier ones is ranked after them
+        index = len(table)
+
+        while index and table[index - 1] < value:
+            index -= 1
+
+        table.insert(index, value)
+        del table[self._table_size:]
+        return index
+
+    def submit(self, game: str, score: int) -> int:
+        """
+        enter a score into the table of a game (written by the next commit())
+        :param game: game name
+        :param score: score
+        :return: int (rank starting at 0, -1 if the score is not in the table)
+        """
+        rank = self._apply(KIND_SCORE, game, score)
+
+        if rank >= 0:
+            self._pending.append(encode(KIND_SCORE, game, score))
+
+        return rank
+
+    def best(self, game: str) -> int:
+        """
+        return the best score of a game
+        :param game: game name
+        :return: int (0 if no score was submitted yet)
+        """
+        table = self.tables.get(game)
+        return table[0] if table else 0
+
+    def setting(self, key: str, default: int = 0) -> int:
+        """
+        return a setting
+        :param key: setting name
+        :param default: value if the setting was never set
+        :return: int
+        """
+        return self.settings.get(key, default)
+
+    def set_setting(self, key: str, value: int) -> None:
+        """
+        change a setting (written by the next commit(), unchanged values are not written)
+        :param key: setting name
+        :param value: value (int32)
+        :return: None
+        """
+        if self._apply(KIND_SETTING, key, value) >= 0:
+            self._pending.append(encode(KIND_SETTING, key, value))
+
+    def commit(self) -> bool:
+        """
+        write the pending changes with one append, or compact the log if it outgrew the limit
+        :return: bool (True if the flash was written)
+        """
+        if not self._pending and not self._broken:
+            return False
+
+        data = b''.join(self._pending)
+        self._pending = []
+
+        if self._broken or self._size + len(data) > self._compact_bytes:
+            self._compact()
+        elif self._size:
+            with open(self._path, 'ab') as file:
+                file.write(data)
+
+            self._size += len(data)
+            self.written += len(data)
+        else:
+            with open(self._path, 'wb') as file:
+                file.write(MAGIC + data)
+
+            self._size = MAGIC_SIZE + len(data)
+            self.written += self._size
+
+        self.writes += 1
+        return True
+
+    def _compact(self) -> None:
+        """
+        write the current tables and settings into a new log and replace the old one with it
+        :return: None
+        """
+        records = [MAGIC]
+
+        for game, table in self.tables.items():
+            for score in table:
+                records.append(encode(KIND_SCORE, game, score))
+
+        for key, value in self.settings.items():
+            records.append(encode(KIND_SETTING, key, value))
+
+        data = b''.join(records)
+        temporary = self._path + '.tmp'
+
+        with open(temporary, 'wb') as file:
+            file.write(data)
+
+        # littlefs replaces the target on rename, FAT needs the old log removed first
+        try:
+            os.rename(temporary, self._path)
+        except OSError:
+            os.remove(self._path)
+            os.rename(temporary, self._path)
+
+        self._size = len(data)
+        self._broken = False
+        self.written += len(data)
+        self.compactions += 1
@@ -0,0 +1,110 @@
+"""
+span-based sprite renderer shared by all games
+"""
+
+
+class Sprite:
+    def __init__(self, icon: list):
+        """
+        sprite constructor, compiles the icon matrix once into packed rectangles
+        :param icon: icon image as list of rows with bin values
+        """
+        self.height = len(icon)
+        self.width = max(len(row) for row in icon) if icon else 0
+        self._rects = Sprite.compile(icon)
+
+    @staticmethod
+    def compile(icon: list) -> bytes:
+        """
+        convert an icon matrix into horizontal runs and merge equal runs of following rows
+        :param icon: icon image as list of rows with bin values
+        :return: bytes with x, y, width, height per rectangle
+        """
+        rects = []
+        open_rects = {}
+
+        for y, row in enumerate(icon):
+            next_open = {}
+            x = 0
+
+            while x < len(row):
+                if not row[x]:
+                    x += 1
+                    continue
+
+                start = x
+
+                while x < len(row) and row[x]:
+                    x += 1
+
+                key = (start, x - start)
+                rect = open_rects.get(key)
+
+                if rect is None:
+                    rect = [start, y, x - start, 0]
+                    rects.append(rect)
+
+                rect[3] += 1
+                next_open[key] = rect
+
+            open_rects = next_open
+
+        data = bytearray()
+
+        for rect in rects:
+            data.extend(rect)
+
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, width: int, height: int, rects: bytes):
+        """
+        create a sprite from already compiled rectangles
+        :param width: sprite width in pixel
+        :param height: sprite height in pixel
+        :param rects: bytes with x, y, width, height per rectangle
+        :return: Sprite
+        """
+        sprite = cls([])
+        sprite.width = int(width)
+        sprite.height = int(height)
+        sprite._rects = bytes(rects)
+        return sprite
+
+    @classmethod
+    def circle(cls, radius: int):
+        """
+        create a filled circle sprite (same spans as the display circle primitive)
+        :param radius: radius in pixel
+        :return: Sprite
+        """
+        size = radius * 2 + 1
+        icon = []
+
+        for dy in range(-radius, radius + 1):
+            dx = int((radius * radius - dy * dy) ** 0.5)
+            icon.append([1 if abs(x - radius) <= dx else 0 for x in range(size)])
+
+        return cls(icon)
+
+    @property
+    def rects(self) -> bytes:
+        """
+        compiled rectangles as bytes with x, y, width, height per rectangle
+        :return: bytes
+        """
+        return self._rects
+
+    def draw(self, screen, x: int, y: int) -> None:
+        """
+        draw sprite with the current pen of the display
+        :param screen: display
+        :param x: x position
+        :param y: y position
+        :return: None
+        """
+        rects = self._rects
+        rectangle = screen.rectangle
+
+        for i in range(0, len(rects), 4):
+            rectangle(x + rects[i], y + rects[i + 1], rects[i + 2], rects[i + 3])
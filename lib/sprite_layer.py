@@ -0,0 +1,226 @@
+"""
+sprite layer mapping moving entities onto PicoVision hardware sprite slots with a framebuffer fallback
+"""
+from micropython import const
+from array import array
+from binascii import crc32
+from struct import pack
+from renderer import BUFFERS
+
+
+MAX_SLOTS = const(16)
+MAX_IMAGES = const(16)
+HIDDEN = const(-32768)
+
+# directory for the generated sprite images (PNG files are written once, loaded by the display)
+sprite_dir = 'sprites'
+
+# use hardware sprites if the display supports them (False forces the framebuffer fallback)
+use_hardware = True
+
+
+def _adler32(data: bytes) -> int:
+    """
+    calculate the Adler-32 checksum of the zlib stream
+    :param data: data
+    :return: int
+    """
+    a = 1
+    b = 0
+
+    for value in data:
+        a = (a + value) % 65521
+        b = (b + a) % 65521
+
+    return (b << 16) | a
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """
+    return a PNG chunk with length and CRC
+    :param kind: chunk type (e.g. b'IHDR')
+    :param data: chunk data
+    :return: bytes
+    """
+    return pack('>I', len(data)) + kind + data + pack('>I', crc32(kind + data) & 0xFFFFFFFF)
+
+
+def write_png(path: str, sprite, r: int, g: int, b: int) -> None:
+    """
+    write a sprite as RGBA PNG with transparent background (stored deflate blocks, no compressor needed)
+    :param path: file path
+    :param sprite: sprite
+    :param r: red (0 - 255)
+    :param g: green (0 - 255)
+    :param b: blue (0 - 255)
+    :return: None
+    """
+    width = sprite.width
+    height = sprite.height
+    stride = width * 4 + 1
+    raw = bytearray(stride * height)
+    rects = sprite.rects
+
+    for i in range(0, len(rects), 4):
+        for y in range(rects[i + 1], rects[i + 1] + rects[i + 3]):
+            for x in range(rects[i], rects[i] + rects[i + 2]):
+                offset = y * stride + 1 + x * 4
+                raw[offset:offset + 4] = bytes((r, g, b, 255))
+
+    stream = bytearray(b'\x78\x01')
+
+    for start in range(0, len(raw), 65535):
+        block = raw[start:start + 65535]
+        final = 1 if start + 65535 >= len(raw) else 0
+        stream += pack('<BHH', final, len(block), len(block) ^ 0xFFFF) + block
+
+    stream += pack('>I', _adler32(raw))
+
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(_png_chunk(b'IHDR', pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        file.write(_png_chunk(b'IDAT', bytes(stream)))
+        file.write(_png_chunk(b'IEND', b''))
+
+
+class SpriteLayer:
+    def __init__(self, renderer, slots: int = MAX_SLOTS):
+        """
+        sprite layer constructor, entities keep a slot and set its image and position every frame
+        :param renderer: renderer (framebuffer fallback and access to the display)
+        :param slots: number of sprite slots
+        """
+        self._renderer = renderer
+        self._display = renderer.display
+        self._images = []
+        self._pens = []
+        self._slots = int(slots)
+        self._image = array('b', [-1] * self._slots)
+        self._x = array('h', [HIDDEN] * self._slots)
+        self._y = array('h', [HIDDEN] * self._slots)
+        self._pending = bytearray(self._slots)
+        self._next_slot = 0
+
+        self.hardware = use_hardware and hasattr(self._display, 'display_sprite')
+
+    def add_image(self, name: str, sprite, pen: int, color: tuple) -> int:
+        """
+        register a sprite image in one color (call before load())
+        :param name: image name (file name of the generated PNG)
+        :param sprite: sprite
+        :param pen: pen for the framebuffer fallback
+        :param color: (red, green, blue) tuple of the hardware sprite image
+        :return: int (image index)
+        """
+        if len(self._images) == MAX_IMAGES:
+            raise ValueError('too many sprite images')
+
+        self._images.append((name, sprite, color[0], color[1], color[2]))
+        self._pens.append(pen)
+        return len(self._images) - 1
+
+    def allocate(self, count: int = 1) -> int:
+        """
+        reserve consecutive slots
+        :param count: number of slots
+        :return: int (first slot, -1 if not enough slots are left and the caller has to draw itself)
+        """
+        if self._next_slot + count > self._slots:
+            return -1
+
+        first = self._next_slot
+        self._next_slot += count
+        return first
+
+    def load(self) -> None:
+        """
+        write the sprite images and load them into both display buffers (hardware mode only)
+        :return: None
+        """
+        if not self.hardware:
+            return
+
+        import os
+
+        try:
+            os.mkdir(sprite_dir)
+        except OSError:
+            pass
+
+        for name, sprite, r, g, b in self._images:
+            write_png(f'{sprite_dir}/{name}.png', sprite, r, g, b)
+
+        for _ in range(BUFFERS):
+            for index, image in enumerate(self._images):
+                self._display.load_sprite(f'{sprite_dir}/{image[0]}.png', index)
+
+            self._display.update()
+
+        self._renderer.invalidate()
+
+    def show(self, slot: int, image: int, x: int, y: int) -> None:
+        """
+        show an image in a slot (cheap if nothing changed)
+        :param slot: slot
+        :param image: image index
+        :param x: x position
+        :param y: y position
+        :return: None
+        """
+        if self._image[slot] != image or self._x[slot] != x or self._y[slot] != y:
+            self._image[slot] = image
+            self._x[slot] = x
+            self._y[slot] = y
+            self._pending[slot] = BUFFERS
+
+    def hide(self, slot: int) -> None:
+        """
+        hide a slot
+        :param slot: slot
+        :return: None
+        """
+        if self._image[slot] != -1:
+            self._image[slot] = -1
+            self._pending[slot] = BUFFERS
+
+    def clear(self) -> None:
+        """
+        hide all slots (e.g. at game over, the next draw() removes hardware sprites)
+        :return: None
+        """
+        for slot in range(self._next_slot):
+            self.hide(slot)
+
+    def draw(self) -> None:
+        """
+        show the slots of this frame: update changed hardware slots (for both display buffers)
+        or draw all visible slots into the framebuffer
+        :return: None
+        """
+        image = self._image
+
+        if self.hardware:
+            display = self._display
+            pending = self._pending
+
+            for slot in range(self._next_slot):
+                if pending[slot]:
+                    pending[slot] -= 1
+
+                    if image[slot] < 0:
+                        display.clear_sprite(slot)
+                    else:
+                        display.display_sprite(slot, image[slot], self._x[slot], self._y[slot])
+
+            return
+
+        renderer = self._renderer
+        pen = -1
+
+        for slot in range(self._next_slot):
+            if image[slot] >= 0:
+                if self._pens[image[slot]] != pen:
+                    pen = self._pens[image[slot]]
+                    renderer.set_pen(pen)
+
+                self._images[image[slot]][1].draw(renderer, self._x[slot], self._y[slot])
@@ -0,0 +1,89 @@
+"""
+cooperative round-robin task scheduler running a fixed slice of tasks per call (e.g. for enemy decisions)
+"""
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+
+TASKS_PER_RUN = const(1)
+TASK_BUDGET_US = const(1000)
+MAX_TASKS = const(8)
+
+
+class TaskScheduler:
+    def __init__(self, per_run: int = TASKS_PER_RUN, budget_us: int = TASK_BUDGET_US, capacity: int = MAX_TASKS):
+        """
+        task scheduler constructor
+        :param per_run: tasks called per run(), fixed so the game state and the random draws of a tick do not
+                        depend on timing (a recorded input trace replays the same game)
+        :param budget_us: expected time per run(), longer runs are only counted as overruns (to size per_run)
+        :param capacity: maximum number of tasks
+        """
+        self._per_run = max(1, int(per_run))
+        self._budget_us = int(budget_us)
+        self._tasks = [None] * int(capacity)
+        self._count = 0
+        self._next = 0
+
+        self.runs = 0
+        self.calls = 0
+        self.deferred = 0
+        self.overruns = 0
+        self.worst_us = 0
+
+    def add(self, task) -> None:
+        """
+        add a task (a callable doing one small, bounded step of work per call)
+        :param task: callable without arguments
+        :return: None
+        """
+        if self._count == len(self._tasks):
+            raise ValueError('too many tasks')
+
+        self._tasks[self._count] = task
+        self._count += 1
+
+    def run(self) -> int:
+        """
+        call the next per_run tasks round-robin, starting after the last task called before
+        :return: int (number of tasks called)
+        """
+        count = self._count
+
+        if not count:
+            return 0
+
+        tasks = self._tasks
+        called = min(self._per_run, count)
+        start = ticks_us()
+
+        for _ in range(called):
+            tasks[self._next]()
+            self._next = (self._next + 1) % count
+
+        elapsed = ticks_diff(ticks_us(), start)
+        self.runs += 1
+        self.calls += called
+        self.deferred += count - called
+
+        if elapsed > self._budget_us:
+            self.overruns += 1
+
+        if elapsed > self.worst_us:
+            self.worst_us = elapsed
+
+        return called
+
+    def stats(self) -> dict:
+        """
+        return scheduler statistics
+        :return: dict with runs, task calls, deferred task calls, runs over the budget and worst run time in
+                 microseconds
+        """
+        return {
+            'runs': self.runs,
+            'calls': self.calls,
+            'deferred': self.deferred,
+            'overruns': self.overruns,
+            'worst_us': self.worst_us,
+        }
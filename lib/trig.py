@@ -0,0 +1,50 @@
+"""
+fixed-point trigonometry lookup tables (integer degrees, values scaled by ONE)
+"""
+from micropython import const
+from array import array
+from math import sin, pi
+
+
+FIXED_SHIFT = const(12)
+ONE = const(4096)
+HALF = const(2048)
+
+# built once at import, afterwards no float math is needed
+SIN_TABLE = array('h', [int(round(sin(degree * pi / 180) * ONE)) for degree in range(360)])
+
+
+def sin_fixed(degree: int) -> int:
+    """
+    return the sine of an integer angle in degrees as fixed-point value
+    :param degree: angle in degrees
+    :return: int (scaled by ONE)
+    """
+    return SIN_TABLE[degree % 360]
+
+
+def cos_fixed(degree: int) -> int:
+    """
+    return the cosine of an integer angle in degrees as fixed-point value
+    :param degree: angle in degrees
+    :return: int (scaled by ONE)
+    """
+    return SIN_TABLE[(degree + 90) % 360]
+
+
+def to_fixed(value: int) -> int:
+    """
+    convert an integer to a fixed-point value
+    :param value: integer
+    :return: int
+    """
+    return value << FIXED_SHIFT
+
+
+def to_int(value: int) -> int:
+    """
+    convert a fixed-point value to the nearest integer
+    :param value: fixed-point value
+    :return: int
+    """
+    return (value + HALF) >> FIXED_SHIFT
@@ -0,0 +1,149 @@
+"""
+launcher menu, imports only the selected game and unloads it again when the game is over,
+so every game starts with the whole heap (startup time and peak heap of each game are shown)
+"""
+from micropython import const
+from picovision import PicoVision
+from utime import sleep_ms, ticks_diff, ticks_us
+from input_manager import InputManager, BUTTON_A, BUTTON_X, BUTTON_Y
+from palette import Palette, pen_type
+from score_store import ScoreStore
+import gc
+import sys
+
+
+SCREEN_WIDTH = const(320)
+SCREEN_HEIGHT = const(240)
+MENU_TOP = const(70)
+LINE_HEIGHT = const(40)
+GAME_OVER_MS = const(3000)
+
+# module name and title of every game (a game needs a run(display) function returning its result)
+GAMES = (
+    ('pico_pong', 'Pico Pong'),
+    ('pico_invaders', 'Pico Invaders'),
+    ('battle_tank', 'Battle Tank'),
+)
+
+
+def launch(screen, name: str) -> dict:
+    """
+    import a game, run it and remove it and all modules imported by it from sys.modules
+    :param screen: display created with pen_type()
+    :param name: module name of the game
+    :return: dict with result, startup time (ms), heap kept by the import, peak heap and heap left after unloading
+    """
+    loaded = set(sys.modules)
+    gc.collect()
+    before = gc.mem_alloc()
+    start = ticks_us()
+
+    module = __import__(name)
+    imported = gc.mem_alloc() - before
+    result = module.run(screen)
+
+    stats = {
+        'result': result,
+        'startup_ms': ticks_diff(module.loop.started_us, start) // 1000,
+        'import_bytes': imported,
+        'peak_bytes': module.collector.high_water - before,
+    }
+
+    # the shared modules of the launcher stay loaded, everything else is freed with the game
+    for key in list(sys.modules):
+        if key not in loaded:
+            del sys.modules[key]
+
+    del module
+    gc.collect()
+    stats['left_bytes'] = gc.mem_alloc() - before
+    return stats
+
+
+def draw_menu(screen, pens: list, selected: int, results: dict, scores) -> None:
+    """
+    draw the list of games with their high scores and the statistics of the games played so far
+    :param screen: display
+    :param pens: black, white and highlight pen
+    :param selected: index of the selected game
+    :param results: dict with module name and stats returned by launch()
+    :param scores: score store
+    :return: None
+    """
+    black, white, highlight = pens
+
+    screen.set_pen(black)
+    screen.clear()
+    screen.set_pen(white)
+    screen.text('PicoVision', 85, 20, scale=3)
+
+    for index, (name, title) in enumerate(GAMES):
+        y = MENU_TOP + index * LINE_HEIGHT
+        screen.set_pen(highlight if index == selected else white)
+        screen.text(title, 60, y, scale=2)
+        screen.set_pen(white)
+        info = f'best {scores.best(name)}'
+
+        if name in results:
+            stats = results[name]
+            info += f", start {stats['startup_ms']} ms, peak {stats['peak_bytes'] // 1024} KB"
+
+        screen.text(info, 60, y + 18, scale=1)
+
+    screen.set_pen(white)
+    screen.text('A/X select, Y start', 100, 215, scale=1)
+
+
+def main() -> None:
+    """
+    show the menu and run the selected games one after the other
+    :return: None
+    """
+    display = PicoVision(pen_type(), SCREEN_WIDTH, SCREEN_HEIGHT)
+    display.set_font("bitmap8")
+    controls = InputManager(screen=display)
+    results = {}
+    scores = ScoreStore()
+    selected = scores.setting('game') % len(GAMES)
+
+    while True:
+        # the games overwrite the palette entries, so the menu colors are set again every time
+        palette = Palette(display, ((0, 0, 0), (255, 255, 255), (255, 255, 0)))
+        dirty = 2
+
+        while True:
+            controls.sample()
+
+            if controls.pressed(BUTTON_Y):
+                break
+
+            if controls.pressed(BUTTON_A):
+                selected = (selected - 1) % len(GAMES)
+                dirty = 2
+            elif controls.pressed(BUTTON_X):
+                selected = (selected + 1) % len(GAMES)
+                dirty = 2
+
+            # both buffers have to show the menu after a change
+            if dirty:
+                draw_menu(display, palette.pens, selected, results, scores)
+                dirty -= 1
+
+            display.update()
+
+        # the selection is remembered, the game writes its score itself (the store is read again after it)
+        scores.set_setting('game', selected)
+        scores.commit()
+        name, title = GAMES[selected]
+        del palette, scores
+        stats = launch(display, name)
+        results[name] = stats
+        scores = ScoreStore()
+        print(f"{title}: result {stats['result']}, startup {stats['startup_ms']} ms, "
+              f"import {stats['import_bytes']} bytes, peak {stats['peak_bytes']} bytes, "
+              f"left {stats['left_bytes']} bytes")
+        sleep_ms(GAME_OVER_MS)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,53 @@
 from micropython import const
-from picovision import PicoVision, PEN_RGB555
-from pimoroni import Button
-import gc
+from array import array
+from picovision import PicoVision
+from game_loop import GameLoop
+from hud import Label
+from input_manager import InputManager, BUTTON_A, BUTTON_X, BUTTON_Y
+from palette import Palette, pen_type
+from particles import Particles
+from pico_invaders_assets import INVADER, INVADER_WIDTH, INVADER_HEIGHT, GUN, GUN_WIDTH, GUN_HEIGHT
+from pool import Pool
+from profiler import Profiler
+from gc_scheduler import GCScheduler
+from audio import Mixer, noise, square
+from renderer import Renderer
+from replay import attach
+from score_store import ScoreStore
+from sprite import Sprite
+from sprite_layer import SpriteLayer
 
 
 SCREEN_WIDTH = const(320)
 SCREEN_HEIGHT = const(240)
+GAME_NAME = 'pico_invaders'
+FORMATION_COLUMNS = const(8)
+FORMATION_ROWS = const(1)
+HIT_FLASH_TICKS = const(6)
+LIFE_FLASH_TICKS = const(20)
 
 
 class Interface:
-    def __init__(self, screen, icon: list):
+    def __init__(self, screen, sprite: Sprite):
         """
         interface constructor
-        :param screen: display
-        :param icon: gun icon as list
+        :param screen: renderer of the display
+        :param sprite: gun sprite for the lives
         """
         self._display = screen
-        self._icon = list(icon)
+        self._sprite = sprite
+        self._score_label = Label(screen, 5, 5, 'Score {}', SCORE)
+        self._lives_label = Label(screen, 230, 5, 'Lives', WHITE)
         self.score = 0
         self.lives = 3
 
     def draw(self) -> None:
         """
-        draw interface with score and lives on display
+        draw interface with score and lives on display (labels are only drawn again when a value changed)
         :return: None
         """
-        self._display.set_pen(WHITE)
-
-        self._display.text(f'Score {self.score}', 5, 5, scale=1)
-        self._display.text('Lives', 230, 5, scale=1)
+        self._score_label.draw(self.score)
+        self._lives_label.draw()
 
         self._display.set_pen(YELLOW)
 
@@ -36,233 +55,462 @@ class Interface:
         score_icon_pos_y = 6
 
         for _ in range(self.lives):
-            for y, row in enumerate(self._icon):
-                for x, c in enumerate(row):
-                    if c == 1:
-                        self._display.pixel(x + score_icon_pos_x, y + score_icon_pos_y)
+            self._sprite.draw(self._display, score_icon_pos_x, score_icon_pos_y)
             score_icon_pos_x += 15
 
 
-class Enemy:
+class Formation:
 
+    ENEMY_SPEED = const(2)
     ENEMY_DOWN_SPEED = const(5)
-
-    def __init__(self, screen, x: int, y: int):
+    SPACING_X = const(15)
+    SPACING_Y = const(12)
+    STEP_TICKS = const(20)
+    DEBRIS_COUNT = const(24)
+    DEBRIS_SPEED = const(24)
+    DEBRIS_LIFE = const(30)
+    SPRITE = Sprite.from_bytes(INVADER_WIDTH, INVADER_HEIGHT, INVADER)
+
+    def __init__(self, screen, layer: SpriteLayer, image: int, sounds: Mixer, step_sound: int, hit_sound: int,
+                 particles: Particles, columns: int, rows: int, x: int, y: int):
         """
-        enemy constructor
+        formation constructor, the whole invader wave as one block with an alive bitmask per row
         :param screen: display
-        :param x: x position
-        :param y: y position
+        :param layer: sprite layer (one slot per enemy if enough slots are left)
+        :param image: enemy image of the sprite layer
+        :param sounds: sound mixer
+        :param step_sound: sound of the mixer played every STEP_TICKS of the march
+        :param hit_sound: sound of the mixer played when an enemy is destroyed
+        :param particles: particle system for the debris of destroyed enemies
+        :param columns: number of enemy columns (maximum 16)
+        :param rows: number of enemy rows
+        :param x: start x position of the formation
+        :param y: start y position of the formation
         """
         self._display = screen
-        self._icon = [
-            [0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0],
-            [0, 0, 1, 1, 1, 1, 1, 1, 1, 0, 0],
-            [0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1],
-            [1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1],
-            [1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1],
-            [0, 0, 0, 1, 1, 0, 1, 1, 0, 0, 0]
-        ]
-
-        self.enemy_speed = 2
-        self.enemy_pos_x = int(x)
-        self.enemy_pos_y = int(y)
-
-    def draw(self, direction: str, down: bool = False) -> None:
+        self._columns = min(16, int(columns))
+        self._rows = int(rows)
+        self._start_x = int(x)
+        self._start_y = int(y)
+        self._full_row = (1 << self._columns) - 1
+        self._alive_rows = array('H', [0] * self._rows)
+        self._layer = layer
+        self._image = int(image)
+        self._slot = layer.allocate(self._columns * self._rows)
+        self._sounds = sounds
+        self._step_sound = int(step_sound)
+        self._hit_sound = int(hit_sound)
+        self._particles = particles
+        self._step = 0
+
+        self.pos_x = 0
+        self.pos_y = 0
+        self.direction = 1
+        self.alive = 0
+        self.first_column = 0
+        self.last_column = 0
+        self.last_row = 0
+
+        self.reset()
+
+    def reset(self) -> None:
         """
-        draw enemy on display
-        :param direction: set direction to 'left' or 'right'
-        :param down: enable move down by bool
+        reset the formation to a new full wave at the start position
         :return: None
         """
-        if direction == "left":
-            self.enemy_pos_x -= self.enemy_speed
+        for row in range(self._rows):
+            self._alive_rows[row] = self._full_row
+
+        self.pos_x = self._start_x
+        self.pos_y = self._start_y
+        self.direction = 1
+        self._update_bounds()
+
+    def _update_bounds(self) -> None:
+        """
+        update alive counter and bounding box columns/row (only needed after a hit)
+        :return: None
+        """
+        columns = 0
+        self.alive = 0
+        self.last_row = 0
+
+        for row in range(self._rows):
+            mask = self._alive_rows[row]
 
-        if direction == "right":
-            self.enemy_pos_x += self.enemy_speed
+            if mask:
+                columns |= mask
+                self.last_row = row
 
-        if down:
-            self.enemy_pos_y += self.ENEMY_DOWN_SPEED
+                while mask:
+                    mask &= mask - 1
+                    self.alive += 1
+
+        if not columns:
+            return
+
+        self.first_column = 0
+
+        while not columns & (1 << self.first_column):
+            self.first_column += 1
+
+        self.last_column = self._columns - 1
+
+        while not columns & (1 << self.last_column):
+            self.last_column -= 1
+
+    @property
+    def bottom(self) -> int:
+        """
+        y position of the lowest row with alive enemies
+        :return: int
+        """
+        return self.pos_y + self.last_row * self.SPACING_Y
+
+    def move(self) -> None:
+        """
+        move the whole formation by one tick (change direction and move down at the screen borders)
+        :return: None
+        """
+        if self.pos_x + self.first_column * self.SPACING_X < 5:
+            self.direction = 1
+
+        if self.pos_x + self.last_column * self.SPACING_X > SCREEN_WIDTH - 16:
+            self.direction = -1
+            self.pos_y += self.ENEMY_DOWN_SPEED
+
+        self.pos_x += self.direction * self.ENEMY_SPEED
+        self._step += 1
+
+        if self._step == self.STEP_TICKS:
+            self._step = 0
+            self._sounds.play(self._step_sound)
+
+    def hit(self, x: int, y_top: int, y_bottom: int) -> bool:
+        """
+        check a bullet swept from y_bottom up to y_top against the formation and remove the first enemy hit
+        :param x: bullet x position
+        :param y_top: bullet y position after the move
+        :param y_bottom: bullet y position before the move
+        :return: bool
+        """
+        offset_x = x - self.pos_x
+
+        if offset_x < 0:
+            return False
+
+        column = offset_x // self.SPACING_X
+
+        if column >= self._columns or offset_x - column * self.SPACING_X >= self.SPRITE.width:
+            return False
+
+        top = y_top - self.pos_y
+        bottom = y_bottom - self.pos_y
+
+        if bottom < 0:
+            return False
+
+        bit = 1 << column
+        row = min(self._rows - 1, bottom // self.SPACING_Y)
+
+        while row >= 0 and row * self.SPACING_Y + self.SPRITE.height > top:
+            if self._alive_rows[row] & bit and row * self.SPACING_Y <= bottom:
+                self._alive_rows[row] &= ~bit
+                self._update_bounds()
+                self._sounds.play(self._hit_sound)
+                self._particles.burst(self.pos_x + column * self.SPACING_X + self.SPRITE.width // 2,
+                                      self.pos_y + row * self.SPACING_Y + self.SPRITE.height // 2,
+                                      self.DEBRIS_COUNT, self.DEBRIS_SPEED, self.DEBRIS_LIFE, WHITE)
+                return True
+
+            row -= 1
+
+        return False
+
+    def draw(self) -> None:
+        """
+        draw all alive enemies on display (or move their sprite slots and hide the killed ones)
+        :return: None
+        """
+        if self._slot >= 0:
+            self._show()
+            return
 
         self._display.set_pen(WHITE)
+        y = self.pos_y
+
+        for row in range(self._rows):
+            mask = self._alive_rows[row]
+            x = self.pos_x
 
-        for y, row in enumerate(self._icon):
-            for x, c in enumerate(row):
-                if c == 1:
-                    self._display.pixel(x + self.enemy_pos_x, y + self.enemy_pos_y)
+            while mask:
+                if mask & 1:
+                    self.SPRITE.draw(self._display, x, y)
+
+                mask >>= 1
+                x += self.SPACING_X
+
+            y += self.SPACING_Y
+
+    def _show(self) -> None:
+        """
+        update the sprite slots of all enemies
+        :return: None
+        """
+        layer = self._layer
+        slot = self._slot
+        y = self.pos_y
+
+        for row in range(self._rows):
+            mask = self._alive_rows[row]
+            x = self.pos_x
+
+            for _ in range(self._columns):
+                if mask & 1:
+                    layer.show(slot, self._image, x, y)
+                else:
+                    layer.hide(slot)
+
+                mask >>= 1
+                x += self.SPACING_X
+                slot += 1
+
+            y += self.SPACING_Y
+
+
+class Bullet:
+    def __init__(self):
+        """
+        bullet constructor (bullets are created once by the gun's pool)
+        """
+        self.pool_index = 0
+        self.x = 0
+        self.y = 0
 
 
 class Gun:
 
     GUN_SPEED = const(5)
     BULLET_SPEED = const(8)
+    MAX_BULLETS = const(3)
+    FIRE_DELAY = const(10)
 
-    def __init__(self, screen, icon: list, x: int, y: int):
+    def __init__(self, screen, controls: InputManager, sprite: Sprite, layer: SpriteLayer, image: int,
+                 sounds: Mixer, fire_sound: int, x: int, y: int):
         """
         gun constructor
         :param screen: display
-        :param icon: icon image as list with bin values
+        :param controls: input manager
+        :param sprite: gun sprite
+        :param layer: sprite layer (one slot for the gun if one is left)
+        :param image: gun image of the sprite layer
+        :param sounds: sound mixer
+        :param fire_sound: sound of the mixer played on every shot
         :param x: x position
         :param y: y position
         """
         self._display = screen
-        self._icon = list(icon)
+        self._controls = controls
+        self._sprite = sprite
+        self._layer = layer
+        self._image = int(image)
+        self._slot = layer.allocate()
+        self._sounds = sounds
+        self._fire_sound = int(fire_sound)
+        self._cooldown = 0
 
         self.gun_pos_x = int(x)
         self.gun_pos_y = int(y)
 
-        self.bullet_state = "ready"
-        self.bullet_pos_x = None
-        self.bullet_pos_y = None
+        self.bullets = Pool(Bullet, self.MAX_BULLETS)
 
     def handle_input(self) -> None:
         """
-        handle player input for gun and bullet incl. draw on display
+        handle player input for gun and move bullets
         :return: None
         """
-        button_up = self._display.is_button_a_pressed
-        button_down = self._display.is_button_x_pressed
-        button_select = Button(9, invert=True).read
+        if self._cooldown:
+            self._cooldown -= 1
 
-        if button_select() and self.bullet_state == "ready":
-            self.bullet_state = "fire"
-            self.bullet_pos_x = self.gun_pos_x + 6
-            self.bullet_pos_y = self.gun_pos_y
+        if self._controls.held(BUTTON_Y) and not self._cooldown:
+            bullet = self.bullets.acquire()
 
-        if button_up() and self.gun_pos_x > 5:
+            if bullet is not None:
+                bullet.x = self.gun_pos_x + 6
+                bullet.y = self.gun_pos_y
+                self._cooldown = self.FIRE_DELAY
+                self._sounds.play(self._fire_sound)
+
+        if self._controls.held(BUTTON_A) and self.gun_pos_x > 5:
             self.gun_pos_x -= self.GUN_SPEED
 
-        if button_down() and self.gun_pos_x < SCREEN_WIDTH - 15:
+        if self._controls.held(BUTTON_X) and self.gun_pos_x < SCREEN_WIDTH - 15:
             self.gun_pos_x += self.GUN_SPEED
 
-        if self.bullet_state == "fire":
-            self._display.set_pen(BLUE)
-            self.bullet_pos_y -= self.BULLET_SPEED
-            self._display.pixel(self.bullet_pos_x, self.bullet_pos_y)
+        bullets = self.bullets
 
-        if self.bullet_state == "fire" and self.bullet_pos_y < 15:
-            self.bullet_state = "ready"
+        for i in range(bullets.count - 1, -1, -1):
+            bullet = bullets.items[i]
+            bullet.y -= self.BULLET_SPEED
 
-        self._display.set_pen(YELLOW)
+            if bullet.y < 15:
+                bullets.release(bullet)
 
-        for y, row in enumerate(self._icon):
-            for x, c in enumerate(row):
-                if c == 1:
-                    self._display.pixel(x + self.gun_pos_x, y + self.gun_pos_y)
+    def draw(self) -> None:
+        """
+        draw gun and bullets on display
+        :return: None
+        """
+        bullets = self.bullets
 
+        if bullets.count:
+            self._display.set_pen(BLUE)
 
-def reset_enemies() -> None:
-    """
-    resets the enemies
-    :return: None
-    """
-    global enemies
+            for i in range(bullets.count):
+                bullet = bullets.items[i]
+                self._display.pixel(bullet.x, bullet.y)
 
-    enemies.clear()
-    enemy_add = 15
-    enemy_start_x = 100
-    enemy_start_y = 20
+        if self._slot >= 0:
+            self._layer.show(self._slot, self._image, self.gun_pos_x, self.gun_pos_y)
+            return
 
-    for _ in range(8):
-        enemy_item = Enemy(screen=display, x=enemy_start_x, y=enemy_start_y)
-        enemies.append(enemy_item)
-        enemy_start_x += enemy_add
+        self._display.set_pen(YELLOW)
+        self._sprite.draw(self._display, self.gun_pos_x, self.gun_pos_y)
 
 
-def collision_check(point: list, rectangle: list) -> bool:
+def update() -> None:
     """
-    check whether a point is inside a rectangular
-    :param point: list of x,y position coordinates
-    :param rectangle: list of x,y position coordinates
-    :return: bool
+    advance the game by one tick
+    :return: None
     """
-    point_x, point_y = point
-    rect_x1, rect_y1 = rectangle
-    rect_x2 = rect_x1 + 10
-    rect_y2 = rect_y1 + 8
+    if interface.lives <= 0:
+        loop.stop()
+        return
 
-    if rect_x1 < point_x < rect_x2:
-        if rect_y1 < point_y < rect_y2:
-            return True
+    controls.sample()
+    palette.tick()
 
-    return False
+    if not formation.alive:
+        formation.reset()
+        interface.score += 10
 
+    formation.move()
 
-# initialize display
-display = PicoVision(PEN_RGB555, SCREEN_WIDTH, SCREEN_HEIGHT)
-display.set_font("bitmap8")
+    if formation.bottom > SCREEN_HEIGHT - 20:
+        interface.lives -= 1
+        formation.reset()
+        palette.flash(BLACK, 120, 0, 0, LIFE_FLASH_TICKS)
 
-# define colors
-BLACK = display.create_pen(0, 0, 0)
-WHITE = display.create_pen(255, 255, 255)
-BLUE = display.create_pen(0, 0, 255)
-YELLOW = display.create_pen(255, 255, 0)
+    gun.handle_input()
+    particles.update(loop.last_frame_us)
 
-# define important variables and create objects
-gun_icon = [
-    [0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
-    [0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
-    [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-]
+    bullets = gun.bullets
 
-interface = Interface(screen=display, icon=gun_icon)
+    for i in range(bullets.count - 1, -1, -1):
+        bullet = bullets.items[i]
 
-enemies = []
-direction_x = "right"
-reset_enemies()
+        if formation.hit(x=bullet.x, y_top=bullet.y, y_bottom=bullet.y + gun.BULLET_SPEED):
+            interface.score += 1
+            bullets.release(bullet)
+            palette.flash(SCORE, 255, 255, 0, HIT_FLASH_TICKS)
 
-gun = Gun(screen=display, icon=gun_icon, x=SCREEN_WIDTH // 2, y=SCREEN_HEIGHT - 10)
+    mixer.tick()
 
-# game loop
-while True:
-    display.set_pen(BLACK)
-    display.clear()
 
-    if interface.lives <= 0:
-        break
+def render() -> None:
+    """
+    draw and show one frame
+    :return: None
+    """
+    renderer.begin()
 
     interface.draw()
+    formation.draw()
+    gun.draw()
+    particles.draw()
+    layer.draw()
 
-    if not enemies:
-        reset_enemies()
-        interface.score += 10
-
-    if enemies[0].enemy_pos_x < 5:
-        direction_x = "right"
-
-    if enemies[-1].enemy_pos_x > SCREEN_WIDTH - 16:
-        direction_x = "left"
-        direction_y = True
-    else:
-        direction_y = False
-
-    for enemy in enemies:
-        if gun.bullet_state == "fire":
-            if collision_check(point=[gun.bullet_pos_x, gun.bullet_pos_y],
-                               rectangle=[enemy.enemy_pos_x, enemy.enemy_pos_y]):
-                interface.score += 1
-                enemies.remove(enemy)
-                gun.bullet_state = "ready"
-
-        if enemy.enemy_pos_y > SCREEN_HEIGHT - 20:
-            interface.lives -= 1
-            reset_enemies()
+    profiler.draw()
+    renderer.end()
 
-        enemy.draw(direction=direction_x, down=direction_y)
-
-    gun.handle_input()
 
+def run(display) -> int:
+    """
+    run the game until all lives are lost (the game can be imported by the launcher)
+    :param display: PicoVision display created with pen_type()
+    :return: int (score)
+    """
+    global palette, BLACK, WHITE, BLUE, YELLOW, SCORE, renderer, controls, trace, interface, layer, formation, gun
+    global mixer, particles, collector, profiler, loop
+
+    display.set_font("bitmap8")
+
+    # define colors (the score has its own palette entry, it flashes on every hit)
+    palette = Palette(display, (
+        (0, 0, 0),
+        (255, 255, 255),
+        (0, 0, 255),
+        (255, 255, 0),
+        (255, 255, 255)
+    ))
+    BLACK, WHITE, BLUE, YELLOW, SCORE = palette.pens
+
+    # define important variables and create objects
+    renderer = Renderer(screen=display, background=BLACK)
+    controls = InputManager(screen=display)
+    trace = attach(controls)
+    scores = ScoreStore()
+
+    gun_sprite = Sprite.from_bytes(GUN_WIDTH, GUN_HEIGHT, GUN)
+
+    interface = Interface(screen=renderer, sprite=gun_sprite)
+
+    # invaders and gun use hardware sprite slots (framebuffer fallback without sprite support)
+    layer = SpriteLayer(renderer=renderer)
+    invader_image = layer.add_image('invader', Formation.SPRITE, WHITE, palette.color(WHITE))
+    gun_image = layer.add_image('gun', gun_sprite, YELLOW, palette.color(YELLOW))
+
+    # sound effects are precomputed once, the mixer writes them to the audio output once per tick
+    mixer = Mixer()
+    step_sound = mixer.add(square(110, 90, 60))
+    explosion_sound = mixer.add(noise(200, hold=3))
+    fire_sound = mixer.add(square(1400, 700, 50, volume=4000))
+
+    particles = Particles(renderer=renderer, gravity=0)
+    formation = Formation(screen=renderer, layer=layer, image=invader_image, sounds=mixer, step_sound=step_sound,
+                          hit_sound=explosion_sound, particles=particles, columns=FORMATION_COLUMNS,
+                          rows=FORMATION_ROWS, x=100, y=20)
+    gun = Gun(screen=renderer, controls=controls, sprite=gun_sprite, layer=layer, image=gun_image, sounds=mixer,
+              fire_sound=fire_sound, x=SCREEN_WIDTH // 2, y=SCREEN_HEIGHT - 10)
+    layer.load()
+
+    # game loop
+    collector = GCScheduler()
+    profiler = Profiler(renderer=renderer, controls=controls, pen=WHITE)
+    loop = GameLoop(update=update, render=render, idle=collector.collect, profiler=profiler,
+                    trace=trace)
+    loop.run()
+    collector.close()
+
+    if trace is not None:
+        trace.close()
+
+    # game over (the score is written to flash here only, never inside the game loop)
+    rank = scores.submit(GAME_NAME, interface.score)
+    scores.commit()
+    mixer.close()
+    palette.restore()
+    layer.clear()
+    renderer.invalidate()
+    renderer.begin()
+    layer.draw()
+    display.set_pen(WHITE)
+    display.text('Game Over', 75, 80, scale=3)
+    display.text(f'Score {interface.score}', 100, 120, scale=1)
+    display.text('New high score' if rank == 0 else f'High score {scores.best(GAME_NAME)}', 100, 135, scale=1)
     display.update()
-    gc.collect()
+    return interface.score
+
 
-# game over
-display.set_pen(WHITE)
-display.text('Game Over', 75, 80, scale=3)
-display.text(f'Score {interface.score}', 100, 120, scale=1)
-display.update()
+if __name__ == '__main__':
+    run(PicoVision(pen_type(), SCREEN_WIDTH, SCREEN_HEIGHT))
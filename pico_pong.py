@@ -1,44 +1,83 @@
 from micropython import const
-from picovision import PicoVision, PEN_RGB555
+from picovision import PicoVision
 from urandom import randrange
-import gc
+from game_loop import GameLoop
+from hud import Label
+from input_manager import InputManager, BUTTON_A, BUTTON_X
+from gc_scheduler import GCScheduler
+from audio import Mixer, square
+from palette import Palette, pen_type
+from profiler import Profiler
+from renderer import Renderer
+from replay import attach
+from score_store import ScoreStore
+from sprite import Sprite
+from sprite_layer import SpriteLayer
 
 
 SCREEN_WIDTH = const(320)
 SCREEN_HEIGHT = const(240)
+GAME_NAME = 'pico_pong'
 COLLISION_TOLERANCE = const(5)
+BALL_RADIUS = const(5)
+FLASH_TICKS = const(20)
+MAX_FAILS = const(10)
+FIELD_BORDER = const(25)
+SUBPIXEL_SHIFT = const(8)
+SUBPIXEL_HALF = const(128)
+DISTANCE_SHIFT = const(4)
+TIME_SHIFT = const(8)
+TIME_ONE = const(256)
+
+# walls of the field as x, y, width, height (the left side is open)
+WALLS = (
+    (0, 0, SCREEN_WIDTH, FIELD_BORDER),
+    (SCREEN_WIDTH - FIELD_BORDER, 0, FIELD_BORDER, SCREEN_HEIGHT),
+    (0, SCREEN_HEIGHT - FIELD_BORDER, SCREEN_WIDTH, FIELD_BORDER),
+)
 
 
 class Field:
-    def __init__(self, screen):
+    def __init__(self, screen, layer):
         """
         field constructor
-        :param screen: display
+        :param screen: renderer of the display
+        :param layer: static layer for the unchanged field border
         """
         self._display = screen
+        self._layer = layer
+        self._fails_label = Label(screen, 25, 15, 'Fails {}', WHITE)
+
+    def draw_border(self) -> None:
+        """
+        draw game field border once into the static layer
+        :return: None
+        """
+        self._layer.set_pen(BORDER)
+        self._layer.line(25, 25, SCREEN_WIDTH - 25, 25)
+        self._layer.line(SCREEN_WIDTH - 25, 25, SCREEN_WIDTH - 25, SCREEN_HEIGHT - 25)
+        self._layer.line(25, SCREEN_HEIGHT - 25, SCREEN_WIDTH - 25, SCREEN_HEIGHT - 25)
 
     def draw(self, fails: int = 0) -> None:
         """
-        draw game field on display
+        draw game field information on display (the label is only drawn again when fails changed)
         :param fails: number as integer for player fails
         :return: None
         """
-        self._display.set_pen(WHITE)
-        self._display.text(f'Fails {fails}', 25, 15, scale=1)
-        self._display.line(25, 25, SCREEN_WIDTH - 25, 25)
-        self._display.line(SCREEN_WIDTH - 25, 25, SCREEN_WIDTH - 25, SCREEN_HEIGHT - 25)
-        self._display.line(25, SCREEN_HEIGHT - 25, SCREEN_WIDTH - 25, SCREEN_HEIGHT - 25)
+        self._fails_label.draw(fails)
 
 
 class Paddle:
     PADDLE_SPEED = const(5)
 
-    def __init__(self, screen):
+    def __init__(self, screen, controls: InputManager):
         """
         paddle constructor
         :param screen: display
+        :param controls: input manager
         """
         self._display = screen
+        self._controls = controls
         self.width = 5
         self.height = 20
         self.pos_x = 28
@@ -46,115 +85,415 @@ class Paddle:
 
     def handle_input(self) -> None:
         """
-        move and draw paddle on display
+        move paddle by player input
         :return: None
         """
-        button_up = self._display.is_button_a_pressed
-        button_down = self._display.is_button_x_pressed
-
-        if button_up() and self.pos_y > 30:
+        if self._controls.held(BUTTON_A) and self.pos_y > 30:
             self.pos_y -= self.PADDLE_SPEED
 
-        if button_down() and self.pos_y < (SCREEN_HEIGHT - self.height - 30):
+        if self._controls.held(BUTTON_X) and self.pos_y < (SCREEN_HEIGHT - self.height - 30):
             self.pos_y += self.PADDLE_SPEED
 
+    def draw(self) -> None:
+        """
+        draw paddle on display
+        :return: None
+        """
         self._display.set_pen(RED)
         self._display.rectangle(self.pos_x, self.pos_y, self.width, self.height)
 
 
+class Contact:
+    def __init__(self):
+        """
+        contact constructor, reused result of the swept collision tests
+        """
+        self.time = 0
+        self.normal_x = 0
+        self.normal_y = 0
+
+    def clear(self) -> None:
+        """
+        reset to 'no contact within the move'
+        :return: None
+        """
+        self.time = TIME_ONE + 1
+        self.normal_x = 0
+        self.normal_y = 0
+
+
 class Ball:
-    def __init__(self, screen):
+    BALL_SPEED = const(256)
+    SPEED_STEP = const(32)
+    MAX_SPEED = const(1536)
+    MAX_BOUNCES = const(3)
+
+    def __init__(self, screen, layer: SpriteLayer, image: int, sounds: Mixer, hit_sound: int, speed: int = BALL_SPEED,
+                 speed_step: int = SPEED_STEP, max_speed: int = MAX_SPEED):
         """
         ball constructor
         :param screen: display
+        :param layer: sprite layer (the ball uses one slot if one is left)
+        :param image: ball image of the sprite layer
+        :param sounds: sound mixer
+        :param hit_sound: sound of the mixer played on every paddle hit
+        :param speed: start speed per axis in sub pixels per tick (256 = 1 px)
+        :param speed_step: speed added on every paddle hit of a rally
+        :param max_speed: maximum speed per axis in sub pixels per tick
         """
         self._display = screen
-        self.radius = 5
+        self._layer = layer
+        self._image = int(image)
+        self._slot = layer.allocate()
+        self._sounds = sounds
+        self._hit_sound = int(hit_sound)
+        self._start_speed = int(speed)
+        self._speed_step = int(speed_step)
+        self._max_speed = int(max_speed)
+        self._contact = Contact()
+        self.radius = BALL_RADIUS
         self.pos_x = None
         self.pos_y = None
-        self.speed_x = None
-        self.speed_y = None
+        self.speed = 0
+        self.rally = 0
+        self._fx = 0
+        self._fy = 0
+        self._vx = 0
+        self._vy = 0
 
     def reset(self) -> None:
         """
-        reset ball position and direction
+        reset ball position, speed and direction
         :return: None
         """
         self.pos_x = SCREEN_WIDTH // 2
         self.pos_y = SCREEN_HEIGHT // 2
-        self.speed_x = -1 if randrange(2) else 1
-        self.speed_y = -1 if randrange(2) else 1
+        self.speed = self._start_speed
+        self.rally = 0
+        self._fx = self.pos_x << SUBPIXEL_SHIFT
+        self._fy = self.pos_y << SUBPIXEL_SHIFT
+        self._vx = -self.speed if randrange(2) else self.speed
+        self._vy = -self.speed if randrange(2) else self.speed
+
+    def _hit_paddle(self) -> None:
+        """
+        speed up the ball for the next paddle hit of the rally
+        :return: None
+        """
+        self._sounds.play(self._hit_sound)
+        self.rally += 1
+        self.speed = min(self._max_speed, self.speed + self._speed_step)
+        self._vx = self.speed if self._vx > 0 else -self.speed
+        self._vy = self.speed if self._vy > 0 else -self.speed
+
+    def move(self, paddle) -> None:
+        """
+        move ball by one tick, bouncing off walls and paddle at the exact time of impact
+        :param paddle: paddle
+        :return: None
+        """
+        contact = self._contact
+        radius = self.radius << SUBPIXEL_SHIFT
+        remaining = TIME_ONE
+
+        for _ in range(self.MAX_BOUNCES):
+            dx = (self._vx * remaining) >> TIME_SHIFT
+            dy = (self._vy * remaining) >> TIME_SHIFT
+            contact.clear()
+
+            for x, y, w, h in WALLS:
+                sweep_circle_rect(self._fx, self._fy, dx, dy, radius, x << SUBPIXEL_SHIFT, y << SUBPIXEL_SHIFT,
+                                  w << SUBPIXEL_SHIFT, h << SUBPIXEL_SHIFT, contact)
+
+            paddle_hit = sweep_circle_rect(self._fx, self._fy, dx, dy, radius, paddle.pos_x << SUBPIXEL_SHIFT,
+                                           (paddle.pos_y - COLLISION_TOLERANCE) << SUBPIXEL_SHIFT,
+                                           paddle.width << SUBPIXEL_SHIFT,
+                                           (paddle.height + COLLISION_TOLERANCE * 2) << SUBPIXEL_SHIFT, contact)
+
+            if contact.time > TIME_ONE:
+                self._fx += dx
+                self._fy += dy
+                break
+
+            self._fx += (dx * contact.time) >> TIME_SHIFT
+            self._fy += (dy * contact.time) >> TIME_SHIFT
+            remaining -= (remaining * contact.time) >> TIME_SHIFT
+
+            if contact.normal_x:
+                self._vx = -self._vx
+
+            if contact.normal_y:
+                self._vy = -self._vy
+
+            if paddle_hit:
+                self._hit_paddle()
+
+        self.pos_x = (self._fx + SUBPIXEL_HALF) >> SUBPIXEL_SHIFT
+        self.pos_y = (self._fy + SUBPIXEL_HALF) >> SUBPIXEL_SHIFT
 
     def draw(self) -> None:
         """
-        draw ball on display
+        draw ball on display (or move its sprite slot)
         :return: None
         """
-        self.pos_x += self.speed_x
-        self.pos_y += self.speed_y
+        if self._slot >= 0:
+            self._layer.show(self._slot, self._image, self.pos_x - self.radius, self.pos_y - self.radius)
+            return
 
         self._display.set_pen(BLUE)
         self._display.circle(self.pos_x, self.pos_y, self.radius)
 
 
-def check_collision(circle: list, rectangle: list) -> bool:
+def _distance_squared(x: int, y: int, rx: int, ry: int, rw: int, rh: int) -> int:
     """
-    check overlap of circle and rectangle
-    :param circle: list with values for radius, x position, y position
-    :param rectangle: list with values for x position, y position, width, height
-    :return: bool
+    return the squared distance of a point to a rectangle in 1/16 pixels (keeps the integers small)
+    :param x: point x position in sub pixels
+    :param y: point y position in sub pixels
+    :param rx: rectangle x position in sub pixels
+    :param ry: rectangle y position in sub pixels
+    :param rw: rectangle width in sub pixels
+    :param rh: rectangle height in sub pixels
+    :return: int
     """
-    circle_radius, circle_x, circle_y = circle
-    rect_x, rect_y, rect_width, rect_height = rectangle
+    distance_x = abs(x - max(rx, min(x, rx + rw))) >> DISTANCE_SHIFT
+    distance_y = abs(y - max(ry, min(y, ry + rh))) >> DISTANCE_SHIFT
+    return distance_x * distance_x + distance_y * distance_y
 
-    closest_x = max(rect_x, min(circle_x, rect_x + rect_width))
-    closest_y = max(rect_y, min(circle_y, rect_y + rect_height))
 
-    distance = ((circle_x - closest_x) ** 2 + (circle_y - closest_y) ** 2) ** 0.5
-    return distance <= (circle_radius + COLLISION_TOLERANCE)
+def sweep_circle_rect(x: int, y: int, dx: int, dy: int, radius: int, rx: int, ry: int, rw: int, rh: int,
+                      contact: Contact) -> bool:
+    """
+    continuous circle against rectangle test (integer only), slab test against the rectangle grown by the radius
+    with the rounded corners refined by a binary search on squared distances (a circle already overlapping the
+    rectangle gets a contact at time 0)
+    :param x: circle center x position in sub pixels
+    :param y: circle center y position in sub pixels
+    :param dx: x movement in sub pixels
+    :param dy: y movement in sub pixels
+    :param radius: circle radius in sub pixels
+    :param rx: rectangle x position in sub pixels
+    :param ry: rectangle y position in sub pixels
+    :param rw: rectangle width in sub pixels
+    :param rh: rectangle height in sub pixels
+    :param contact: contact updated if the impact happens before contact.time
+    :return: bool (True if the contact was updated)
+    """
+    t_enter = -1
+    t_exit = TIME_ONE
+    normal_x = normal_y = 0
+    low = rx - radius
+    high = rx + rw + radius
+
+    if dx:
+        near = ((low if dx > 0 else high) - x << TIME_SHIFT) // dx
+        far = ((high if dx > 0 else low) - x << TIME_SHIFT) // dx
+        t_enter, t_exit = near, far
+        normal_x = -1 if dx > 0 else 1
+    elif x < low or x > high:
+        return False
+
+    low = ry - radius
+    high = ry + rh + radius
+
+    if dy:
+        near = ((low if dy > 0 else high) - y << TIME_SHIFT) // dy
+        far = ((high if dy > 0 else low) - y << TIME_SHIFT) // dy
+
+        if near > t_enter:
+            t_enter = near
+            normal_x = 0
+            normal_y = -1 if dy > 0 else 1
+
+        if far < t_exit:
+            t_exit = far
+    elif y < low or y > high:
+        return False
+
+    # no impact in this move or later than the known contact
+    if t_exit < 0 or t_enter > t_exit or t_enter >= contact.time:
+        return False
+
+    radius_squared = (radius >> DISTANCE_SHIFT) ** 2
+    low = max(0, t_enter)
+    cx = x + ((dx * low) >> TIME_SHIFT)
+    cy = y + ((dy * low) >> TIME_SHIFT)
+
+    if (cx < rx or cx > rx + rw) and (cy < ry or cy > ry + rh):
+        # rounded corner: the distance is smallest at the closest approach to the corner, the first touch is
+        # searched between the start and that time
+        high = min(t_exit, contact.time - 1)
+
+        if high < low:
+            return False
+
+        offset_x = ((rx if cx < rx else rx + rw) - x) >> DISTANCE_SHIFT
+        offset_y = ((ry if cy < ry else ry + rh) - y) >> DISTANCE_SHIFT
+        length = (dx * dx + dy * dy) >> DISTANCE_SHIFT
+
+        if length:
+            high = max(low, min(high, ((offset_x * dx + offset_y * dy) << TIME_SHIFT) // length))
+
+        if _distance_squared(x + ((dx * high) >> TIME_SHIFT), y + ((dy * high) >> TIME_SHIFT),
+                             rx, ry, rw, rh) > radius_squared:
+            return False
+
+        if _distance_squared(cx, cy, rx, ry, rw, rh) <= radius_squared:
+            high = low
+
+        while high - low > 1:
+            middle = (low + high) >> 1
+
+            if _distance_squared(x + ((dx * middle) >> TIME_SHIFT), y + ((dy * middle) >> TIME_SHIFT),
+                                 rx, ry, rw, rh) > radius_squared:
+                low = middle
+            else:
+                high = middle
+
+        t_enter = high
+        cx = x + ((dx * high) >> TIME_SHIFT)
+        cy = y + ((dy * high) >> TIME_SHIFT)
+        offset_x = cx - max(rx, min(cx, rx + rw))
+        offset_y = cy - max(ry, min(cy, ry + rh))
+        toward_x = offset_x * dx < 0
+        toward_y = offset_y * dy < 0
+
+        # bounce along the axis closer to the corner normal, of the axes the circle moves toward the corner on
+        if toward_x and (abs(offset_x) >= abs(offset_y) or not toward_y):
+            normal_x, normal_y = (1 if offset_x > 0 else -1), 0
+        elif toward_y:
+            normal_x, normal_y = 0, (1 if offset_y > 0 else -1)
+        else:
+            return False
+    elif t_enter < 0:
+        # already overlapping at the start of the move: push out across the side of the smallest penetration
+        t_enter = 0
+        left, right, top, bottom = x - rx + radius, rx + rw + radius - x, y - ry + radius, ry + rh + radius - y
+
+        if min(left, right) <= min(top, bottom):
+            normal_x, normal_y = (-1 if left < right else 1), 0
+        else:
+            normal_x, normal_y = 0, (-1 if top < bottom else 1)
+
+    # ignore surfaces the circle is moving away from
+    if normal_x * dx + normal_y * dy >= 0:
+        return False
+
+    contact.time = t_enter
+    contact.normal_x = normal_x
+    contact.normal_y = normal_y
+    return True
+
+
+def update() -> None:
+    """
+    advance the game by one tick
+    :return: None
+    """
+    global ball_lost, best_rally
 
+    if ball_lost >= MAX_FAILS:
+        loop.stop()
+        return
 
-# initialize display
-display = PicoVision(PEN_RGB555, SCREEN_WIDTH, SCREEN_HEIGHT)
-display.set_font("bitmap8")
+    controls.sample()
+    palette.tick()
+    paddle.handle_input()
+    ball.move(paddle)
 
-# define colors
-BLACK = display.create_pen(0, 0, 0)
-WHITE = display.create_pen(255, 255, 255)
-RED = display.create_pen(255, 0, 0)
-BLUE = display.create_pen(0, 0, 255)
+    if ball.pos_x - ball.radius < FIELD_BORDER:
+        ball_lost += 1
+        best_rally = max(best_rally, ball.rally)
+        ball.reset()
+        palette.flash(BORDER, 255, 0, 0, FLASH_TICKS)
 
-# define important variables and create objects
-ball_lost = 0
-field = Field(screen=display)
-paddle = Paddle(screen=display)
-ball = Ball(screen=display)
-ball.reset()
+    mixer.tick()
 
-# game loop
-while True:
-    display.set_pen(BLACK)
-    display.clear()
 
-    field.draw(fails=ball_lost)
-    paddle.handle_input()
+def render() -> None:
+    """
+    draw and show one frame
+    :return: None
+    """
+    renderer.begin()
 
-    if not (25 + ball.radius <= ball.pos_y <= SCREEN_HEIGHT - 25 - ball.radius):
-        ball.speed_y *= -1
+    field.draw(fails=ball_lost)
+    paddle.draw()
+    ball.draw()
+    layer.draw()
 
-    if not (25 + ball.radius <= ball.pos_x <= SCREEN_WIDTH - 25 - ball.radius):
-        ball.speed_x *= -1
+    profiler.draw()
+    renderer.end()
 
-    if ball.pos_x <= 35:
-        if check_collision(circle=[ball.radius, ball.pos_x, ball.pos_y],
-                           rectangle=[paddle.pos_x, paddle.pos_y, paddle.width, paddle.height]):
-            ball.speed_x *= -1
 
-    if ball.pos_x - ball.radius < 25:
-        ball_lost += 1
-        ball.reset()
+def run(display) -> int:
+    """
+    run the game until too many balls were lost (the game can be imported by the launcher)
+    :param display: PicoVision display created with pen_type()
+    :return: int (longest rally)
+    """
+    global palette, BLACK, WHITE, RED, BLUE, BORDER, renderer, controls, trace, ball_lost, best_rally, field, paddle
+    global layer, mixer, ball, collector, profiler, loop
+
+    display.set_font("bitmap8")
+
+    # define colors (the border has its own palette entry, it flashes when the ball is lost)
+    palette = Palette(display, (
+        (0, 0, 0),
+        (255, 255, 255),
+        (255, 0, 0),
+        (0, 0, 255),
+        (255, 255, 255)
+    ))
+    BLACK, WHITE, RED, BLUE, BORDER = palette.pens
+
+    # define important variables and create objects
+    renderer = Renderer(screen=display, background=BLACK)
+    controls = InputManager(screen=display)
+    trace = attach(controls)
+    scores = ScoreStore()
+
+    ball_lost = 0
+    best_rally = 0
+    field = Field(screen=renderer, layer=renderer.static)
+    field.draw_border()
+    paddle = Paddle(screen=renderer, controls=controls)
+    # the ball uses a hardware sprite slot (framebuffer fallback without sprite support)
+    layer = SpriteLayer(renderer=renderer)
+    ball_image = layer.add_image('ball', Sprite.circle(BALL_RADIUS), BLUE, palette.color(BLUE))
+    # sound effects are precomputed once, the mixer writes them to the audio output once per tick
+    mixer = Mixer()
+    paddle_sound = mixer.add(square(880, 880, 40))
+    ball = Ball(screen=renderer, layer=layer, image=ball_image, sounds=mixer, hit_sound=paddle_sound)
+    ball.reset()
+    layer.load()
+
+    # game loop
+    collector = GCScheduler()
+    profiler = Profiler(renderer=renderer, controls=controls, pen=WHITE)
+    loop = GameLoop(update=update, render=render, idle=collector.collect, profiler=profiler,
+                    trace=trace)
+    loop.run()
+    collector.close()
+
+    if trace is not None:
+        trace.close()
+
+    # game over (the score is written to flash here only, never inside the game loop)
+    rank = scores.submit(GAME_NAME, best_rally)
+    scores.commit()
+    mixer.close()
+    palette.restore()
+    layer.clear()
+    renderer.invalidate()
+    renderer.begin()
+    layer.draw()
+    display.set_pen(WHITE)
+    display.text('Game Over', 75, 80, scale=3)
+    display.text(f'Longest rally {best_rally}', 100, 120, scale=1)
+    display.text('New high score' if rank == 0 else f'High score {scores.best(GAME_NAME)}', 100, 135, scale=1)
+    display.update()
+    return best_rally
 
-    ball.draw()
 
-    display.update()
-    gc.collect()
+if __name__ == '__main__':
+    run(PicoVision(pen_type(), SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -0,0 +1,289 @@
+"""
+headless benchmark runner for the PicoVision games
+
+Runs each game on the host against the stand-in modules in 'emulator/' for a fixed number of
+frames with scripted button input and reports frames per second, draw calls per frame and the
+host time spent per primitive.
+
+The emulator runs on a virtual clock by default: every frame advances time by one game loop tick,
+so each run is deterministic (use --realtime to pace the game loop with the host clock).
+
+Phase timings of the profiler (--trace) are only meaningful together with --realtime.
+
+Input traces recorded with --record are replayed with --replay unthrottled (one tick per loop pass)
+until the trace ends, so runs of different commits can be compared on exactly the same input.
+
+Games use the emulated hardware sprite slots by default (sprite images are written to a temporary
+directory); --framebuffer forces the framebuffer fallback of the sprite layer instead. The games run in
+the 5 bit palette mode, --rgb555 switches them to RGB555 pens (palette effects are not shown then).
+
+The sound effects are mixed into the emulated I2S output, --wav writes it as WAV file per game (placed
+on the game clock, so silence fills the gaps between sounds). The mixer time needs --realtime as well.
+
+usage: python tools/benchmark.py [--frames N] [--seed N] [--realtime] [--trace DIR] [--json] [--framebuffer]
+                                 [--rgb555] [--wav DIR]
+                                 [--record FILE | --replay FILE [--render-interval N]] [game ...]
+"""
+from argparse import ArgumentParser
+from os.path import abspath, dirname, join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import sys
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path[:0] = [join(ROOT, 'emulator'), join(ROOT, 'lib'), ROOT]
+
+import heap  # noqa: E402
+import machine  # noqa: E402
+import palette  # noqa: E402
+import profiler  # noqa: E402
+import replay  # noqa: E402
+import score_store  # noqa: E402
+import sprite_layer  # noqa: E402
+import urandom  # noqa: E402
+
+from picovision import BUTTON_A, BUTTON_X, BUTTON_Y, FrameLimitReached, session  # noqa: E402
+
+
+GAMES = ('pico_pong', 'pico_invaders', 'battle_tank')
+FRAME_US = 1000000 // 60
+NO_DRAW_CALLS = ('set_pen', 'update', 'load_sprite', 'update_pen')
+
+
+def scripted(*steps):
+    """
+    build a looping input script from (frames, button bitmask) steps
+    :param steps: tuples with duration in frames and BUTTON_* bitmask
+    :return: callable returning the bitmask for a frame number
+    """
+    timeline = []
+
+    for frames, mask in steps:
+        timeline.extend([mask] * frames)
+
+    return lambda frame: timeline[frame % len(timeline)]
+
+
+SCRIPTS = {
+    'pico_pong': scripted((20, BUTTON_A), (10, 0), (20, BUTTON_X), (10, 0)),
+    'pico_invaders': scripted((15, BUTTON_A | BUTTON_Y), (5, 0), (15, BUTTON_X | BUTTON_Y), (5, 0)),
+    'battle_tank': scripted((20, BUTTON_A), (3, BUTTON_Y), (10, 0), (20, BUTTON_X), (3, BUTTON_Y), (10, 0)),
+}
+
+
+def run_game(name: str, frames: int, seed: int = 0, snapshot: str = None, frame_us: int = FRAME_US,
+             trace_heap: bool = False, trace: str = None, record_path: str = None, replay_path: str = None,
+             render_interval: int = 1, sprites: bool = True, indexed: bool = True, wav: str = None) -> dict:
+    """
+    run one game for a number of frames and collect the emulator statistics
+    :param name: game module name
+    :param frames: number of frames to render
+    :param seed: seed for the emulated urandom module
+    :param snapshot: directory to save the last shown frame as PNG (optional)
+    :param frame_us: virtual frame time in microseconds (None = host clock)
+    :param trace_heap: trace heap use with tracemalloc (slow)
+    :param trace: directory to write the profiler trace of the last frames as CSV (optional)
+    :param record_path: file to record the input trace into (optional)
+    :param replay_path: input trace to replay unthrottled instead of the scripted input (optional)
+    :param render_interval: render only every n-th tick while replaying
+    :param sprites: use the emulated hardware sprites (False = framebuffer fallback of the sprite layer)
+    :param indexed: run the games in palette mode (False = RGB555 pens)
+    :param wav: directory to write the audio output of the game as WAV file (optional)
+    :return: dict with the results
+    """
+    if replay_path:
+        session.reset(frame_limit=None, script=None, frame_us=frame_us)
+    else:
+        session.reset(frame_limit=frames, script=SCRIPTS.get(name), frame_us=frame_us)
+
+    urandom.seed(seed)
+    heap.install(trace=trace_heap)
+    profiler.autostart = bool(trace)
+    replay.record_path = record_path
+    replay.replay_path = replay_path
+    replay.unthrottled = bool(replay_path)
+    replay.render_interval = render_interval
+    sprite_layer.use_hardware = sprites
+    palette.use_palette = indexed
+    machine.wav_path = join(wav, f'{name}.wav') if wav else None
+
+    path = join(ROOT, f'{name}.py')
+
+    with open(path) as file:
+        code = compile(file.read(), path, 'exec')
+
+    namespace = {'__name__': '__main__', '__file__': path}
+    start = perf_counter()
+
+    # sprite images and the score log go to a temporary directory instead of the device filesystem
+    with TemporaryDirectory() as device_dir:
+        sprite_layer.sprite_dir = device_dir
+        score_store.store_path = join(device_dir, 'scores.log')
+
+        try:
+            exec(code, namespace)
+        except FrameLimitReached:
+            pass
+
+    elapsed = perf_counter() - start
+    display = session.display
+    input_trace = namespace.get('trace')
+
+    if record_path and input_trace is not None:
+        input_trace.close()
+
+    # a game stopped by the frame limit has not closed its audio output yet
+    mixer = namespace.get('mixer')
+
+    if mixer is not None:
+        mixer.close()
+
+    if snapshot:
+        display.save_png(join(snapshot, f'{name}.png'))
+
+    rendered = max(1, display.frames)
+    calls = {}
+
+    for call, (count, time_ns, pixels) in sorted(display.stats.items()):
+        calls[call] = {
+            'per_frame': count / rendered,
+            'total_ms': time_ns / 1e6,
+            'us_per_call': time_ns / 1e3 / count,
+            'pixels_per_frame': pixels / rendered,
+        }
+
+    game_profiler = namespace.get('profiler')
+
+    if trace and game_profiler is not None:
+        with open(join(trace, f'{name}.csv'), 'w') as file:
+            game_profiler.dump(file)
+
+    draw_calls = sum(count for call, (count, _, _) in display.stats.items() if call not in NO_DRAW_CALLS)
+    loop = namespace.get('loop')
+    collector = namespace.get('collector')
+    particles = namespace.get('particles')
+    collections, collect_ns = heap.collections()
+    gc_stats = collector.stats() if collector is not None else None
+
+    # without tracing the emulated heap reports no allocation, so there is no high-water mark
+    if gc_stats is not None and not trace_heap:
+        gc_stats['high_water'] = None
+
+    return {
+        'game': name,
+        'frames': display.frames,
+        'seconds': elapsed,
+        'fps': display.frames / elapsed if elapsed else 0.0,
+        'draw_calls_per_frame': draw_calls / rendered,
+        'pixels_per_frame': sum(entry[2] for entry in display.stats.values()) / rendered,
+        'calls': calls,
+        'loop': loop.stats() if loop is not None else None,
+        'gc': gc_stats,
+        'profile': game_profiler.summary() if trace and game_profiler is not None else None,
+        'audio': {key: getattr(mixer, key) for key in ('played', 'mixed', 'late', 'samples', 'busy_us', 'worst_us')}
+        if mixer is not None else None,
+        'particles': {key: getattr(particles, key) for key in ('spawned', 'dropped', 'budget')}
+        if particles is not None else None,
+        'gc_collections': collections,
+        'gc_ms': collect_ns / 1e6,
+    }
+
+
+def print_report(result: dict) -> None:
+    """
+    print a benchmark result as table
+    :param result: dict returned by run_game()
+    :return: None
+    """
+    print(f"{result['game']}: {result['frames']} frames in {result['seconds']:.2f} s "
+          f"({result['fps']:.1f} fps), {result['draw_calls_per_frame']:.1f} draw calls/frame, "
+          f"{result['pixels_per_frame']:.0f} pixels/frame")
+
+    if result['loop']:
+        loop = result['loop']
+        print(f"  game loop: {loop['ticks']} ticks, {loop['missed']} missed deadlines, "
+              f"{loop['dropped']} dropped ticks, worst frame {loop['worst_us']} us")
+
+    print(f"  gc: {result['gc_collections']} collections, {result['gc_ms']:.1f} ms host time", end='')
+
+    if result['gc']:
+        high_water = result['gc']['high_water']
+        print(f", {result['gc']['forced']} forced, heap high-water "
+              f"{'n/a' if high_water is None else f'{high_water} bytes'}")
+    else:
+        print()
+
+    if result['profile']:
+        profile = result['profile']
+        phases = ', '.join(f'{phase} {us} us' for phase, us in profile['phases'].items())
+        print(f"  profile: {profile['frame_us']} us/frame, {profile['alloc']} bytes/frame, {phases}")
+
+    if result['audio']:
+        audio = result['audio']
+        print(f"  audio: {audio['played']} sounds, {audio['samples']} samples, {audio['mixed']} mixed ticks, "
+              f"{audio['late']} late ticks, mixer {audio['busy_us']} us (worst {audio['worst_us']} us)")
+
+    if result['particles']:
+        particles = result['particles']
+        print(f"  particles: {particles['spawned']} spawned, {particles['dropped']} dropped, "
+              f"budget at end {particles['budget']}")
+
+    print(f"  {'call':<16}{'calls/frame':>12}{'total ms':>12}{'us/call':>10}{'pixels/frame':>14}")
+
+    for call, entry in result['calls'].items():
+        print(f"  {call:<16}{entry['per_frame']:>12.1f}{entry['total_ms']:>12.1f}"
+              f"{entry['us_per_call']:>10.1f}{entry['pixels_per_frame']:>14.0f}")
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='headless PicoVision game benchmark')
+    parser.add_argument('games', nargs='*', metavar='game', help=f"games to run: {', '.join(GAMES)} (default: all)")
+    parser.add_argument('--frames', type=int, default=600, help='frames per game (default: 600)')
+    parser.add_argument('--seed', type=int, default=0, help='urandom seed (default: 0)')
+    parser.add_argument('--realtime', action='store_true', help='pace the game loop with the host clock')
+    parser.add_argument('--heap', action='store_true', help='trace heap use with tracemalloc (slow)')
+    parser.add_argument('--trace', metavar='DIR', help='write the profiler trace of each game as CSV into DIR')
+    parser.add_argument('--record', metavar='FILE', help='record the input trace of one game into FILE')
+    parser.add_argument('--replay', metavar='FILE', help='replay the input trace FILE unthrottled (one game)')
+    parser.add_argument('--render-interval', type=int, default=1, metavar='N',
+                        help='render only every N-th tick while replaying (default: 1)')
+    parser.add_argument('--framebuffer', action='store_true',
+                        help='draw sprites into the framebuffer instead of the emulated hardware sprite slots')
+    parser.add_argument('--rgb555', action='store_true', help='use RGB555 pens instead of the palette mode')
+    parser.add_argument('--wav', metavar='DIR', help='write the audio output of each game as WAV file into DIR')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--snapshot', metavar='DIR', help='save the last frame of each game as PNG into DIR')
+    args = parser.parse_args()
+
+    for name in args.games:
+        if name not in GAMES:
+            parser.error(f'unknown game: {name}')
+
+    if (args.record or args.replay) and len(args.games) != 1:
+        parser.error('--record and --replay need exactly one game')
+
+    if args.record and args.replay:
+        parser.error('--record and --replay are mutually exclusive')
+
+    frame_us = None if args.realtime else FRAME_US
+    results = [run_game(name, args.frames, args.seed, args.snapshot, frame_us, args.heap, args.trace,
+                        args.record, args.replay, args.render_interval, not args.framebuffer,
+                        not args.rgb555, args.wav)
+               for name in args.games or GAMES]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print_report(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+host-side check of the swept circle-vs-rectangle collision of Pico Pong
+
+Moves a ball past the paddle from many start positions (in 1/8 pixel steps across both rounded
+corners), at several speeds up to the maximum and beyond, with sweep_circle_rect() resolving the
+bounces like Ball.move() does. Each move of a tick is sampled along its path: the ball must never
+overlap the paddle by more than half a pixel (a grazing pass that is missed tunnels or ends the
+tick inside the paddle).
+
+usage: python tools/collision_check.py [--step N]
+"""
+from argparse import ArgumentParser
+from os.path import abspath, dirname, join
+import sys
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+PADDLE = (28, 100, 5, 20)
+TICKS = 12
+SAMPLES = 16
+sys.path[:0] = [join(ROOT, 'emulator'), join(ROOT, 'lib'), ROOT]
+
+from pico_pong import BALL_RADIUS, SUBPIXEL_SHIFT, TIME_ONE, TIME_SHIFT, Ball, Contact, sweep_circle_rect  # noqa: E402
+
+ONE = 1 << SUBPIXEL_SHIFT
+TOLERANCE = ONE // 2
+# from the start speed to the maximum speed and far beyond it (40 px per tick)
+SPEEDS = (Ball.BALL_SPEED, Ball.MAX_SPEED // 2, Ball.MAX_SPEED, 40 * ONE)
+
+
+def distance(x: int, y: int, rect: tuple) -> float:
+    """
+    return the distance of a point to a rectangle
+    :param x: x position in sub pixels
+    :param y: y position in sub pixels
+    :param rect: rectangle as x, y, width and height in sub pixels
+    :return: float
+    """
+    rx, ry, rw, rh = rect
+    dx = x - max(rx, min(x, rx + rw))
+    dy = y - max(ry, min(y, ry + rh))
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def pass_ball(x: int, y: int, vx: int, vy: int, rect: tuple) -> float:
+    """
+    move a ball for a number of ticks and return the smallest distance of its path to the rectangle
+    :param x: start x position in sub pixels
+    :param y: start y position in sub pixels
+    :param vx: x speed in sub pixels per tick
+    :param vy: y speed in sub pixels per tick
+    :param rect: rectangle as x, y, width and height in sub pixels
+    :return: float
+    """
+    contact = Contact()
+    radius = BALL_RADIUS << SUBPIXEL_SHIFT
+    closest = distance(x, y, rect)
+
+    for _ in range(TICKS):
+        remaining = TIME_ONE
+
+        for _ in range(Ball.MAX_BOUNCES):
+            dx = (vx * remaining) >> TIME_SHIFT
+            dy = (vy * remaining) >> TIME_SHIFT
+            contact.clear()
+            sweep_circle_rect(x, y, dx, dy, radius, *rect, contact)
+            time = min(contact.time, TIME_ONE)
+
+            for sample in range(1, SAMPLES + 1):
+                t = time * sample // SAMPLES
+                closest = min(closest, distance(x + ((dx * t) >> TIME_SHIFT), y + ((dy * t) >> TIME_SHIFT), rect))
+
+            x += (dx * time) >> TIME_SHIFT
+            y += (dy * time) >> TIME_SHIFT
+
+            if contact.time > TIME_ONE:
+                break
+
+            remaining -= (remaining * contact.time) >> TIME_SHIFT
+
+            if contact.normal_x:
+                vx = -vx
+
+            if contact.normal_y:
+                vy = -vy
+
+    return closest
+
+
+def check(step: int) -> dict:
+    """
+    run the passes past both corners of the paddle
+    :param step: start position step in sub pixels
+    :return: dict with the number of passes and the failed ones
+    """
+    rect = tuple(value << SUBPIXEL_SHIFT for value in PADDLE)
+    radius = BALL_RADIUS << SUBPIXEL_SHIFT
+    passes = 0
+    failed = []
+
+    for speed in SPEEDS:
+        for vy in (-speed, 0, speed):
+            # start right of the paddle, a few ticks away, on every y from above to below it
+            for y in range(rect[1] - radius - 2 * ONE - 4 * abs(vy), rect[1] + rect[3] + radius + 2 * ONE + 4 * abs(vy),
+                           step):
+                for phase in range(0, speed, max(1, speed // 4)):
+                    x = rect[0] + rect[2] + radius + ONE + phase + 3 * speed
+                    y0 = y - 3 * vy
+                    passes += 1
+
+                    if pass_ball(x, y0, -speed, vy, rect) < radius - TOLERANCE:
+                        failed.append((x, y0, -speed, vy))
+
+    return {'passes': passes, 'failed': failed}
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='check grazing passes of the Pico Pong ball past the paddle')
+    parser.add_argument('--step', type=int, default=ONE // 8,
+                        help=f'start position step in sub pixels (default: {ONE // 8})')
+    args = parser.parse_args()
+
+    result = check(args.step)
+    print(f"{result['passes']} passes, {len(result['failed'])} overlapping the paddle")
+
+    for x, y, vx, vy in result['failed'][:10]:
+        print(f'  start {x / ONE:.2f}, {y / ONE:.2f} px, speed {vx / ONE:.2f}, {vy / ONE:.2f} px/tick')
+
+    if result['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
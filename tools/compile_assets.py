@@ -0,0 +1,244 @@
+"""
+host-side asset compiler for the PicoVision games
+
+Converts the asset files in 'assets/' into generated modules in 'lib/' with packed bytes constants,
+so the games create their sprites and levels at startup without one heap object per pixel.
+An asset file holds sections (lines starting with '# ' are comments):
+
+    [sprite NAME]               text grid, '#' = pixel, '.' = transparent
+    [sprite NAME FILE.png]      8 bit PNG image, opaque (or non-black) pixels are set
+    [table NAME FORMAT]         one row of integers per entry, packed with the struct FORMAT
+
+Every sprite becomes NAME_WIDTH, NAME_HEIGHT and NAME (rectangles for Sprite.from_bytes()),
+every table becomes NAME (packed rows), NAME_FORMAT and NAME_SIZE (bytes per row).
+
+usage: python tools/compile_assets.py [--check] [--mpy DIR] [asset ...]
+"""
+from argparse import ArgumentParser
+from os import listdir, makedirs
+from os.path import abspath, basename, dirname, join, splitext
+from shutil import which
+from struct import calcsize, pack
+from subprocess import run
+from zlib import decompress
+import sys
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+ASSETS = join(ROOT, 'assets')
+OUTPUT = join(ROOT, 'lib')
+BYTES_PER_LINE = 16
+sys.path.insert(0, OUTPUT)
+
+from sprite import Sprite  # noqa: E402
+
+
+def read_png(path: str) -> list:
+    """
+    decode an 8 bit grayscale, RGB or RGBA PNG image into an icon matrix
+    :param path: PNG file
+    :return: list of rows with bin values (1 = opaque or non-black pixel)
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f'{path}: not a PNG image')
+
+    offset = 8
+    header = None
+    compressed = b''
+
+    while offset < len(data):
+        length = int.from_bytes(data[offset:offset + 4], 'big')
+        kind = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        offset += length + 12
+
+        if kind == b'IHDR':
+            header = body
+        elif kind == b'IDAT':
+            compressed += body
+
+    width = int.from_bytes(header[0:4], 'big')
+    height = int.from_bytes(header[4:8], 'big')
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}.get(header[9])
+
+    if header[8] != 8 or channels is None or header[12]:
+        raise ValueError(f'{path}: only 8 bit grayscale, RGB and RGBA images without interlace are supported')
+
+    raw = decompress(compressed)
+    stride = width * channels
+    previous = bytearray(stride)
+    icon = []
+
+    for y in range(height):
+        kind = raw[y * (stride + 1)]
+        row = bytearray(raw[y * (stride + 1) + 1:(y + 1) * (stride + 1)])
+
+        for i in range(stride):
+            left = row[i - channels] if i >= channels else 0
+            up = previous[i]
+            corner = previous[i - channels] if i >= channels else 0
+
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xff
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xff
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xff
+            elif kind == 4:
+                estimate = left + up - corner
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - corner))
+                row[i] = (row[i] + (left, up, corner)[distances.index(min(distances))]) & 0xff
+
+        if channels in (2, 4):
+            icon.append([1 if row[x * channels + channels - 1] >= 128 else 0 for x in range(width)])
+        else:
+            icon.append([1 if any(row[x * channels:(x + 1) * channels]) else 0 for x in range(width)])
+
+        previous = row
+
+    return icon
+
+
+def parse(path: str) -> list:
+    """
+    read the sections of an asset file
+    :param path: asset file
+    :return: list of (kind, name, argument, lines) tuples
+    """
+    sections = []
+
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+
+            # comments start with '# ', sprite rows may start with '#'
+            if not line or line == '#' or line.startswith('# '):
+                continue
+
+            if line.startswith('['):
+                words = line.strip('[]').split()
+
+                if len(words) < 2 or words[0] not in ('sprite', 'table') or words[0] == 'table' and len(words) != 3:
+                    raise ValueError(f'{path}:{number}: invalid section {line}')
+
+                sections.append((words[0], words[1], words[2] if len(words) > 2 else None, []))
+            elif sections:
+                sections[-1][3].append(line)
+            else:
+                raise ValueError(f'{path}:{number}: data outside of a section')
+
+    return sections
+
+
+def literal(data: bytes) -> str:
+    """
+    format bytes as (wrapped) Python literal
+    :param data: data
+    :return: str
+    """
+    if len(data) <= BYTES_PER_LINE:
+        return repr(data)
+
+    lines = [f'    {data[i:i + BYTES_PER_LINE]!r}' for i in range(0, len(data), BYTES_PER_LINE)]
+    return '(\n' + '\n'.join(lines) + '\n)'
+
+
+def compile_asset(path: str) -> str:
+    """
+    convert an asset file into the source of the generated module
+    :param path: asset file
+    :return: str
+    """
+    constants = []
+
+    for kind, section, argument, lines in parse(path):
+        constant = section.upper()
+
+        if kind == 'sprite':
+            if argument:
+                icon = read_png(join(dirname(path), argument))
+            else:
+                if any(line.strip('#.') for line in lines):
+                    raise ValueError(f'{path}: sprite {section} may only contain # and .')
+
+                icon = [[1 if character == '#' else 0 for character in line] for line in lines]
+
+            sprite = Sprite(icon)
+            constants.append(f'{constant}_WIDTH = const({sprite.width})')
+            constants.append(f'{constant}_HEIGHT = const({sprite.height})')
+            constants.append(f'{constant} = {literal(sprite.rects)}')
+        else:
+            rows = b''.join(pack(argument, *(int(value) for value in line.split())) for line in lines)
+            constants.append(f'{constant}_FORMAT = {argument!r}')
+            constants.append(f'{constant}_SIZE = const({calcsize(argument)})')
+            constants.append(f'{constant} = {literal(rows)}')
+
+        constants.append('')
+
+    header = [
+        '"""',
+        f'packed assets generated by tools/compile_assets.py from assets/{basename(path)} (do not edit)',
+        '"""',
+        'from micropython import const',
+        '',
+        '',
+    ]
+    return '\n'.join(header + constants)
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='compile PicoVision game assets into packed byte modules')
+    parser.add_argument('assets', nargs='*', metavar='asset', help='asset files (default: all files in assets/)')
+    parser.add_argument('--check', action='store_true', help='only check that the generated modules are up to date')
+    parser.add_argument('--mpy', metavar='DIR', help='also cross-compile the generated modules with mpy-cross into DIR')
+    args = parser.parse_args()
+
+    paths = args.assets or [join(ASSETS, name) for name in sorted(listdir(ASSETS)) if name.endswith('.txt')]
+
+    if args.mpy and which('mpy-cross') is None:
+        parser.error('mpy-cross not found (pip install mpy-cross)')
+
+    outdated = []
+
+    for path in paths:
+        module = join(OUTPUT, f'{splitext(basename(path))[0]}_assets.py')
+        source = compile_asset(path)
+
+        try:
+            with open(module) as file:
+                current = file.read()
+        except OSError:
+            current = None
+
+        if args.check:
+            if current != source:
+                outdated.append(module)
+
+            continue
+
+        if current != source:
+            with open(module, 'w') as file:
+                file.write(source)
+
+            print(f'{module} written')
+
+        if args.mpy:
+            makedirs(args.mpy, exist_ok=True)
+            target = join(args.mpy, f'{splitext(basename(module))[0]}.mpy')
+            run(['mpy-cross', '-o', target, module], check=True)
+            print(f'{target} written')
+
+    if outdated:
+        print('outdated: ' + ', '.join(outdated))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
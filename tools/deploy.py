@@ -0,0 +1,301 @@
+"""
+incremental deploy of the games to a PicoVision over the serial raw REPL
+
+Keeps a manifest with the SHA-256 hash of every deployed file on the device ('.deploy') and uploads
+only the files whose content changed, several files per raw REPL transfer. Files deployed before
+but removed locally are deleted on the device. With --mpy the shared modules in 'lib' are
+cross-compiled with mpy-cross first and uploaded as .mpy files (the .py files are removed then).
+
+The serial port is opened as plain terminal device (no pyserial needed), so the deploy can be
+tested against the pseudo-terminal of 'tools/fake_device.py'.
+
+usage: python tools/deploy.py --port PORT [--mpy] [--force] [--dry-run]
+"""
+from argparse import ArgumentParser
+from binascii import b2a_base64
+from hashlib import sha256
+from os import close, listdir, open as open_fd, read, write, O_NOCTTY, O_RDWR
+from os.path import abspath, dirname, join
+from select import select
+from shutil import which
+from subprocess import run
+from tempfile import TemporaryDirectory
+from time import monotonic
+import sys
+import termios
+import tty
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+GAMES = ('pico_pong.py', 'pico_invaders.py', 'battle_tank.py')
+MANIFEST = '.deploy'
+CHUNK_BYTES = 1024
+BATCH_BYTES = 4096
+WRITE_BYTES = 256
+TIMEOUT = 10.0
+
+
+class DeviceError(Exception):
+    """
+    raised when code sent to the device fails or the device does not answer
+    """
+    pass
+
+
+class RawRepl:
+    def __init__(self, port: str, baudrate: int = 115200, timeout: float = TIMEOUT):
+        """
+        raw REPL connection constructor, opens the serial port in raw terminal mode
+        :param port: serial port (e.g. /dev/cu.usbmodem14301 or a pseudo-terminal)
+        :param baudrate: baud rate (ignored by USB CDC devices)
+        :param timeout: seconds to wait for an answer of the device
+        """
+        self._fd = open_fd(port, O_RDWR | O_NOCTTY)
+        self._timeout = timeout
+        tty.setraw(self._fd)
+        attributes = termios.tcgetattr(self._fd)
+        speed = getattr(termios, f'B{baudrate}', termios.B115200)
+        attributes[4] = attributes[5] = speed
+        termios.tcsetattr(self._fd, termios.TCSANOW, attributes)
+
+        self.transfers = 0
+
+    def _write(self, data: bytes) -> None:
+        """
+        write to the device in small pieces (the device USB buffer is small)
+        :param data: data
+        :return: None
+        """
+        for offset in range(0, len(data), WRITE_BYTES):
+            write(self._fd, data[offset:offset + WRITE_BYTES])
+
+    def _read_until(self, ending: bytes) -> bytes:
+        """
+        read from the device until a byte sequence was received
+        :param ending: expected end of the answer
+        :return: bytes (including the ending)
+        """
+        data = b''
+        deadline = monotonic() + self._timeout
+
+        while not data.endswith(ending):
+            remaining = deadline - monotonic()
+
+            if remaining <= 0 or not select([self._fd], [], [], remaining)[0]:
+                raise DeviceError(f'timeout waiting for {ending!r}, received {data[-80:]!r}')
+
+            data += read(self._fd, 1)
+
+        return data
+
+    def _drain(self) -> None:
+        """
+        discard everything the device sent so far
+        :return: None
+        """
+        while select([self._fd], [], [], 0.1)[0]:
+            read(self._fd, 1024)
+
+    def enter(self) -> None:
+        """
+        stop the running program and enter the raw REPL
+        :return: None
+        """
+        self._write(b'\r\x03\x03')
+        self._drain()
+        self._write(b'\r\x01')
+        self._read_until(b'raw REPL; CTRL-B to exit\r\n>')
+
+    def exec(self, code: str) -> str:
+        """
+        execute code on the device
+        :param code: MicroPython source code
+        :return: str (output of the code)
+        """
+        self._write(code.encode() + b'\x04')
+
+        if self._read_until(b'OK') != b'OK':
+            raise DeviceError('raw REPL did not accept the code')
+
+        output = self._read_until(b'\x04')[:-1]
+        error = self._read_until(b'\x04')[:-1]
+        self._read_until(b'>')
+        self.transfers += 1
+
+        if error:
+            raise DeviceError(error.decode(errors='replace').strip())
+
+        return output.decode(errors='replace')
+
+    def close(self) -> None:
+        """
+        leave the raw REPL and close the port
+        :return: None
+        """
+        try:
+            self._write(b'\x02')
+        finally:
+            close(self._fd)
+
+
+def local_files(mpy: bool) -> dict:
+    """
+    collect the files to deploy (games and shared modules, never 'emulator', 'tools' or 'assets')
+    :param mpy: cross-compile the shared modules with mpy-cross
+    :return: dict with device path and content
+    """
+    files = {}
+
+    for name in GAMES + ('main.py',):
+        try:
+            with open(join(ROOT, name), 'rb') as file:
+                files[name] = file.read()
+        except FileNotFoundError:
+            pass
+
+    with TemporaryDirectory() as build:
+        for name in sorted(listdir(join(ROOT, 'lib'))):
+            if not name.endswith('.py'):
+                continue
+
+            path = join(ROOT, 'lib', name)
+
+            if mpy:
+                target = join(build, name[:-3] + '.mpy')
+                run(['mpy-cross', '-o', target, path], check=True)
+                path = target
+                name = name[:-3] + '.mpy'
+
+            with open(path, 'rb') as file:
+                files[f'lib/{name}'] = file.read()
+
+    return files
+
+
+def read_manifest(repl: RawRepl) -> dict:
+    """
+    read the manifest of the deployed files from the device
+    :param repl: raw REPL connection
+    :return: dict with device path and hash
+    """
+    output = repl.exec(f"try:\n print(open('{MANIFEST}').read())\nexcept OSError:\n pass\n")
+    manifest = {}
+
+    for line in output.splitlines():
+        digest, _, path = line.strip().partition(' ')
+
+        if path:
+            manifest[path] = digest
+
+    return manifest
+
+
+def batches(files: dict) -> list:
+    """
+    split the changed files into raw REPL transfers of a limited size (large files span several)
+    :param files: dict with device path and content
+    :return: list of code strings
+    """
+    codes = []
+    code = []
+    size = 0
+
+    for path, content in files.items():
+        for offset in range(0, max(1, len(content)), CHUNK_BYTES):
+            chunk = content[offset:offset + CHUNK_BYTES]
+
+            if size + len(chunk) > BATCH_BYTES and code:
+                codes.append('\n'.join(code) + '\n')
+                code = []
+                size = 0
+
+            if not code:
+                code.append('from binascii import a2b_base64 as d')
+
+            data = b2a_base64(chunk, newline=False)
+            code.append(f"f=open('{path}','{'ab' if offset else 'wb'}')\nf.write(d({data!r}))\nf.close()")
+            size += len(chunk)
+
+    if code:
+        codes.append('\n'.join(code) + '\n')
+
+    return codes
+
+
+def deploy(repl: RawRepl, files: dict, force: bool = False, dry_run: bool = False) -> dict:
+    """
+    upload changed files, delete files which are gone and write the new manifest
+    :param repl: raw REPL connection (already in raw mode)
+    :param files: dict with device path and content
+    :param force: upload all files
+    :param dry_run: only report what would change
+    :return: dict with uploaded, deleted and unchanged paths and the uploaded bytes
+    """
+    manifest = read_manifest(repl)
+    hashes = {path: sha256(content).hexdigest() for path, content in files.items()}
+    changed = {path: content for path, content in files.items() if force or manifest.get(path) != hashes[path]}
+    deleted = sorted(path for path in manifest if path not in files)
+    result = {
+        'uploaded': sorted(changed),
+        'deleted': deleted,
+        'unchanged': len(files) - len(changed),
+        'bytes': sum(len(content) for content in changed.values()),
+    }
+
+    if dry_run or not changed and not deleted:
+        return result
+
+    # the directory is created with the first transfer, deletions and the manifest follow the last one
+    codes = batches(changed) or ['']
+    codes[0] = "import os\ntry:\n os.mkdir('lib')\nexcept OSError:\n pass\n" + codes[0]
+    lines = ''.join(f'{hashes[path]} {path}\n' for path in sorted(files))
+    codes[-1] += ''.join(f"try:\n os.remove('{path}')\nexcept OSError:\n pass\n" for path in deleted)
+    codes[-1] += f"f=open('{MANIFEST}','w')\nf.write({lines!r})\nf.close()\n"
+
+    for code in codes:
+        repl.exec(code)
+
+    return result
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='incremental deploy of the PicoVision games over the serial raw REPL')
+    parser.add_argument('--port', required=True, help='serial port of the device (or of tools/fake_device.py)')
+    parser.add_argument('--baudrate', type=int, default=115200, help='baud rate (default: 115200)')
+    parser.add_argument('--mpy', action='store_true', help='cross-compile the modules in lib with mpy-cross')
+    parser.add_argument('--force', action='store_true', help='upload all files, ignoring the manifest')
+    parser.add_argument('--dry-run', action='store_true', help='only show what would be uploaded or deleted')
+    args = parser.parse_args()
+
+    if args.mpy and which('mpy-cross') is None:
+        parser.error('mpy-cross not found (pip install mpy-cross)')
+
+    start = monotonic()
+    files = local_files(args.mpy)
+    repl = RawRepl(args.port, args.baudrate)
+
+    try:
+        repl.enter()
+        result = deploy(repl, files, args.force, args.dry_run)
+    except DeviceError as error:
+        print(f'deploy failed: {error}')
+        sys.exit(1)
+    finally:
+        repl.close()
+
+    for path in result['uploaded']:
+        print(f"{'would upload' if args.dry_run else 'uploaded'} {path}")
+
+    for path in result['deleted']:
+        print(f"{'would delete' if args.dry_run else 'deleted'} {path}")
+
+    print(f"{len(result['uploaded'])} files ({result['bytes']} bytes) in {repl.transfers} transfers, "
+          f"{result['unchanged']} unchanged, {monotonic() - start:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
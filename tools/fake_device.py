@@ -0,0 +1,117 @@
+"""
+host-side stand-in for a PicoVision on a serial port, for testing tools/deploy.py without hardware
+
+Opens a pseudo-terminal and answers like the MicroPython REPL: CTRL-A enters the raw REPL, code
+ended by CTRL-D is executed with DIR as working directory (the device filesystem), and its output
+and error are sent back in the raw REPL framing. CTRL-B leaves the raw REPL. The port name is printed
+on start, the received bytes and executed transfers are printed when the process is stopped.
+
+usage: python tools/fake_device.py DIR
+"""
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from os import chdir, makedirs, openpty, read, ttyname, write
+from signal import SIGTERM, default_int_handler, signal
+from traceback import format_exception_only
+import tty
+
+
+RAW_PROMPT = b'raw REPL; CTRL-B to exit\r\n>'
+FRIENDLY_PROMPT = b'\r\n>>> '
+
+
+class FakeDevice:
+    def __init__(self, root: str):
+        """
+        fake device constructor, the pseudo-terminal is created immediately
+        :param root: directory used as device filesystem
+        """
+        makedirs(root, exist_ok=True)
+        chdir(root)
+        self._master, self._slave = openpty()
+        tty.setraw(self._slave)
+        self._raw = False
+        self._code = bytearray()
+
+        self.port = ttyname(self._slave)
+        self.received = 0
+        self.transfers = 0
+
+    def _execute(self, code: str) -> None:
+        """
+        execute a raw REPL transfer and send output and error back
+        :param code: source code
+        :return: None
+        """
+        output = StringIO()
+        error = ''
+
+        try:
+            with redirect_stdout(output):
+                exec(compile(code, '<stdin>', 'exec'), {'__name__': '__main__'})
+        except Exception as exception:
+            error = 'Traceback (most recent call last):\r\n' + ''.join(format_exception_only(exception))
+
+        self.transfers += 1
+        write(self._master, b'OK' + output.getvalue().replace('\n', '\r\n').encode() + b'\x04' +
+              error.encode() + b'\x04>')
+
+    def _handle(self, byte: int) -> None:
+        """
+        handle one received byte
+        :param byte: byte value
+        :return: None
+        """
+        if byte == 0x01:
+            self._raw = True
+            self._code = bytearray()
+            write(self._master, RAW_PROMPT)
+        elif byte == 0x02:
+            self._raw = False
+            write(self._master, FRIENDLY_PROMPT)
+        elif byte == 0x03:
+            self._code = bytearray()
+
+            if not self._raw:
+                write(self._master, FRIENDLY_PROMPT)
+        elif self._raw and byte == 0x04:
+            self._execute(self._code.decode())
+            self._code = bytearray()
+        elif self._raw:
+            self._code.append(byte)
+
+    def serve(self) -> None:
+        """
+        answer the host until the process is stopped
+        :return: None
+        """
+        while True:
+            data = read(self._master, 4096)
+            self.received += len(data)
+
+            for byte in data:
+                self._handle(byte)
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='fake PicoVision raw REPL on a pseudo-terminal')
+    parser.add_argument('root', metavar='DIR', help='directory used as device filesystem')
+    args = parser.parse_args()
+
+    device = FakeDevice(args.root)
+    print(device.port, flush=True)
+    signal(SIGTERM, default_int_handler)
+
+    try:
+        device.serve()
+    except KeyboardInterrupt:
+        print(f'{device.received} bytes received, {device.transfers} transfers')
+
+
+if __name__ == '__main__':
+    main()
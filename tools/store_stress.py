@@ -0,0 +1,148 @@
+"""
+host-side check of lib/score_store.py against a directory standing in for the device filesystem
+
+Plays a number of simulated game overs (random scores and settings, one commit each) on a score log
+in DIR. After every commit the store is read back from the file and must equal the store in RAM.
+With --torn the bytes appended by a commit are cut at a random position from time to time (a write
+interrupted by a reset): every record is either complete or ignored, so the tables and the settings
+read back must each be the ones before or after the commit, and the next commit repairs the log.
+At the end the flash bytes written are compared with rewriting a JSON file on every commit.
+Before that the ranks returned by submit() are checked (a score tying the best is not a new best).
+
+usage: python tools/store_stress.py [--commits N] [--torn] [--seed N] [--dir DIR]
+"""
+from argparse import ArgumentParser
+from os.path import abspath, dirname, exists, getsize, join
+from random import Random
+from tempfile import TemporaryDirectory
+import json
+import sys
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+GAMES = ('pico_pong', 'pico_invaders', 'battle_tank')
+TORN_RATE = 0.05
+sys.path[:0] = [join(ROOT, 'emulator'), join(ROOT, 'lib')]
+
+from score_store import ScoreStore  # noqa: E402
+
+
+def snapshot(store: ScoreStore) -> tuple:
+    """
+    return the tables and settings of a store for comparison
+    :param store: score store
+    :return: tuple
+    """
+    return {game: list(table) for game, table in store.tables.items() if table}, dict(store.settings)
+
+
+def check_ranks(path: str) -> None:
+    """
+    check the ranks returned by submit(), including ties and scores not entering the full table
+    :param path: log file
+    :return: None
+    """
+    store = ScoreStore(path, table_size=3)
+    expected = ((10, 0), (10, 1), (20, 0), (10, -1), (5, -1), (15, 1), (20, 1))
+
+    for score, rank in expected:
+        result = store.submit('pico_pong', score)
+
+        if result != rank:
+            raise AssertionError(f'score {score} ranked {result} instead of {rank} in {store.tables["pico_pong"]}')
+
+    if store.tables['pico_pong'] != [20, 20, 15]:
+        raise AssertionError(f'table {store.tables["pico_pong"]} instead of [20, 20, 15]')
+
+
+def stress(path: str, commits: int, torn: bool, seed: int) -> dict:
+    """
+    run the simulated game overs and verify the log after each commit
+    :param path: log file
+    :param commits: number of game overs
+    :param torn: cut the log at random positions
+    :param seed: random seed
+    :return: dict with the results
+    """
+    rng = Random(seed)
+    store = ScoreStore(path)
+    previous = snapshot(store)
+    written = 0
+    json_written = 0
+    cuts = 0
+
+    for index in range(commits):
+        # the players get better, so new scores keep entering the tables and the log keeps growing
+        game = rng.choice(GAMES)
+        store.submit(game, rng.randrange(0, 100 + index))
+
+        if rng.random() < 0.2:
+            store.set_setting('game', GAMES.index(game))
+
+        size = getsize(path) if exists(path) else 0
+        compactions = store.compactions
+        store.commit()
+        expected = snapshot(store)
+        json_written += len(json.dumps(expected))
+
+        # a torn compaction leaves the old log untouched (the new file replaces it by rename)
+        if torn and size < getsize(path) and store.compactions == compactions and rng.random() < TORN_RATE:
+            with open(path, 'r+b') as file:
+                file.truncate(rng.randrange(size, getsize(path)))
+
+            cuts += 1
+            written += store.written
+            store = ScoreStore(path)
+            tables, settings = snapshot(store)
+
+            if tables not in (previous[0], expected[0]) or settings not in (previous[1], expected[1]):
+                raise AssertionError(f'torn log read back as {snapshot(store)}')
+
+            previous = snapshot(store)
+            continue
+
+        loaded = ScoreStore(path)
+
+        if snapshot(loaded) != expected:
+            raise AssertionError(f'log read back differs: {snapshot(loaded)} != {expected}')
+
+        previous = expected
+
+    written += store.written
+    return {
+        'commits': commits,
+        'cuts': cuts,
+        'log_bytes': getsize(path),
+        'flash_written': written,
+        'json_written': json_written,
+        'compactions': store.compactions,
+        'tables': snapshot(store)[0],
+    }
+
+
+def main() -> None:
+    """
+    command line entry point
+    :return: None
+    """
+    parser = ArgumentParser(description='check the append-only score log against a file-backed stand-in')
+    parser.add_argument('--commits', type=int, default=1000, help='number of simulated game overs (default: 1000)')
+    parser.add_argument('--torn', action='store_true', help='cut the log at random positions (torn writes)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--dir', help='directory used as device filesystem (default: temporary directory)')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        check_ranks(join(directory, 'ranks.log'))
+        result = stress(join(args.dir or directory, 'scores.log'), args.commits, args.torn, args.seed)
+
+    print(f"{result['commits']} commits ({result['cuts']} torn), {result['compactions']} compactions "
+          f"(last store), log {result['log_bytes']} bytes")
+    print(f"flash written {result['flash_written']} bytes, rewriting JSON {result['json_written']} bytes")
+
+    for game, table in sorted(result['tables'].items()):
+        print(f'{game}: {table}')
+
+
+if __name__ == '__main__':
+    main()